@@ -0,0 +1,197 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import types
+import numpy as np
+import pandas as pd
+
+# Offline benchmarks for the bot's signal cycle and the dashboard's recompute paths. yfinance is replaced
+# by MarketStub before anything imports it, every case runs `repeat` times and keeps the fastest run, and
+# results are written as JSON and compared with a stored baseline so slowdowns show up as regressions.
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(here, '..', 'BetaTestBot'))
+sys.path.append(os.path.join(here, '..', 'DisplayBeta'))
+
+import MarketStub
+MarketStub.install()
+
+# The benchmark never drives the browser, so Main is imported without the GUI automation module
+# (pyautogui needs a display)
+sys.modules.setdefault('Actions', types.ModuleType('Actions'))
+
+baseline_path = os.path.join(here, 'baseline.json')
+results_path = os.path.join(here, 'results.json')
+SYMBOL_COUNTS = [1, 10, 100, 500]
+PERIODS = ['1d', '1mo', '1y', '10y']
+CASES = ['bot', 'portfolio', 'compare']
+
+
+def universe(count):
+    from Portfolio import load_watchlist
+    symbols = [s.replace('.', '-') for s in load_watchlist()]
+    return symbols[:count]
+
+
+class Timer:
+    # Accumulates seconds per stage for one run
+    def __init__(self):
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+
+def bench_bot(symbols, period):
+    # fetch -> calculate_moving_average -> determine_trade_signal for every symbol, as in one trading_bot
+    # cycle. fetch_cold fills an empty bar store; fetch is a later cycle that only asks for the new bars.
+    import BarStore as bars
+    import Main as main
+    timer = Timer()
+    store = tempfile.mkdtemp(prefix='bench-bars-')
+    bars.store_path = store
+    bars.initial_lookback['1d'] = MarketStub.PERIODS[period]
+    try:
+        with timer.stage('fetch_cold'):
+            main.fetch_stock_data_many(symbols)
+        with timer.stage('fetch'):
+            frames = main.fetch_stock_data_many(symbols)
+        with contextlib.redirect_stdout(io.StringIO()):
+            with timer.stage('sma'):
+                frames = {s: main.calculate_moving_average(df, main.window_size) for s, df in frames.items()}
+            with timer.stage('signal'):
+                for df in frames.values():
+                    main.determine_trade_signal(df)
+    finally:
+        shutil.rmtree(store, ignore_errors=True)
+    return timer.stages
+
+
+def bench_portfolio(symbols, period):
+    # Portfolio Analyzer rerun: position recompute from last prices, then the history over `period`
+    from Positions import recompute
+    from PortfolioHistory import compute_history, download_closes
+    timer = Timer()
+    start = MarketStub.end - MarketStub.PERIODS[period]
+    prices = download_closes(symbols, start)
+    rng = np.random.default_rng(0)
+    entry = prices.index[rng.integers(0, len(prices), len(symbols))] if len(prices) else [start] * len(symbols)
+    positions = pd.DataFrame({'Symbol': symbols, 'Shares': rng.integers(1, 100, len(symbols)).astype(float),
+                              'Entry Price': rng.uniform(20, 500, len(symbols)), 'Entry Date': entry})
+    last = prices.ffill().iloc[-1].to_dict() if len(prices) else {}
+    with timer.stage('recompute'):
+        recompute(positions, last)
+    with timer.stage('history'):
+        compute_history(positions, prices)
+    return timer.stages
+
+
+def bench_compare(symbols, period, chart_width=1200):
+    # Stock Comparison rerun with a cold cache: batched download, downsampling and figure construction
+    import plotly.graph_objects as go
+    import MarketData
+    from Downsample import downsample
+    timer = Timer()
+    MarketData._caches()['prices'].clear()
+    with timer.stage('fetch'):
+        frames = MarketData.fetch_many(symbols, '1d', period)
+    with timer.stage('downsample'):
+        traces = {s: downsample(df, chart_width) for s, df in frames.items() if not df.empty}
+    with timer.stage('figure'):
+        fig = go.Figure()
+        for symbol, df in traces.items():
+            fig.add_trace(go.Scatter(x=df['date'], y=df['price'], mode='lines', name=symbol))
+        total_returns = [(df['price'].iloc[-1] - df['price'].iloc[0]) / df['price'].iloc[0] * 100
+                         for df in frames.values() if not df.empty]
+    return timer.stages
+
+
+BENCHES = {'bot': bench_bot, 'portfolio': bench_portfolio, 'compare': bench_compare}
+
+
+def run(cases=CASES, counts=SYMBOL_COUNTS, periods=PERIODS, repeat=3):
+    results = {}
+    for case in cases:
+        for count in counts:
+            symbols = universe(count)
+            # Generate the stub histories up front so their cost is not timed
+            MarketStub.download(symbols, period='max', group_by='ticker')
+            for period in periods:
+                runs = [BENCHES[case](symbols, period) for _ in range(repeat)]
+                best = {stage: min(r[stage] for r in runs) for stage in runs[0]}
+                best['total'] = min(sum(r.values()) for r in runs)
+                best['total_median'] = statistics.median(sum(r.values()) for r in runs)
+                key = f"{case}/{count}/{period}"
+                results[key] = best
+                print(f"{key:<22} " + "  ".join(f"{k} {v * 1000:.1f}ms" for k, v in best.items()))
+    return results
+
+
+def meta():
+    return {'time': pd.Timestamp.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+            'platform': platform.platform(), 'processor': platform.processor(), 'cpus': os.cpu_count(),
+            'numpy': np.__version__, 'pandas': pd.__version__}
+
+
+def compare(results, baseline, tolerance=0.25, floor=0.001):
+    # Stages slower than baseline by more than `tolerance` (and by at least `floor` seconds) regress
+    regressions = []
+    for key, stages in results.items():
+        for stage, seconds in stages.items():
+            base = baseline.get(key, {}).get(stage)
+            if base is None or stage == 'total_median':
+                continue
+            ratio = seconds / base if base else float('inf')
+            flag = ratio > 1 + tolerance and seconds - base > floor
+            if flag:
+                regressions.append((key, stage, base, seconds))
+            print(f"{key:<22} {stage:<12} {base * 1000:10.1f}ms -> {seconds * 1000:10.1f}ms  x{ratio:5.2f}"
+                  f"{'  REGRESSION' if flag else ''}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the offline benchmarks and compare them with a baseline")
+    parser.add_argument('--cases', nargs='*', choices=CASES, default=CASES)
+    parser.add_argument('--symbols', nargs='*', type=int, default=SYMBOL_COUNTS, help="symbol counts")
+    parser.add_argument('--periods', nargs='*', choices=list(MarketStub.PERIODS), default=PERIODS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=results_path)
+    parser.add_argument('--baseline', default=baseline_path)
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = run(args.cases, args.symbols, args.periods, args.repeat)
+    report = {'meta': meta(), 'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Compared with baseline from {baseline['meta']['time']} ({baseline['meta']['platform']})")
+        regressions = compare(results, baseline['results'], args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s)")
+            sys.exit(1)
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
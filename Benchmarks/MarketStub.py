@@ -0,0 +1,125 @@
+import os
+import zlib
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+# Deterministic stand-in for yfinance. Every symbol gets a synthetic history built by resampling the
+# bar-to-bar returns and candle shapes of BetaTestBot/data.csv with a generator seeded by the symbol name,
+# so the same symbol always has the same bars, overlapping requests agree with each other (the bar store's
+# delta fetches line up) and nothing touches the network.
+
+data_csv = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'BetaTestBot', 'data.csv')
+end = pd.Timestamp.now().normalize()  # last session of every history; install() can pin it
+calls = []
+
+BARS_PER_SESSION = {'1m': 390, '2m': 195, '5m': 78, '15m': 26, '30m': 13, '60m': 7, '1h': 7, '90m': 5}
+HISTORY = {'1m': pd.DateOffset(days=30), '1d': pd.DateOffset(years=12), '1wk': pd.DateOffset(years=12)}
+PERIODS = {'1d': pd.DateOffset(days=1), '5d': pd.DateOffset(days=5), '7d': pd.DateOffset(days=7),
+           '1mo': pd.DateOffset(months=1), '3mo': pd.DateOffset(months=3), '6mo': pd.DateOffset(months=6),
+           '1y': pd.DateOffset(years=1), '2y': pd.DateOffset(years=2), '5y': pd.DateOffset(years=5),
+           '10y': pd.DateOffset(years=10), 'max': pd.DateOffset(years=12)}
+
+
+@lru_cache(maxsize=1)
+def _sample():
+    # 5 minute log returns, candle shape relative to the close, and volumes of the sample file
+    df = pd.read_csv(data_csv)
+    close = df['Close'].to_numpy(dtype=np.float64)
+    returns = np.diff(np.log(close))
+    returns = returns - returns.mean()  # the sample month trends up; keep long histories from compounding it
+    shape = np.column_stack([df['Open'] / df['Close'], df['High'] / df['Close'], df['Low'] / df['Close']])[1:]
+    return returns, shape, df['Volume'].to_numpy(dtype=np.int64)[1:]
+
+
+def _sessions(start, stop):
+    days = np.arange(np.datetime64(start.date(), 'D'), np.datetime64(stop.date(), 'D') + 1)
+    return days[np.is_busday(days)]
+
+
+@lru_cache(maxsize=2048)
+def _history(symbol, interval):
+    # The full stored history of one symbol/interval; requests are slices of it
+    intraday = interval in BARS_PER_SESSION
+    days = _sessions(end - HISTORY.get(interval, pd.DateOffset(days=60)), end)
+    if intraday:
+        per = BARS_PER_SESSION[interval]
+        minutes = 390 // per
+        offsets = np.timedelta64(9 * 60 + 30, 'm') + np.arange(per) * np.timedelta64(minutes, 'm')
+        index = (days.astype('datetime64[m]')[:, None] + offsets[None, :]).ravel()
+        index = pd.DatetimeIndex(index).tz_localize('America/New_York')
+        scale = np.sqrt(minutes / 5)
+    else:
+        if interval == '1wk':
+            days = days[pd.DatetimeIndex(days).dayofweek == 0]
+        index = pd.DatetimeIndex(days)
+        scale = np.sqrt(78 * (5 if interval == '1wk' else 1))
+
+    returns, shape, volume = _sample()
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+    pick = rng.integers(0, len(returns), len(index))
+    close = 20 + 480 * rng.random() * np.exp(np.cumsum(returns[pick] * scale))
+    candles = shape[pick]
+    df = pd.DataFrame({
+        'Open': close * candles[:, 0],
+        'High': close * np.maximum(candles[:, 1], np.maximum(candles[:, 0], 1)),
+        'Low': close * np.minimum(candles[:, 2], np.minimum(candles[:, 0], 1)),
+        'Close': close,
+        'Volume': volume[pick] * (1 if intraday else 78),
+    }, index=index)
+    df.index.name = 'Datetime' if intraday else 'Date'
+    return df
+
+
+def history(symbol, interval='1d', period=None, start=None, stop=None):
+    df = _history(symbol, interval)
+    if start is None and period is not None:
+        start = end - PERIODS.get(period, pd.DateOffset(years=1)) + pd.Timedelta(days=1)
+    index = df.index.tz_localize(None) if df.index.tz is not None else df.index
+    keep = np.ones(len(df), dtype=bool)
+    if start is not None:
+        keep &= index >= pd.Timestamp(start).tz_localize(None)
+    if stop is not None:
+        keep &= index < pd.Timestamp(stop).tz_localize(None)
+    return df[keep]
+
+
+def download(tickers, start=None, end=None, period=None, interval='1d', group_by='column', **kwargs):
+    # Same column layout as yf.download: (Ticker, Price) with group_by='ticker', else (Price, Ticker)
+    single = isinstance(tickers, str)
+    symbols = tickers.split() if single else list(tickers)
+    calls.append(('download', tuple(symbols), interval, period, start, end))
+    if start is None and period is None:
+        period = '1mo'
+    frames = {s: history(s, interval, period, start, end) for s in symbols}
+    df = pd.concat(frames, axis=1, names=['Ticker', 'Price'])
+    if group_by != 'ticker':
+        df = df.swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+    return df
+
+
+class Ticker:
+    def __init__(self, symbol):
+        self.ticker = symbol
+
+    @property
+    def info(self):
+        calls.append(('info', self.ticker))
+        rng = np.random.default_rng(zlib.crc32(self.ticker.encode()))
+        return {'symbol': self.ticker, 'trailingPE': float(rng.uniform(8, 60)),
+                'dividendYield': float(rng.uniform(0, 0.05)), 'trailingEps': float(rng.uniform(-2, 20)),
+                'beta': float(rng.uniform(0.3, 2.0))}
+
+    def history(self, period='1mo', interval='1d', start=None, end=None, **kwargs):
+        return history(self.ticker, interval, period, start, end)
+
+
+def install(last_session=None):
+    # Route yf.download and yf.Ticker to the stub for the rest of the process
+    global end
+    if last_session is not None:
+        end = pd.Timestamp(last_session).normalize()
+        _history.cache_clear()
+    yf.download = download
+    yf.Ticker = Ticker
@@ -1,24 +1,46 @@
+import os
 import pyautogui as pag
 from PIL import Image
 from pytesseract import pytesseract
 import yfinance as yf
+import BarStore as bars
+from Locator import Locator
+import Metrics as metrics
 
 path = '/Users/anandp/Desktop/PythonFiles/TradingEngine/BetaTestBot/Assets'
+locator = None
+
+def get_locator():
+    # Assets are loaded and grayscaled once, on first use
+    global locator
+    if locator is None:
+        locator = Locator(path, confidence=0.8)
+    return locator
 
 def botpr(image):
-    Cord = pag.locateCenterOnScreen(image ,confidence=0.8)
-    pag.click(Cord.x/2,Cord.y/2)
+    name = os.path.basename(image)
+    with metrics.timer('bot_locate_seconds', image=name):
+        Cord = get_locator().find(image)
+    if Cord is None:
+        metrics.inc('bot_locate_misses_total', image=name)
+        raise pag.ImageNotFoundException(f"{image} not found on screen")
+    pag.click(Cord[0]/2,Cord[1]/2)
     
 def scrolltill(image):
     x=1
     while x==1:
         pag.scroll(-5)
-        if(pag.locateCenterOnScreen(image ,confidence=0.8)):
-            cod = pag.locateCenterOnScreen(image ,confidence=0.8)
-            pag.click(cod.x/2,cod.y/2)
+        # One screenshot per scroll step, matched against both the target and the end-of-page marker
+        found = get_locator().find_any([image, f'{path}/EOP.png'])
+        if(found[image]):
+            cod = found[image]
+            pag.click(cod[0]/2,cod[1]/2)
             x=0
-        elif(pag.locateCenterOnScreen(f'{path}/EOP.png' ,confidence=0.8)):
-            print("End of page reached")
+        else:
+            # Another scroll step needed to bring the target on screen
+            metrics.inc('bot_locate_retries_total', image=os.path.basename(image))
+            if(found[f'{path}/EOP.png']):
+                print("End of page reached")
 
 def login():
     botpr(f'{path}/plus.png')
@@ -31,7 +53,18 @@ def login():
     pag.PAUSE = 4
     pag.press('enter')
 
-def exec_trade(ticker):
+def open_portfolio():
+    # Holdings.py reads the holdings table off this page
+    pag.PAUSE = 2
+    botpr(f'{path}/port.png')
+
+def set_quantity(quantity):
+    # The first click on the up arrow comes from finding it; each further one adds a share
+    scrolltill(f'{path}/up.png')
+    if quantity > 1:
+        pag.click(clicks=int(quantity) - 1)
+
+def exec_trade(ticker, quantity=10):
         pag.PAUSE = 2
         botpr(f'{path}/trade.png')
         pag.PAUSE = 2
@@ -45,13 +78,13 @@ def exec_trade(ticker):
         pag.PAUSE=1
         pag.click()
         pag.PAUSE=1
-        scrolltill(f'{path}/up.png')
-        pag.click(clicks=9)
+        set_quantity(quantity)
         scrolltill(f'{path}/preview.png')
         pag.PAUSE=1
         botpr(f'{path}/submit.png')
         
-def sell_trade(ticker):
+def sell_trade(ticker, quantity=None):
+        # quantity=None sells the whole position (the "Show max" button)
         pag.PAUSE = 1
         botpr(f'{path}/trade.png')
         pag.PAUSE = 1
@@ -68,7 +101,10 @@ def sell_trade(ticker):
         scrolltill(f'{path}/actionbut.png')
         pag.scroll(-1)
         pag.click()
-        botpr(f'{path}/showmax.png')
+        if quantity is None:
+            botpr(f'{path}/showmax.png')
+        else:
+            set_quantity(quantity)
         scrolltill(f'{path}/preview.png')
         pag.PAUSE=1
         botpr(f'{path}/submit.png')
@@ -80,22 +116,23 @@ def get_stock():
     if(ch=='y'):
         st=input("Enter start date(YYYY-MM-DD): ")
         et=input("Enter end date(YYYY-MM-DD): ")
-        df = yf.download(tickers=ticker,start=st,end=et,interval="1d")
-        df.index = df.index.tz_localize(None)
-
-        df.to_excel('stonks.xlsx')
+        invl="1d"
+        df = yf.download(tickers=ticker,start=st,end=et,interval=invl)
     else:
         print("Time interval: 1m = <=7d, 5m = <=60d")
         per=input("Enter Time period(1d,2d,2m,3m,etc): ")
         invl=input("Enter Time interval (1m,5m,10,15m,1d,etc): ")
         df = yf.download(tickers=ticker,period=per,interval=invl)
-        df.index = df.index.tz_localize(None)
-
-        df.to_excel('stonks.xlsx')
+    df = bars.normalize(df)
+    bars.append(ticker, invl, df)
+    print(f"{len(df)} bars saved to the bar store")
+    if input("Export to stonks.xlsx? y or n")=='y':
+        bars.export_excel(ticker, invl, df.index[0], df.index[-1])
         
 def auto_get_stock(ticker_name):
-    df = yf.download(tickers=ticker_name,period='5d',interval='1m')
-    df.index = df.index.tz_localize(None)
-    df.to_excel('stonks.xlsx')
+    # 1m bars via the bar store, which only downloads and writes the bars added since the previous call.
+    # A list of tickers is fetched in one request; use bars.export_excel(tickers) for the old stonks.xlsx.
+    tickers = [ticker_name] if isinstance(ticker_name, str) else list(ticker_name)
+    return bars.update_many(tickers, '1m')
     
     
\ No newline at end of file
@@ -0,0 +1,159 @@
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+# Vectorized backtest of the trading_bot strategy: BUY when Close > SMA, SELL when Close < SMA,
+# at most trade_limit buys over the bot's lifetime (trade_count never goes down) and one lot sold
+# per SELL signal while holdings are open. Signals, fills and the equity curve are array operations;
+# the only Python loop is over trades, which trade_limit keeps tiny.
+
+data_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data.csv')
+
+
+def load_csv(path=data_path):
+    df = pd.read_csv(path, index_col=0)
+    df.index = pd.to_datetime(df.index, utc=True)
+    return df
+
+
+def sma(close, window_size):
+    # Same kernel as calculate_moving_average so signals agree with the live bot
+    return pd.Series(close).rolling(window=window_size).mean().to_numpy()
+
+
+def signals(close, window_size, first_run=False):
+    # 1 = BUY, -1 = SELL, 0 = HODL/no signal, same rules as determine_trade_signal
+    avg = sma(close, window_size)
+    sig = np.where(close > avg, 1, np.where(close < avg, -1, 0)).astype(np.int8)
+    sig[:window_size - 1] = 0
+    if first_run and len(sig):
+        sig[0] = 1
+    return sig
+
+
+def trade_bars(sig, trade_limit):
+    # Buys: the first trade_limit BUY bars. Each buy is closed by the first SELL bar after it that
+    # also comes after the previous sell, mirroring portfolio["holdings"] in trading_bot.
+    buy_idx = np.flatnonzero(sig == 1)[:trade_limit]
+    sell_signals = np.flatnonzero(sig == -1)
+    sell_idx = []
+    last = -1
+    for b in buy_idx:
+        pos = np.searchsorted(sell_signals, max(b, last + 1))
+        if pos == len(sell_signals):
+            break
+        last = sell_signals[pos]
+        sell_idx.append(last)
+    return buy_idx, np.array(sell_idx, dtype=np.int64)
+
+
+def run(close, window_size=5, trade_limit=3, shares=1.0, initial_cash=10000.0, periods_per_year=252,
+        first_run=False):
+    close = np.asarray(close, dtype=np.float64)
+    return evaluate(close, signals(close, window_size, first_run), trade_limit, shares, initial_cash,
+                    periods_per_year)
+
+
+def equity_curve(close, buy_idx, sell_idx, shares=1.0, initial_cash=10000.0):
+    units = np.zeros(len(close))
+    units[buy_idx] += shares
+    units[sell_idx] -= shares  # a bar is never both a buy and a sell
+    position = np.cumsum(units)
+    price = np.nan_to_num(close)
+    cash = initial_cash - np.cumsum(units * price)
+    return cash + position * price
+
+
+def evaluate(close, sig, trade_limit, shares=1.0, initial_cash=10000.0, periods_per_year=252):
+    buy_idx, sell_idx = trade_bars(sig, trade_limit)
+    equity = equity_curve(close, buy_idx, sell_idx, shares, initial_cash)
+    trades = pd.DataFrame({
+        'side': ['BUY'] * len(buy_idx) + ['SELL'] * len(sell_idx),
+        'bar': np.concatenate([buy_idx, sell_idx]),
+        'price': np.concatenate([close[buy_idx], close[sell_idx]]),
+    }).sort_values('bar', kind='stable').reset_index(drop=True)
+    return trades, equity, summarize(equity, close[buy_idx], close[sell_idx], periods_per_year)
+
+
+def summarize(equity, buy_prices, sell_prices, periods_per_year=252):
+    returns = np.diff(equity) / equity[:-1] if len(equity) > 1 else np.array([0.0])
+    peak = np.maximum.accumulate(equity)
+    pnl = sell_prices - buy_prices[:len(sell_prices)]
+    std = returns.std()
+    return {
+        'total_return %': float((equity[-1] / equity[0] - 1) * 100) if len(equity) else 0.0,
+        'max_drawdown %': float(((equity - peak) / peak).min() * 100) if len(equity) else 0.0,
+        'sharpe': float(returns.mean() / std * np.sqrt(periods_per_year)) if std > 0 else 0.0,
+        'buys': len(buy_prices),
+        'sells': len(sell_prices),
+        'win_rate %': float((pnl > 0).mean() * 100) if len(pnl) else 0.0,
+    }
+
+
+# --- Parameter sweeps over a process pool, prices shared through shared memory ---
+
+_prices = None
+_shm = None
+
+
+def _attach(name, shape):
+    global _prices, _shm
+    _shm = shared_memory.SharedMemory(name=name)
+    _prices = np.ndarray(shape, dtype=np.float64, buffer=_shm.buf)
+
+
+def _sweep_task(args):
+    col, window_sizes, trade_limits, kwargs = args
+    close = _prices[:, col]
+    shares = kwargs.get('shares', 1.0)
+    initial_cash = kwargs.get('initial_cash', 10000.0)
+    results = []
+    for window_size in window_sizes:
+        sig = signals(close, window_size)  # one SMA per window, shared by every trade_limit
+        for trade_limit in trade_limits:
+            buy_idx, sell_idx = trade_bars(sig, trade_limit)
+            equity = equity_curve(close, buy_idx, sell_idx, shares, initial_cash)
+            stats = summarize(equity, close[buy_idx], close[sell_idx], kwargs.get('periods_per_year', 252))
+            results.append({'col': col, 'window_size': window_size, 'trade_limit': trade_limit, **stats})
+    return results
+
+
+def sweep(prices, window_sizes, trade_limits, workers=None, **kwargs):
+    # prices: DataFrame of closes (bars x symbols). Every worker maps the same block of shared memory
+    # instead of receiving a pickled copy of the price matrix with each task.
+    matrix = np.ascontiguousarray(prices.to_numpy(dtype=np.float64))
+    shm = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+    try:
+        np.ndarray(matrix.shape, dtype=np.float64, buffer=shm.buf)[:] = matrix
+        tasks = [(col, list(window_sizes), list(trade_limits), kwargs) for col in range(matrix.shape[1])]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                 initargs=(shm.name, matrix.shape)) as pool:
+            rows = list(itertools.chain.from_iterable(pool.map(_sweep_task, tasks, chunksize=8)))
+    finally:
+        shm.close()
+        shm.unlink()
+    result = pd.DataFrame(rows)
+    if not result.empty:
+        result.insert(0, 'symbol', np.asarray(prices.columns)[result.pop('col')])
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the SMA bot strategy")
+    parser.add_argument('--csv', default=data_path)
+    parser.add_argument('--window', type=int, default=5)
+    parser.add_argument('--limit', type=int, default=3)
+    parser.add_argument('--sweep', action='store_true', help="sweep windows 2-50 and limits 1-10")
+    args = parser.parse_args()
+
+    df = load_csv(args.csv)
+    if args.sweep:
+        print(sweep(df[['Close']], range(2, 51), range(1, 11)).sort_values('total_return %').tail(10))
+    else:
+        trades, equity, stats = run(df['Close'].to_numpy(), args.window, args.limit)
+        print(trades)
+        print(stats)
@@ -0,0 +1,318 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+import Metrics as metrics
+from Scheduler import exchange_now
+
+# Local OHLCV bar store: one directory per symbol/interval holding one .npy file per column,
+# so reads can memory-map the arrays and updates only download the bars after the last stored one
+# and only write those (plus the revised last bar) to the end of each file
+store_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bars')
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+INTRADAY = ['1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h']
+
+# How far back to go the first time a symbol/interval is fetched
+initial_lookback = {
+    '1m': pd.DateOffset(days=5),
+    '5m': pd.DateOffset(days=30),
+    '1d': pd.DateOffset(years=10),
+}
+# Yahoo only serves 1m bars for the last 7 days per request
+max_request_span = {'1m': pd.Timedelta(days=7)}
+
+
+def yf_downloader(symbol, start, end, interval):
+    # A list of symbols is fetched in one request and comes back with (Ticker, Price) columns.
+    # yfinance is imported here so reading the store (the dashboards, replays) never loads it.
+    import yfinance as yf
+    if isinstance(symbol, (list, tuple)):
+        return yf.download(list(symbol), start=start, end=end, interval=interval, progress=False,
+                           group_by='ticker', threads=True)
+    return yf.download(symbol, start=start, end=end, interval=interval, progress=False)
+
+
+class CsvDownloader:
+    # Stub downloader serving bars from a csv (e.g. BetaTestBot/data.csv) so the store works offline
+    def __init__(self, csv_path):
+        self.df = normalize(pd.read_csv(csv_path, index_col=0, parse_dates=[0]))
+        self.calls = []
+
+    def __call__(self, symbol, start, end, interval):
+        self.calls.append((symbol, start, end, interval))
+        index = self.df.index
+        df = self.df[(index >= pd.Timestamp(start)) & (index < pd.Timestamp(end))]
+        if isinstance(symbol, (list, tuple)):
+            return pd.concat({s: df for s in symbol}, axis=1)
+        return df
+
+
+downloader = yf_downloader  # swap for a CsvDownloader to run without network access
+# Held from reading a symbol's bars to writing the new ones, so the bot's downloads and the stream's
+# appends (Stream.Feed) never write the same files at once or work from a stale copy
+lock = threading.RLock()
+
+
+def normalize(df):
+    # yfinance returns (Price, Ticker) column levels and tz-aware intraday indexes; store flat columns
+    # and exchange wall-clock times, the same way auto_get_stock always has
+    if df is None or df.empty:
+        return pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([]))
+    df = df.copy()
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+    df.index = pd.to_datetime(df.index)
+    if df.index.tz is not None:
+        df.index = df.index.tz_localize(None)
+    df = df[[c for c in COLUMNS if c in df.columns]]
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    return df
+
+
+def _dir(symbol, interval):
+    return os.path.join(store_path, symbol.upper(), interval)
+
+
+def load_arrays(symbol, interval, mmap=True):
+    # Returns {'index': int64 ns, 'Open': ..., ...} as read-only memory maps, or None if nothing is stored
+    folder = _dir(symbol, interval)
+    if not os.path.exists(os.path.join(folder, 'index.npy')):
+        return None
+    mode = 'r' if mmap else None
+    arrays = {'index': np.load(os.path.join(folder, 'index.npy'), mmap_mode=mode)}
+    for col in COLUMNS:
+        file = os.path.join(folder, f'{col}.npy')
+        if os.path.exists(file):
+            arrays[col] = np.load(file, mmap_mode=mode)
+    # A crash mid-save can leave columns of different lengths; trust only the common prefix
+    n = min(len(a) for a in arrays.values())
+    return {k: a[:n] for k, a in arrays.items()}
+
+
+def load(symbol, interval):
+    arrays = load_arrays(symbol, interval)
+    if arrays is None:
+        return normalize(None)
+    index = pd.DatetimeIndex(np.asarray(arrays.pop('index')).astype('datetime64[ns]'))
+    index.name = 'Datetime' if interval in INTRADAY else 'Date'
+    return pd.DataFrame({k: np.asarray(a) for k, a in arrays.items()}, index=index)
+
+
+def save(symbol, interval, df):
+    folder = _dir(symbol, interval)
+    os.makedirs(folder, exist_ok=True)
+    columns = {col: df[col].to_numpy(dtype=np.int64 if col == 'Volume' else np.float64)
+               for col in COLUMNS if col in df.columns}
+    # Data columns first and the index last, each through a temp file, so readers never see a torn file
+    columns['index'] = df.index.values.astype('datetime64[ns]').view(np.int64)
+    for name, values in columns.items():
+        tmp = os.path.join(folder, f'{name}.tmp.npy')
+        np.save(tmp, values)
+        os.replace(tmp, os.path.join(folder, f'{name}.npy'))
+
+
+def _write_tail(path, values, at):
+    # Writes `values` into a 1-D .npy file from row `at` on, growing it in place: only those rows and the
+    # header's shape are written. False (nothing written) when the file cannot take it that way
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        if version not in ((1, 0), (2, 0)):
+            return False
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        offset = f.tell()
+        length = at + len(values)
+        prefix = 8 + (2 if version == (1, 0) else 4)  # magic, version and header length fields
+        header = repr({'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (length,)})
+        # np.save leaves room in the header for the row count to grow; the file never shrinks
+        if (len(shape) != 1 or fortran_order or dtype != values.dtype or not at <= shape[0] <= length
+                or len(header) >= offset - prefix):
+            return False
+        f.seek(offset + at * dtype.itemsize)
+        f.write(np.ascontiguousarray(values).tobytes())
+        f.seek(prefix)
+        f.write(header.encode('latin1').ljust(offset - prefix - 1) + b'\n')
+    return True
+
+
+def save_tail(symbol, interval, df, at):
+    # Same result as save(symbol, interval, df) when the first `at` rows of df are already stored.
+    # Data columns first and the index last, so a crash in between leaves the old bars readable
+    folder = _dir(symbol, interval)
+    stored = load_arrays(symbol, interval, mmap=True)
+    if (at <= 0 or stored is None or len(stored['index']) < at
+            or set(stored) != {'index'} | {c for c in COLUMNS if c in df.columns}):
+        save(symbol, interval, df)
+        return len(df)
+    del stored  # let go of the memory maps before growing the files
+    if not _write_rows(folder, df.iloc[at:], at):
+        save(symbol, interval, df)
+        return len(df)
+    return len(df) - at
+
+
+def _write_rows(folder, rows, at):
+    columns = {col: rows[col].to_numpy(dtype=np.int64 if col == 'Volume' else np.float64)
+               for col in COLUMNS if col in rows.columns}
+    columns['index'] = rows.index.values.astype('datetime64[ns]').view(np.int64)
+    return all(_write_tail(os.path.join(folder, f'{name}.npy'), values, at) for name, values in columns.items())
+
+
+def append(symbol, interval, new):
+    # Stores bars that follow the stored ones (or revise the stored tail) without loading the stored
+    # history, e.g. each minute's bars as they close on the stream
+    if new.empty:
+        return
+    with lock:
+        stored = load_arrays(symbol, interval, mmap=True)
+        if stored is not None and set(stored) == {'index'} | {c for c in COLUMNS if c in new.columns}:
+            ts = new.index.values.astype('datetime64[ns]').view(np.int64)
+            at = int(np.searchsorted(stored['index'], ts[0]))
+            follows = at > 0 and np.isin(stored['index'][at:], ts).all()
+            del stored  # let go of the memory maps before growing the files
+            if follows and _write_rows(_dir(symbol, interval), new, at):
+                metrics.inc('bot_store_rows_written_total', len(new), interval=interval)
+                return
+        store(symbol, interval, load(symbol, interval), new)
+
+
+def merge(old, new):
+    if old.empty:
+        return new
+    if new.empty:
+        return old
+    at = old.index.searchsorted(new.index[0])
+    if old.index[at:].isin(new.index).all():
+        # The usual update: bars after the stored ones, overlapping only the stored bars they revise
+        if 'Volume' in new.columns:
+            new = new.assign(Volume=new['Volume'].fillna(0))
+        return pd.concat([old.iloc[:at], new])
+    merged = pd.concat([old, new])
+    # The last stored bar may have been a partial one, so the freshly downloaded copy wins
+    merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+    if 'Volume' in merged.columns:
+        merged['Volume'] = merged['Volume'].fillna(0)
+    return merged
+
+
+def timed_fetch(fetch, symbols, start, end, interval):
+    # Download with its wall time, request count and the in-memory size of the response recorded
+    with metrics.timer('bot_download_seconds', interval=interval):
+        df = fetch(symbols, start, end, interval)
+    metrics.inc('bot_fetch_requests_total', interval=interval)
+    if df is not None:
+        # Every OHLCV value and timestamp is 8 bytes; DataFrame.memory_usage() costs milliseconds per call
+        metrics.inc('bot_fetch_bytes_total', 8 * (df.size + len(df.index)), interval=interval)
+    return df
+
+
+def clamp_start(start, end, interval, symbols):
+    # Yahoo cannot go further back than max_request_span; bars before that are lost, so say so
+    if interval not in max_request_span or start >= end - max_request_span[interval]:
+        return start
+    clamped = end - max_request_span[interval]
+    print(f"Warning: {interval} bars of {', '.join(symbols)} from {start} to {clamped} can no longer be "
+          f"downloaded; the store will have a gap there")
+    metrics.inc('bot_fetch_gaps_total', len(symbols), interval=interval)
+    return clamped
+
+
+def store(symbol, interval, stored, new):
+    # Merges new bars into the stored ones and writes only the rows from the first new bar on
+    merged = merge(stored, new)
+    at = int(stored.index.searchsorted(new.index[0])) if not stored.empty else 0
+    metrics.inc('bot_store_rows_written_total', save_tail(symbol, interval, merged, at), interval=interval)
+    return merged
+
+
+def store_finished(symbol, interval, stored, new, end):
+    # A daily bar dated `end`'s day is the session in progress: it is returned but not stored, so it can
+    # never pass for that day's official bar and the next download fetches it again
+    partial = new.iloc[:0]
+    if interval == '1d':
+        today = new.index.searchsorted(end.normalize())
+        new, partial = new.iloc[:today], new.iloc[today:]
+    merged = store(symbol, interval, stored, new) if not new.empty else stored
+    return merge(merged, partial)
+
+
+def update(symbol, interval='1d', fetch=None, now=None):
+    # Read the stored bars and download only the tail since the last stored timestamp
+    with lock:
+        fetch = fetch or downloader
+        end = pd.Timestamp(now) if now is not None else exchange_now()
+        stored = load(symbol, interval)
+        if stored.empty:
+            start = end - initial_lookback.get(interval, pd.DateOffset(days=30))
+        else:
+            start = clamp_start(stored.index[-1], end, interval, [symbol])
+        if interval in max_request_span:
+            start = max(start, end - max_request_span[interval])
+        new = normalize(timed_fetch(fetch, symbol, start, end, interval))
+        metrics.inc('bot_fetch_rows_total', len(new), interval=interval)
+        if new.empty:
+            return stored
+        return store_finished(symbol, interval, stored, new, end)
+
+
+def split_batch(df, symbols):
+    # Break a grouped (Ticker, Price) download into one normalized frame per symbol
+    frames = {}
+    for symbol in symbols:
+        if isinstance(df.columns, pd.MultiIndex) and symbol in df.columns.get_level_values(0):
+            frames[symbol] = normalize(df[symbol].dropna(how='all'))
+        else:
+            frames[symbol] = normalize(None)
+    return frames
+
+
+def update_many(symbols, interval='1d', fetch=None, now=None):
+    # Same as update() for a whole watchlist, but with one download per group of symbols that share
+    # a start date (normally two groups at most: never-stored symbols and everything else)
+    with lock:
+        fetch = fetch or downloader
+        end = pd.Timestamp(now) if now is not None else exchange_now()
+        stored = {symbol: load(symbol, interval) for symbol in symbols}
+        fresh = [s for s in symbols if stored[s].empty]
+        known = [s for s in symbols if not stored[s].empty]
+        groups = []
+        if fresh:
+            groups.append((fresh, end - initial_lookback.get(interval, pd.DateOffset(days=30))))
+        if known:
+            start = min(stored[s].index[-1] for s in known)
+            if interval in max_request_span:
+                behind = [s for s in known if stored[s].index[-1] < end - max_request_span[interval]]
+                start = clamp_start(start, end, interval, behind)
+            groups.append((known, start))
+
+        result = dict(stored)
+        for group, start in groups:
+            if interval in max_request_span:
+                start = max(start, end - max_request_span[interval])
+            for symbol, new in split_batch(timed_fetch(fetch, group, start, end, interval), group).items():
+                metrics.inc('bot_fetch_rows_total', len(new), interval=interval)
+                if new.empty:
+                    continue
+                result[symbol] = store_finished(symbol, interval, stored[symbol], new, end)
+        return result
+
+
+def seed_from_csv(symbol, interval, csv_path):
+    df = normalize(pd.read_csv(csv_path, index_col=0, parse_dates=[0]))
+    df = merge(load(symbol, interval), df)
+    save(symbol, interval, df)
+    return df
+
+
+def export_excel(symbols, interval='1m', start=None, end=None, path='stonks.xlsx'):
+    # The old stonks.xlsx, one sheet per symbol, produced from the store only when asked for
+    symbols = [symbols] if isinstance(symbols, str) else symbols
+    with pd.ExcelWriter(path) as writer:
+        for symbol in symbols:
+            df = load(symbol, interval)
+            if start is not None:
+                df = df[df.index >= pd.Timestamp(start)]
+            if end is not None:
+                df = df[df.index <= pd.Timestamp(end)]
+            df.to_excel(writer, sheet_name=symbol)
+    return path
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+# Compact bars for caches that hold many symbols (DisplayBeta's MarketData). A bar is one record of a
+# structured array: int64 epoch nanoseconds (exchange wall-clock, like the bar store), float32 prices and
+# a uint32 volume, 28 bytes against 48 for the same bar in a float64 DataFrame (1.7x smaller). Signals
+# and the screener stay on float64 DataFrames; DataFrames are rebuilt from these with to_frame().
+
+PRICES = ['Open', 'High', 'Low', 'Close']
+UINT32_MAX = np.iinfo(np.uint32).max
+
+
+def bar_dtype(volume=np.uint32):
+    return np.dtype([('ts', np.int64)] + [(c, np.float32) for c in PRICES] + [('Volume', volume)])
+
+
+DTYPE = bar_dtype()
+WIDE = bar_dtype(np.int64)  # when a volume does not fit 32 bits (some index and ETF daily bars)
+
+
+def _volume_dtype(volumes):
+    peak = max((np.nanmax(v) for v in volumes if len(v)), default=0)
+    return WIDE if peak > UINT32_MAX else DTYPE
+
+
+def fill(out, index, columns):
+    # Copy an int64 ns index and {column: values} into the records of `out`; missing prices are NaN
+    out['ts'] = index
+    for c in PRICES:
+        out[c] = columns[c] if c in columns else np.nan
+    out['Volume'] = np.nan_to_num(np.asarray(columns['Volume'], dtype=np.float64)) if 'Volume' in columns else 0
+
+
+def _index_ns(df):
+    return df.index.values.astype('datetime64[ns]').view(np.int64)
+
+
+def from_frame(df, dtype=None):
+    columns = {c: df[c].to_numpy() for c in PRICES + ['Volume'] if c in df.columns}
+    if dtype is None:
+        dtype = _volume_dtype([columns['Volume']] if 'Volume' in columns else [])
+    out = np.empty(len(df), dtype)
+    fill(out, _index_ns(df), columns)
+    return out
+
+
+def timestamps(arr):
+    # The ts field as datetime64[ns], still a view
+    return arr['ts'].view('datetime64[ns]')
+
+
+def to_frame(arr, name='Date'):
+    # float64 OHLCV DataFrame on a DatetimeIndex, the shape BarStore.load returns
+    index = pd.DatetimeIndex(timestamps(arr).copy(), name=name)
+    columns = {c: arr[c].astype(np.float64) for c in PRICES}
+    columns['Volume'] = arr['Volume'].astype(np.int64)
+    return pd.DataFrame(columns, index=index)
@@ -0,0 +1,148 @@
+import itertools
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+
+# Execution goes through a Broker so trading_bot does not care whether an order is clicked through the
+# browser (GuiBroker) or filled in memory against bar data (PaperBroker). Every order records when it
+# was submitted and filled, so decision-to-fill latency can be compared between adapters.
+
+_order_ids = itertools.count(1)
+
+
+@dataclass
+class Fill:
+    order_id: int
+    symbol: str
+    side: str
+    quantity: float
+    price: float
+    time: float
+
+
+@dataclass
+class Order:
+    symbol: str
+    side: str  # "BUY" or "SELL"
+    quantity: float
+    id: int = field(default_factory=lambda: next(_order_ids))
+    status: str = "NEW"  # NEW -> FILLED / CANCELLED / REJECTED
+    submitted_at: float = field(default_factory=time.perf_counter)
+    filled_at: float = None
+    fill: Fill = None
+
+    @property
+    def latency(self):
+        return None if self.filled_at is None else self.filled_at - self.submitted_at
+
+
+class Broker(ABC):
+    def __init__(self):
+        self.orders = {}
+        self._fills = []
+        self._positions = {}
+
+    @abstractmethod
+    def submit(self, symbol, side, quantity=1):
+        ...
+
+    def cancel(self, order_id):
+        order = self.orders.get(order_id)
+        if order is None or order.status != "NEW":
+            return False
+        order.status = "CANCELLED"
+        return True
+
+    def positions(self):
+        return dict(self._positions)
+
+    def fills(self):
+        return list(self._fills)
+
+    def update_prices(self, frames):
+        # Called once per cycle with {symbol: bars}; only brokers that price their own fills need it
+        pass
+
+    def latencies(self):
+        return [o.latency for o in self.orders.values() if o.latency is not None]
+
+    def _record_fill(self, order, price):
+        order.filled_at = time.perf_counter()
+        order.status = "FILLED"
+        order.fill = Fill(order.id, order.symbol, order.side, order.quantity, price, time.time())
+        self._fills.append(order.fill)
+        signed = order.quantity if order.side == "BUY" else -order.quantity
+        self._positions[order.symbol] = self._positions.get(order.symbol, 0) + signed
+        if self._positions[order.symbol] == 0:
+            del self._positions[order.symbol]
+        return order
+
+
+class GuiBroker(Broker):
+    # The existing pyautogui flow: blocks until the clicks are done; the fill price is not read back.
+    # The quantity is clicked into the order form, so a SELL closes `quantity` shares, not the position.
+    def __init__(self, actions=None):
+        super().__init__()
+        if actions is None:
+            import Actions as actions
+        self.act = actions
+
+    def submit(self, symbol, side, quantity=1):
+        order = Order(symbol, side, quantity)
+        self.orders[order.id] = order
+        if side == "BUY":
+            self.act.exec_trade(symbol, quantity)
+        else:
+            self.act.sell_trade(symbol, quantity)
+        return self._record_fill(order, None)
+
+
+class PaperBroker(Broker):
+    # In-memory fills against the latest bar. fill_on="close" fills immediately at the last close;
+    # fill_on="next_open" keeps orders pending (and cancellable) until the next bar arrives.
+    def __init__(self, slippage_bps=0.0, commission=0.0, fill_on="close", cash=100000.0):
+        super().__init__()
+        self.slippage_bps = slippage_bps
+        self.commission = commission
+        self.fill_on = fill_on
+        self.cash = cash
+        self.prices = {}
+        self.last_bar = {}
+        self.pending = []
+
+    def update_prices(self, frames):
+        for symbol, df in frames.items():
+            if df.empty or df.index[-1] == self.last_bar.get(symbol):
+                continue
+            self.last_bar[symbol] = df.index[-1]
+            self.prices[symbol] = float(df["Close"].iloc[-1])
+            opened = float(df["Open"].iloc[-1]) if "Open" in df.columns else self.prices[symbol]
+            for order in [o for o in self.pending if o.symbol == symbol]:
+                self.pending.remove(order)
+                if order.status == "NEW":
+                    self._fill(order, opened)
+
+    def set_price(self, symbol, price):
+        self.prices[symbol] = float(price)
+
+    def submit(self, symbol, side, quantity=1):
+        order = Order(symbol, side, quantity)
+        self.orders[order.id] = order
+        if side == "SELL" and self._positions.get(symbol, 0) < quantity:
+            order.status = "REJECTED"
+            return order
+        if self.fill_on == "next_open":
+            self.pending.append(order)
+            return order
+        if symbol not in self.prices:
+            order.status = "REJECTED"
+            return order
+        return self._fill(order, self.prices[symbol])
+
+    def _fill(self, order, price):
+        # Slippage always works against the order
+        slip = price * self.slippage_bps / 10000.0
+        price = price + slip if order.side == "BUY" else price - slip
+        value = price * order.quantity
+        self.cash += -value - self.commission if order.side == "BUY" else value - self.commission
+        return self._record_fill(order, price)
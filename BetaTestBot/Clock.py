@@ -0,0 +1,79 @@
+import time
+import pandas as pd
+
+# Where the bot gets "now" and how it waits. Live runs use the wall clock; Replay installs a VirtualClock
+# so the loop's sleeps and timestamps follow the replayed bars and a whole session runs in seconds.
+
+
+class SystemClock:
+    def now(self, tz=None):
+        return pd.Timestamp.now(tz)
+
+    def timestamp(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def finished(self):
+        return False
+
+
+class VirtualClock:
+    # Virtual time only moves when the bot sleeps. speed=None advances instantly (as fast as possible);
+    # speed=k also sleeps for real, 1/k of the virtual interval. With `events` (e.g. bar close times) a
+    # sleep that would pass no event jumps straight to the next one, so nights and weekends cost nothing.
+    # finished() once past `end`.
+    def __init__(self, start, end=None, speed=None, events=None):
+        self.current = pd.Timestamp(start)
+        self.end = pd.Timestamp(end) if end is not None else None
+        self.speed = speed
+        self.events = pd.DatetimeIndex(sorted(set(events))) if events is not None else None
+        self.sleeps = 0
+
+    def now(self, tz=None):
+        # Virtual time is already exchange wall-clock time, like the replayed bars
+        return self.current
+
+    def timestamp(self):
+        return self.current.timestamp()
+
+    def sleep(self, seconds):
+        self.sleeps += 1
+        target = self.current + pd.Timedelta(seconds=seconds)
+        if self.events is not None:
+            i = self.events.searchsorted(self.current, side='right')
+            if i < len(self.events) and self.events[i] > target:
+                target = self.events[i]
+        if self.speed:
+            # Skipped gaps are free in real time too
+            time.sleep(seconds / self.speed)
+        self.current = target
+
+    def finished(self):
+        return self.end is not None and self.current > self.end
+
+
+clock = SystemClock()
+
+
+def use(new_clock):
+    global clock
+    clock = new_clock
+    return new_clock
+
+
+def now(tz=None):
+    return clock.now(tz)
+
+
+def timestamp():
+    return clock.timestamp()
+
+
+def sleep(seconds):
+    clock.sleep(seconds)
+
+
+def finished():
+    return clock.finished()
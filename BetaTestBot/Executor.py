@@ -0,0 +1,106 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+import Metrics as metrics
+
+# Order execution on a worker thread so a slow broker (the GUI flow takes tens of seconds) never holds
+# up the signal loop. Intents wait in a bounded queue, one slot per symbol: a newer signal for a symbol
+# whose order has not started yet replaces the older one. Every intent carries a key, and a key is
+# only ever executed once, so re-submitting the same decision after an error cannot double-buy.
+
+
+class Intent:
+    def __init__(self, symbol, side, quantity, key):
+        self.symbol = symbol
+        self.side = side
+        self.quantity = quantity
+        self.key = key
+        self.created = time.perf_counter()
+
+
+class Executor:
+    def __init__(self, broker, maxsize=100, remember=10000):
+        self.broker = broker
+        self.queue = queue.Queue(maxsize=maxsize)  # carries symbols; the intent itself sits in self.latest
+        self.latest = {}
+        self.in_flight = {}
+        self.seen = OrderedDict()  # keys already queued or executed, oldest dropped past `remember`
+        self.remember = remember
+        self.completed = queue.Queue()  # (intent, order or exception) for the signal loop to apply
+        self.lock = threading.Lock()
+        self.running = True
+        self.worker = threading.Thread(target=self._run, name="order-executor", daemon=True)
+        self.worker.start()
+
+    def submit(self, symbol, side, quantity, key):
+        with self.lock:
+            if key in self.seen:
+                return False
+            queued = self.latest.get(symbol)
+            if queued is None:
+                try:
+                    self.queue.put_nowait(symbol)
+                except queue.Full:
+                    print(f"Execution queue full, dropping {side} {symbol}")
+                    metrics.inc('bot_orders_dropped_total', side=side)
+                    return False
+            else:
+                # Superseded before it started: forget the old key so that decision can be made again
+                self.seen.pop(queued.key, None)
+                print(f"Replacing queued {queued.side} {symbol} with {side}")
+                metrics.inc('bot_orders_replaced_total', side=side)
+            self.latest[symbol] = Intent(symbol, side, quantity, key)
+            self.seen[key] = True
+            while len(self.seen) > self.remember:
+                self.seen.popitem(last=False)
+            return True
+
+    def busy(self, symbol):
+        with self.lock:
+            return symbol in self.latest or symbol in self.in_flight
+
+    def idle(self):
+        # Nothing queued and nothing at the broker
+        with self.lock:
+            return not self.latest and not self.in_flight
+
+    def _run(self):
+        while self.running:
+            try:
+                symbol = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            with self.lock:
+                intent = self.latest.pop(symbol, None)
+                if intent is not None:
+                    self.in_flight[symbol] = intent
+            if intent is None:
+                continue
+            # Order-to-submit: time the intent spent queued behind other orders
+            started = time.perf_counter()
+            metrics.observe('bot_order_to_submit_seconds', started - intent.created, side=intent.side)
+            try:
+                result = self.broker.submit(intent.symbol, intent.side, intent.quantity)
+            except Exception as e:
+                # State at the broker is unknown; the key stays used so the same decision is never re-sent
+                result = e
+                metrics.inc('bot_errors_total', stage='submit')
+            metrics.observe('bot_broker_submit_seconds', time.perf_counter() - started, side=intent.side)
+            # Published before leaving in_flight, so idle() implies the result is ready to drain
+            self.completed.put((intent, result))
+            with self.lock:
+                self.in_flight.pop(symbol, None)
+
+    def drain(self):
+        # Everything that finished since the last call, in completion order
+        done = []
+        while True:
+            try:
+                done.append(self.completed.get_nowait())
+            except queue.Empty:
+                return done
+
+    def stop(self, timeout=None):
+        self.running = False
+        self.worker.join(timeout)
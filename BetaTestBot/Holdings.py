@@ -0,0 +1,311 @@
+import argparse
+import glob
+import hashlib
+import math
+import os
+import re
+import time
+from dataclasses import dataclass, field
+import numpy as np
+from PIL import Image
+import Clock as clock
+import Metrics as metrics
+from Locator import to_gray, default_screenshot
+
+# Reads the holdings table off the broker's portfolio page. The table is found once, by OCR of the whole
+# page for its header row, and only re-found when the header's pixels change. After that the table is cut
+# into row tiles around the lines of the quantity column, and a tile holds just the row's Symbol and quantity
+# cells, so live prices in the other columns do not touch it. A tile is OCR'd only when the hash of its
+# pixels is new; unchanged rows (also rows that merely moved up or down) reuse the text read before.
+# A reading only counts once the next one agrees with it, so a screenshot taken mid-render or a one-off
+# misread is never reconciled. pytesseract is imported on first use; the OCR functions and the screenshot
+# source can be swapped, e.g. to read saved screenshots offline with `--fixtures`.
+
+SYMBOL_HEADER = 'symbol'
+QUANTITY_HEADERS = ('qty', 'quantity', 'shares')
+TICKER = re.compile(r'^[A-Z][A-Z.\-]{0,5}$')
+NUMBER = re.compile(r'\d[\d,]*(?:\.\d+)?')
+
+
+def tesseract_words(gray):
+    # Words on the page as (text, left, top, width, height)
+    from pytesseract import pytesseract
+    data = pytesseract.image_to_data(Image.fromarray(gray), output_type=pytesseract.Output.DICT)
+    boxes = zip(data['text'], data['left'], data['top'], data['width'], data['height'])
+    return [(text, left, top, width, height) for text, left, top, width, height in boxes if text.strip()]
+
+
+def tesseract_text(gray):
+    from pytesseract import pytesseract
+    return pytesseract.image_to_string(Image.fromarray(gray), config='--psm 6')
+
+
+@dataclass
+class Layout:
+    # Rows are read from `top` down to `bottom`; symbol and quantity are (left, right) column spans
+    top: int
+    bottom: int
+    symbol: tuple
+    quantity: tuple
+    header: tuple  # (top, bottom) of the header row, whose pixels tell whether the layout still holds
+    header_hash: bytes = None
+
+
+@dataclass
+class Reading:
+    held: dict  # symbol -> shares shown by the broker
+    complete: bool  # False when a row was unreadable or rows may be off screen; missing symbols are then kept
+    rows: int = 0
+    confirmed: bool = False  # the previous reading showed the same holdings
+    cut_off: bool = False  # the last row reaches the bottom of the screenshot, more rows may be below it
+    recognised: int = 0  # tiles that had to be OCR'd this time
+    seconds: float = 0.0
+    unreadable: list = field(default_factory=list)
+
+
+def tile_hash(*cells):
+    digest = hashlib.blake2b(digest_size=16)
+    for cell in cells:
+        digest.update(np.asarray(cell.shape, dtype=np.int64).tobytes())
+        digest.update(np.ascontiguousarray(cell).tobytes())
+    return digest.digest()
+
+
+def find_layout(gray, words, pad=2):
+    # Header row: a "Symbol" word with a quantity word on the same line. A column spans from the end of
+    # the header word to its left to the start of the one to its right (numbers are often right-aligned)
+    for word in words:
+        if word[0].strip().lower() != SYMBOL_HEADER:
+            continue
+        top, height = word[2], word[4]
+        line = sorted((w for w in words if abs(w[2] - top) <= height), key=lambda w: w[1])
+        quantity = [w for w in line if w[0].strip().lower().rstrip('.:') in QUANTITY_HEADERS]
+        if not quantity:
+            continue
+
+        def span(w):
+            before = [x[1] + x[3] for x in line if x[1] + x[3] <= w[1]]
+            after = [x[1] for x in line if x[1] >= w[1] + w[3]]
+            return (max(before) + pad if before else 0, min(after) - pad if after else gray.shape[1])
+
+        header = (min(w[2] for w in line), max(w[2] + w[4] for w in line))
+        layout = Layout(header[1] + pad, gray.shape[0], span(word), span(quantity[0]), header)
+        layout.header_hash = tile_hash(gray[header[0]:header[1]])
+        return layout
+    return None
+
+
+def text_rows(strip, threshold=40):
+    # Which pixel rows of `strip` hold text; rules drawn across the whole strip do not count
+    ink = np.abs(strip.astype(np.int16) - np.median(strip)) > threshold
+    share = ink.mean(axis=1)
+    return (share > 0) & (share < 0.9)
+
+
+def ink_bands(strip, min_gap=4):
+    # (start, stop) runs of text rows of `strip`, split at blank runs of at least min_gap pixels. The
+    # table ends at the first blank run more than twice as tall as the widest one before it
+    inked = np.flatnonzero(text_rows(strip))
+    if not len(inked):
+        return []
+    breaks = np.flatnonzero(np.diff(inked) > min_gap)
+    starts, stops = inked[np.r_[0, breaks + 1]], inked[np.r_[breaks, len(inked) - 1]] + 1
+    gaps = starts[1:] - stops[:-1]
+    for i in range(1, len(gaps)):
+        if gaps[i] > 2 * gaps[:i].max():
+            return list(zip(starts[:i + 1], stops[:i + 1]))
+    return list(zip(starts, stops))
+
+
+def row_bounds(bands, height):
+    # A quantity cell is one line per row, so each of its bands anchors a row, padded by half the
+    # narrowest gap between rows: a multi-line symbol cell (ticker over company name) stays in one tile,
+    # and a row's tile is the same pixels wherever the row sits in the table
+    gaps = [start - stop for (_, stop), (start, _) in zip(bands, bands[1:])]
+    pad = min(gaps) // 2 if gaps else 4
+    return [(max(start - pad, 0), min(stop + pad, height)) for start, stop in bands]
+
+
+def runs_off(bands, height):
+    # The table may continue below the screenshot unless the last row is followed by more blank space
+    # than separates two rows (a single row: more than its own height)
+    if not bands:
+        return False
+    gaps = [start - stop for (_, stop), (start, _) in zip(bands, bands[1:])]
+    return height - bands[-1][1] <= (min(gaps) if gaps else bands[-1][1] - bands[-1][0])
+
+
+def parse_symbol(text):
+    for token in text.split():
+        token = token.strip('|:;,*')
+        if TICKER.match(token):
+            return token
+    return None
+
+
+def parse_quantity(text):
+    match = NUMBER.search(text)
+    if match is None:
+        return None
+    shares = float(match.group().replace(',', ''))
+    return int(shares) if shares.is_integer() else shares
+
+
+class HoldingsReader:
+    def __init__(self, screenshot=None, words=tesseract_words, text=tesseract_text, navigate=None, record=None):
+        self.screenshot = screenshot or default_screenshot
+        self.words = words
+        self.text = text
+        self.navigate = navigate  # e.g. Actions.open_portfolio, run before every screenshot
+        self.record = record  # folder the screenshots are saved to, to replay them later with saved_screens
+        self.layout = None
+        self.last = None  # previous reading, which the next one has to agree with
+        self.rows = {}  # tile hash -> (symbol, shares), or None if the tile could not be read
+        self.reads = 0
+        self.layout_scans = 0
+        self.recognised = 0
+
+    def read(self):
+        if self.navigate is not None:
+            self.navigate()
+        screen = self.screenshot()
+        if self.record:
+            os.makedirs(self.record, exist_ok=True)
+            Image.fromarray(to_gray(screen)).save(os.path.join(self.record, f'holdings-{self.reads:05d}.png'))
+        return self.read_screen(to_gray(screen))
+
+    def _layout(self, gray):
+        layout = self.layout
+        if layout is not None and layout.bottom == gray.shape[0]:
+            if tile_hash(gray[layout.header[0]:layout.header[1]]) == layout.header_hash:
+                return layout
+        # First read, or the page scrolled or changed: one full-page OCR to find the table again
+        self.layout_scans += 1
+        metrics.inc('bot_holdings_layout_scans_total')
+        self.layout = find_layout(gray, self.words(gray))
+        return self.layout
+
+    def _recognise(self, symbol_cell, quantity_cell):
+        self.recognised += 1
+        symbol = parse_symbol(self.text(symbol_cell))
+        shares = parse_quantity(self.text(quantity_cell))
+        return None if symbol is None or shares is None else (symbol, shares)
+
+    def read_screen(self, gray):
+        start = time.perf_counter()
+        self.reads += 1
+        layout = self._layout(gray)
+        if layout is None:
+            self.last = None
+            metrics.inc('bot_holdings_reads_total', result='no_table')
+            return None
+        table = gray[layout.top:layout.bottom]
+        columns = [table[:, slice(*layout.symbol)], table[:, slice(*layout.quantity)]]
+        rows, recognised = {}, 0
+        reading = Reading({}, True)
+        text = text_rows(np.hstack(columns))
+        bands = ink_bands(columns[1])
+        if runs_off(bands, len(table)):
+            reading.complete = False
+            reading.cut_off = True
+        for top, bottom in row_bounds(bands, len(table)):
+            # Trimmed to its text, so the rules between rows are not part of the tile
+            inked = np.flatnonzero(text[top:bottom])
+            if not len(inked):
+                # Ink but no text, e.g. the placeholder bars of a page still loading: nothing to read, and
+                # the holdings it stands for are not known
+                reading.complete = False
+                continue
+            top, bottom = top + inked[0], top + inked[-1] + 1
+            cells = [column[top:bottom] for column in columns]
+            key = tile_hash(*cells)
+            if key not in rows:
+                if key in self.rows:
+                    rows[key] = self.rows[key]
+                else:
+                    rows[key] = self._recognise(*cells)
+                    recognised += 1
+            row = rows[key]
+            reading.rows += 1
+            if row is None:
+                reading.complete = False
+                reading.unreadable.append(layout.top + top)
+                continue
+            reading.held[row[0]] = reading.held.get(row[0], 0) + row[1]
+        self.rows = rows  # only tiles still on the page are remembered
+        previous, self.last = self.last, reading
+        reading.confirmed = (previous is not None and previous.held == reading.held
+                             and previous.complete == reading.complete)
+        reading.recognised = recognised
+        reading.seconds = time.perf_counter() - start
+        metrics.inc('bot_holdings_reads_total', result='complete' if reading.complete else 'partial')
+        if not reading.confirmed:
+            metrics.inc('bot_holdings_reads_unconfirmed_total')
+        metrics.inc('bot_holdings_tiles_recognised_total', recognised)
+        metrics.observe('bot_holdings_read_seconds', reading.seconds)
+        return reading
+
+
+def reconcile(portfolio, reading, journal=None, lot_size=1, prices=None):
+    # Sets each symbol to the shares the broker shows and returns the 'reconcile' events applied; they are
+    # journaled, so a restart replays them like fills. Nothing is changed until a second reading has agreed
+    # with the first, and a held symbol missing from the table is only closed out when every row was read
+    if not reading.confirmed:
+        return []
+    prices = prices or {}
+    held = dict(reading.held)
+    if reading.complete:
+        for symbol in list(portfolio.positions) + list(portfolio.holdings):
+            held.setdefault(symbol, 0)
+    events = []
+    for symbol, shares in sorted(held.items()):
+        previous = portfolio.positions.get(symbol, {}).get('shares', 0)
+        lots = math.ceil(shares / lot_size) if shares > 0 else 0
+        if shares == previous and lots == portfolio.holdings.get(symbol, 0):
+            continue
+        data = {'symbol': symbol, 'shares': shares, 'previous': previous, 'lots': lots,
+                'price': prices.get(symbol), 'date': str(clock.now().date())}
+        event = journal.record('reconcile', sync=True, **data) if journal else {'kind': 'reconcile', **data}
+        portfolio.apply(event)
+        metrics.inc('bot_holdings_reconciled_total')
+        events.append(event)
+    return events
+
+
+def saved_screens(folder):
+    # Screenshot source replaying the PNGs in `folder` in name order, e.g. ones saved with record=
+    files = sorted(glob.glob(os.path.join(folder, '*.png')))
+    if not files:
+        raise FileNotFoundError(f"No screenshots in {folder}")
+    screens = iter(files)
+    return lambda: Image.open(next(screens))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read the holdings table off the broker's portfolio page")
+    parser.add_argument('--fixtures', help="folder of saved screenshots, read in name order instead of the screen")
+    parser.add_argument('--record', help="folder to save every screenshot read to")
+    parser.add_argument('--reads', type=int, default=None, help="number of reads (default: every fixture, or 1)")
+    parser.add_argument('--interval', type=float, default=5.0, help="seconds between live reads")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        count = args.reads or len(glob.glob(os.path.join(args.fixtures, '*.png')))
+        reader = HoldingsReader(saved_screens(args.fixtures), record=args.record)
+    else:
+        import Actions as act
+        count = args.reads or 1
+        reader = HoldingsReader(navigate=act.open_portfolio, record=args.record)
+    for i in range(count):
+        if i and not args.fixtures:
+            time.sleep(args.interval)
+        reading = reader.read()
+        if reading is None:
+            print(f"Read {i + 1}: holdings table not found")
+            continue
+        print(f"Read {i + 1}: {reading.rows} rows, {reading.recognised} OCR'd, {reading.seconds:.3f}s"
+              f"{'' if reading.confirmed else ', not confirmed yet'}"
+              f"{', table runs off the screen' if reading.cut_off else ''}"
+              f"{f', unreadable rows at y={reading.unreadable}' if reading.unreadable else ''}")
+        print(f"  {reading.held}")
+    print(f"{reader.reads} reads, {reader.layout_scans} full-page scans, {reader.recognised} row tiles OCR'd")
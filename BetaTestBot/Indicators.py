@@ -0,0 +1,176 @@
+import math
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# Streaming indicators: each object takes one bar at a time and updates in constant time, so the live
+# loop no longer re-runs rolling().mean() over the whole history on every tick. The arithmetic mirrors
+# pandas' own rolling/ewm kernels step for step so the values match the DataFrame path bit for bit.
+
+
+class SMA:
+    # Same as df["Close"].rolling(window).mean()
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.last_ts = None
+        self.value = math.nan
+        self._saved = None
+        self._reset()
+
+    def _reset(self):
+        self.nobs = 0
+        self.neg_ct = 0
+        self.sum_x = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.same_ct = 0
+        self.prev = math.nan
+
+    def _state(self):
+        return (self.nobs, self.neg_ct, self.sum_x, self.comp_add, self.comp_remove, self.same_ct,
+                self.prev, self.value, self.last_ts, deque(self.values))
+
+    def _restore(self, state):
+        (self.nobs, self.neg_ct, self.sum_x, self.comp_add, self.comp_remove, self.same_ct,
+         self.prev, self.value, self.last_ts, self.values) = state
+
+    def _add(self, val):
+        if val == val:
+            self.nobs += 1
+            y = val - self.comp_add
+            t = self.sum_x + y
+            self.comp_add = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, val) < 0:
+                self.neg_ct += 1
+            if val == self.prev:
+                self.same_ct += 1
+            else:
+                self.same_ct = 1
+            self.prev = val
+
+    def _remove(self, val):
+        if val == val:
+            self.nobs -= 1
+            y = -val - self.comp_remove
+            t = self.sum_x + y
+            self.comp_remove = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, val) < 0:
+                self.neg_ct -= 1
+
+    def _mean(self):
+        if self.nobs >= self.window and self.nobs > 0:
+            result = self.sum_x / self.nobs
+            if self.same_ct >= self.nobs:
+                result = self.prev
+            elif self.neg_ct == 0 and result < 0:
+                result = 0.0
+            elif self.neg_ct == self.nobs and result > 0:
+                result = 0.0
+            return result
+        return math.nan
+
+    def update(self, value, ts=None):
+        # A repeated timestamp means the last (partial) bar was revised: roll back, then apply it again
+        if ts is not None and ts == self.last_ts and self._saved is not None:
+            self._restore(self._saved)
+        self._saved = self._state()
+        value = float(value)
+        self.values.append(value)
+        if len(self.values) > self.window:
+            self._remove(self.values.popleft())
+        if len(self.values) == 1:
+            # pandas starts a fresh sum whenever the window no longer overlaps the previous one
+            self._reset()
+            self.prev = value
+            self.same_ct = 0
+        self._add(value)
+        self.last_ts = ts
+        self.value = self._mean()
+        return self.value
+
+
+class EMA:
+    # Same as df["Close"].ewm(span=span, adjust=False).mean()
+    def __init__(self, span):
+        self.span = span
+        com = (span - 1) / 2.0
+        self.alpha = 1.0 / (1.0 + com)
+        self.value = math.nan
+        self.old_wt = 1.0
+        self.last_ts = None
+        self._saved = None
+
+    def update(self, value, ts=None):
+        if ts is not None and ts == self.last_ts and self._saved is not None:
+            self.value, self.old_wt = self._saved
+        self._saved = (self.value, self.old_wt)
+        value = float(value)
+        weighted = self.value
+        if weighted == weighted:
+            # Missing bars still decay the old weight, as with ewm(ignore_na=False)
+            self.old_wt *= 1.0 - self.alpha
+            if value == value:
+                if weighted != value:
+                    weighted = self.old_wt * weighted + self.alpha * value
+                    weighted /= (self.old_wt + self.alpha)
+                self.old_wt = 1.0
+        elif value == value:
+            weighted = value
+        self.value = weighted
+        self.last_ts = ts
+        return self.value
+
+
+class IndicatorEngine:
+    # One set of streaming indicators per symbol, e.g. {'SMA': lambda: SMA(5)}
+    def __init__(self, factories):
+        self.factories = factories
+        self.state = {}
+
+    def indicators(self, symbol):
+        if symbol not in self.state:
+            self.state[symbol] = {name: make() for name, make in self.factories.items()}
+        return self.state[symbol]
+
+    def warm_up(self, symbol, df, column="Close"):
+        # Feed stored history once; later calls to update() only see new bars
+        self.state.pop(symbol, None)
+        for ts, value in zip(df.index, _column(df, column)):
+            self.update(symbol, value, ts)
+        return self.values(symbol)
+
+    def update(self, symbol, value, ts=None):
+        for indicator in self.indicators(symbol).values():
+            indicator.update(value, ts)
+        return self.values(symbol)
+
+    def update_from(self, symbol, df, column="Close"):
+        # Push every bar of df at or after the last one seen (the last bar may have been revised)
+        indicators = self.indicators(symbol)
+        last_ts = next(iter(indicators.values())).last_ts if indicators else None
+        new = df if last_ts is None else df.iloc[df.index.searchsorted(last_ts):]
+        for ts, value in zip(new.index, _column(new, column)):
+            self.update(symbol, value, ts)
+        return self.values(symbol)
+
+    def values(self, symbol):
+        return {name: ind.value for name, ind in self.indicators(symbol).items()}
+
+
+def _column(df, column):
+    values = df[column]
+    if isinstance(values, pd.DataFrame):  # yfinance (Price, Ticker) columns
+        values = values.iloc[:, 0]
+    return values.to_numpy(dtype=np.float64)
+
+
+def check_parity(df, window_size, column="Close"):
+    # Runs the streaming SMA over df and compares it with the pandas path; returns the number of mismatches
+    expected = pd.Series(_column(df, column)).rolling(window=window_size).mean().to_numpy()
+    sma = SMA(window_size)
+    got = np.array([sma.update(v) for v in _column(df, column)])
+    same = (got == expected) | (np.isnan(got) & np.isnan(expected))
+    return int((~same).sum())
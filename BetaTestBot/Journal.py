@@ -0,0 +1,133 @@
+import json
+import os
+import Clock as clock
+
+# Append-only journal of signals, orders and fills (one JSON object per line) plus a compact snapshot
+# of the portfolio state. The snapshot remembers the byte offset of the journal it covers, so a restart
+# loads the snapshot and replays only the events written after it.
+
+journal_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'journal')
+
+
+class Journal:
+    def __init__(self, folder=None, snapshot_every=500):
+        folder = folder or journal_path
+        self.folder = folder
+        self.events_file = os.path.join(folder, 'events.jsonl')
+        self.snapshot_file = os.path.join(folder, 'snapshot.json')
+        self.snapshot_every = snapshot_every
+        self.seq = 0
+        self.since_snapshot = 0
+        self.file = None
+
+    def _open(self):
+        if self.file is None:
+            os.makedirs(self.folder, exist_ok=True)
+            self.file = open(self.events_file, 'a', encoding='utf-8')
+        return self.file
+
+    def record(self, kind, sync=False, **data):
+        # sync=True fsyncs before returning; used for fills, which are the events state is rebuilt from
+        self.seq += 1
+        event = {'seq': self.seq, 'time': clock.timestamp(), 'kind': kind, **data}
+        f = self._open()
+        f.write(json.dumps(event, default=str) + '\n')
+        f.flush()
+        if sync:
+            os.fsync(f.fileno())
+        self.since_snapshot += 1
+        return event
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.snapshot_file):
+            return {'seq': 0, 'offset': 0, 'state': None}
+        with open(self.snapshot_file, encoding='utf-8') as f:
+            return json.load(f)
+
+    def tail(self, offset=0):
+        # Events written after byte `offset`; a half-written last line from a crash is skipped, and so is
+        # any line that does not parse (a torn write that an older version appended to), with a warning
+        if not os.path.exists(self.events_file):
+            return
+        with open(self.events_file, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    print(f"Skipped unreadable journal line at byte {f.tell() - len(line)}: {line[:80]!r}")
+
+    def trim(self):
+        # Cuts a half-written last line off the events file, so the next record starts on a line of its own
+        # instead of being glued to the fragment. Returns the number of bytes removed
+        if not os.path.exists(self.events_file):
+            return 0
+        with open(self.events_file, 'rb+') as f:
+            size = end = f.seek(0, os.SEEK_END)
+            while end > 0:
+                step = min(end, 4096)
+                f.seek(end - step)
+                newline = f.read(step).rfind(b'\n')
+                if newline >= 0:
+                    end = end - step + newline + 1
+                    break
+                end -= step
+            if end < size:
+                f.truncate(end)
+                f.flush()
+                os.fsync(f.fileno())
+        if end < size:
+            print(f"Removed {size - end} bytes of a half-written journal event")
+        return size - end
+
+    def restore(self, portfolio):
+        # Load the snapshot into `portfolio`, replay the tail and return how many events were replayed.
+        # Only for the process that writes the journal: the torn tail is cut off first
+        self.close()
+        self.trim()
+        return self.replay(portfolio)
+
+    def replay(self, portfolio):
+        # restore() without touching the files, so another process can read a journal that is being written
+        snap = self._read_snapshot()
+        if snap['state'] is not None:
+            portfolio.load_state(snap['state'])
+        self.seq = snap['seq']
+        replayed = 0
+        for event in self.tail(snap['offset']):
+            portfolio.apply(event)
+            self.seq = event['seq']
+            replayed += 1
+        self.since_snapshot = replayed
+        return replayed
+
+    def snapshot(self, portfolio):
+        f = self._open()
+        f.flush()
+        snap = {'seq': self.seq, 'offset': f.tell(), 'time': clock.timestamp(), 'state': portfolio.state()}
+        tmp = self.snapshot_file + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as out:
+            json.dump(snap, out, default=str)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, self.snapshot_file)
+        self.since_snapshot = 0
+
+    def maybe_snapshot(self, portfolio):
+        if self.since_snapshot >= self.snapshot_every:
+            self.snapshot(portfolio)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def read_positions(folder=None):
+    # Current holdings as {symbol: {'shares', 'cost', 'entry_date'}}, for readers such as DisplayBeta
+    from Portfolio import Portfolio
+    portfolio = Portfolio(trade_limit=0)
+    Journal(folder).replay(portfolio)
+    return portfolio.positions
@@ -0,0 +1,87 @@
+import os
+import time
+import cv2
+import numpy as np
+from PIL import Image
+
+# Template matching for the GUI flow. Every asset is loaded and converted to grayscale once, each lookup
+# tries the area where that asset was last found before searching the whole screen, and several assets
+# can be matched against the same screenshot instead of grabbing a new one per asset.
+
+
+def to_gray(image):
+    if isinstance(image, np.ndarray):
+        return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    if isinstance(image, str):
+        image = Image.open(image)
+    return np.asarray(image.convert('L'))
+
+
+def default_screenshot():
+    import pyautogui as pag
+    return pag.screenshot()
+
+
+class Locator:
+    def __init__(self, asset_dir, confidence=0.8, margin=40, screenshot=None):
+        self.confidence = confidence
+        self.margin = margin  # pixels around the last hit that make up the first search region
+        self.screenshot = screenshot or default_screenshot
+        self.templates = {}
+        for file in sorted(os.listdir(asset_dir)):
+            if file.lower().endswith('.png'):
+                self.templates[file] = to_gray(os.path.join(asset_dir, file))
+        self.regions = {}   # asset -> (left, top, right, bottom) of the last match, in screenshot pixels
+        self.timings = {}   # asset -> [lookups, total seconds, slowest seconds], kept running for a long-lived bot
+        self.region_hits = {}
+
+    def grab(self):
+        return to_gray(self.screenshot())
+
+    def _match(self, name, haystack, left=0, top=0):
+        template = self.templates[name]
+        h, w = template.shape
+        if haystack.shape[0] < h or haystack.shape[1] < w:
+            return None
+        scores = cv2.matchTemplate(haystack, template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (x, y) = cv2.minMaxLoc(scores)
+        if score < self.confidence:
+            return None
+        return (left + x, top + y, left + x + w, top + y + h)
+
+    def find(self, image, screen=None):
+        # Returns the centre (x, y) of `image` in screenshot pixels, or None if it is not on screen
+        name = os.path.basename(image)
+        screen = self.grab() if screen is None else to_gray(screen)
+        start = time.perf_counter()
+        box = None
+        if name in self.regions:
+            l, t, r, b = self.regions[name]
+            l, t = max(l - self.margin, 0), max(t - self.margin, 0)
+            r, b = min(r + self.margin, screen.shape[1]), min(b + self.margin, screen.shape[0])
+            box = self._match(name, screen[t:b, l:r], l, t)
+            if box:
+                self.region_hits[name] = self.region_hits.get(name, 0) + 1
+        if box is None:
+            box = self._match(name, screen)
+        elapsed = time.perf_counter() - start
+        timing = self.timings.setdefault(name, [0, 0.0, 0.0])
+        timing[0] += 1
+        timing[1] += elapsed
+        timing[2] = max(timing[2], elapsed)
+        if box is None:
+            return None
+        self.regions[name] = box
+        return ((box[0] + box[2]) // 2, (box[1] + box[3]) // 2)
+
+    def find_any(self, images, screen=None):
+        # One screenshot, every candidate matched against it: {image: centre or None}
+        screen = self.grab() if screen is None else to_gray(screen)
+        return {image: self.find(image, screen) for image in images}
+
+    def report(self):
+        return {name: {'lookups': lookups,
+                       'mean_ms': 1000 * total / lookups,
+                       'max_ms': 1000 * slowest,
+                       'region_hits': self.region_hits.get(name, 0)}
+                for name, (lookups, total, slowest) in self.timings.items()}
@@ -4,27 +4,49 @@ import time
 import matplotlib.pyplot as plt
 import numpy as np
 import Actions as act
+import Resample as rs
+import Holdings
+import Stream
+import Indicators as ind
+from Portfolio import Portfolio, load_watchlist
+from Broker import GuiBroker, PaperBroker
+from Executor import Executor
+from Journal import Journal
+import Metrics as metrics
+import Clock as clock
+from Scheduler import Scheduler, FixedCadence
 
 # Parameters
 symbol = "AAPL"
+watchlist = [symbol]  # e.g. load_watchlist(20) to trade the first 20 names of constituents.csv
 window_size = 5  # Set to a smaller value for quick calculations
-trade_limit = 3  # A smaller trade limit for testing
-trade_count = 0  # Start with no trades
-portfolio = {"holdings": 0, "symbols": []}  # Initialize portfolio as dictionary
-first_run = False  # Flag to track first execution change to true to view bot execution feature for fetching current holding straight from portfolio has not been implemented yet 
+trade_limit = 3  # A smaller trade limit per symbol for testing
+lot_size = 10  # Shares per order; GuiBroker clicks it into the order form's quantity for buys and sells
+portfolio = Portfolio(trade_limit)  # Per-symbol trade counts and holdings
+broker = None  # GuiBroker() clicks through the browser; PaperBroker() fills in memory from the same bars
+schedule = "market"  # "market" wakes just after each bar close in NYSE sessions; "fixed" polls every cycle_seconds
+cycle_seconds = 20  # Cadence of the "fixed" schedule, kept regardless of how long execution takes
+interval = '1d'  # Bar size the signals run on; Replay sets it to the bars it streams
+first_run = False  # Change to true to force an initial BUY per symbol; holdings are restored from the journal on startup
+stream_url = None  # e.g. "ws://localhost:8765" (python Stream.py serve): 1m bars are built from streamed ticks and every close wakes the loop at once, instead of downloading them on the schedule
+sync_holdings = False  # True reads the holdings table off the broker's portfolio page and reconciles it every cycle (GUI broker)
+journal = None  # Journal of signals, orders and fills, opened by trading_bot
+last_close = {}  # symbol -> latest close, used to price fills the broker cannot report (GUI)
 
 def fetch_stock_data(symbol):
-    years = 10
-    end_date = pd.Timestamp.now()
-    start_date = end_date - pd.DateOffset(years=years)
-    df = yf.download(symbol, start=start_date, end=end_date)
+    # Bars of `interval` (ten years of daily bars by default) from the local bar store, with the latest ones built from the stored 1m bars
+    df = rs.update_many([symbol], interval)[symbol]
     return df
 
+def fetch_stock_data_many(symbols):
+    # Bars for every symbol as {symbol: DataFrame}, resampled from the 1m bars auto_get_stock just stored; only gaps are downloaded, in one batched request
+    return rs.update_many(symbols, interval)
+
 def calculate_moving_average(df, window_size):
     df["SMA"] = df["Close"].rolling(window=window_size).mean()
     return df
 
-def determine_trade_signal(df, is_first_run=False):
+def determine_trade_signal(df, is_first_run=False, recent_sma=None):
     print(is_first_run)
     if is_first_run:
         print("First run - executing initial BUY signal")
@@ -35,7 +57,9 @@ def determine_trade_signal(df, is_first_run=False):
     
     # Convert Series to scalar values using .iloc[-1].item()
     recent_close = df["Close"].iloc[-1].item() if isinstance(df["Close"].iloc[-1], pd.Series) else df["Close"].iloc[-1]
-    recent_sma = df["SMA"].iloc[-1].item() if isinstance(df["SMA"].iloc[-1], pd.Series) else df["SMA"].iloc[-1]
+    # recent_sma comes from the streaming indicator state when the caller has it
+    if recent_sma is None:
+        recent_sma = df["SMA"].iloc[-1].item() if isinstance(df["SMA"].iloc[-1], pd.Series) else df["SMA"].iloc[-1]
     
     print(f"Recent Close: {recent_close}, Recent SMA: {recent_sma}")
     
@@ -52,53 +76,215 @@ def determine_trade_signal(df, is_first_run=False):
     else:
         return "HODL"
 
-def trading_bot(symbol, window_size, trade_limit):
-    global trade_count, portfolio, first_run
+def apply_fill(order, decided_at=None):
+    # The portfolio only changes once the broker reports the order filled
+    if order.status != "FILLED":
+        return False
+    price = order.fill.price if order.fill.price is not None else last_close.get(order.symbol)
+    event = journal.record("fill", sync=True, symbol=order.symbol, side=order.side, quantity=order.quantity,
+                           price=price, order_id=order.id, date=str(clock.now().date()))
+    portfolio.apply(event)
+    print(f"{order.symbol} {'bought' if order.side == 'BUY' else 'sold'}")
+    if order.latency is not None:
+        print(f"{order.side} {order.symbol} filled in {order.latency:.3f}s")
+    metrics.inc('bot_fills_total', side=order.side)
+    if decided_at is not None:
+        print(f"{order.side} {order.symbol} decision-to-fill {order.filled_at - decided_at:.3f}s")
+        metrics.observe('bot_decision_to_fill_seconds', order.filled_at - decided_at, side=order.side)
+    return True
+
+def sync_broker_holdings(reader):
+    # Only called with no order in flight, so the page shows exactly the fills the portfolio has applied
+    try:
+        reading = reader.read()
+    except Exception as e:
+        print(f"Reading holdings failed: {str(e)}")
+        metrics.inc('bot_errors_total', stage='holdings')
+        return
+    if reading is None:
+        print("Holdings table not found on the portfolio page")
+        return
+    if reading.cut_off:
+        print("Holdings table runs past the bottom of the page, symbols not shown are left as they are")
+    for event in Holdings.reconcile(portfolio, reading, journal, lot_size, last_close):
+        print(f"Reconciled {event['symbol']} with the broker: {event['previous']} -> {event['shares']} shares")
+
+def wait_for_bars(closes, symbols, feed):
+    # Blocks until bars of a watched symbol close and returns their batch, or None once the feed disconnects.
+    # A batch the loop was too slow for loses nothing: the bars are in the store, only the wake-up is skipped
+    while feed.connected.is_set():
+        batch = closes.get(timeout=1)
+        if closes.lagged:
+            print(f"Signal loop fell behind the stream, {closes.dropped} bar batches skipped")
+            closes.lagged = False
+        if batch is not None and any(symbol in batch.bars for symbol in symbols):
+            # Closes queued behind it are covered by the same cycle, which reads every bar from the store;
+            # latency is still counted from this, the oldest one
+            for later in closes.drain():
+                batch.bars.update(later.bars)
+            metrics.inc('bot_wakeups_total', reason='stream')
+            return batch
+    return None
+
+def order_key(symbol, side, bar):
+    # Same symbol, side, bar and position state means the same decision, which must only be executed once
+    return (symbol, side, bar, portfolio.trade_count.get(symbol, 0), portfolio.holdings.get(symbol, 0))
+
+def handle_result(intent, result, pending):
+    if isinstance(result, Exception):
+        metrics.inc('bot_orders_failed_total', side=intent.side)
+        print(f"{intent.side} {intent.symbol} failed: {result} - not retried, check the broker before resuming")
+    elif not apply_fill(result, getattr(intent, "created", None)):
+        if result.status == "NEW":
+            pending[intent.symbol] = result
+        else:
+            print(f"{result.side} order for {intent.symbol} {result.status.lower()}")
+
+def trading_bot(symbols, window_size, trade_limit, broker=None):
+    global portfolio, journal
+    if isinstance(symbols, str):
+        symbols = [symbols]
+    broker = broker or GuiBroker(act)
+    portfolio = Portfolio(trade_limit, first_run=first_run)
+    # Recover holdings: latest snapshot plus the journal events written after it
+    journal = Journal()
+    restore_start = time.time()
+    replayed = journal.restore(portfolio)
+    print(f"Restored {portfolio} from journal ({replayed} events replayed in {time.time() - restore_start:.3f}s)")
+    pending = {}  # symbol -> order the broker has accepted but not filled yet
+    holdings_reader = Holdings.HoldingsReader(navigate=act.open_portfolio) if sync_holdings else None
+    executor = Executor(broker)
+    # SMA state is kept between iterations and only fed the new bars instead of re-running rolling() on 10 years
+    indicators = ind.IndicatorEngine({"SMA": lambda: ind.SMA(window_size)})
+    warmed_up = set()
+    scheduler = Scheduler(interval) if schedule == "market" else FixedCadence(cycle_seconds)
+    # One connection serves the whole process; the loop gets its own bounded buffer of bar closes. After
+    # each connect the feed downloads once what it missed, in order with the bars it streams
+    feed = Stream.shared_feed(stream_url, symbols, backfill=act.auto_get_stock) if stream_url else None
+    closes = feed.subscribe(name='signal-loop') if feed else None
+    batch = None
     
-    while True:
+    # The system clock never finishes; a replay's virtual clock stops after its last bar
+    while not clock.finished():
+        cycle_start = clock.timestamp()
+        cycle_timer = time.perf_counter()
         try:
-            act.auto_get_stock(symbol)
-            df = fetch_stock_data(symbol)
-            df = calculate_moving_average(df, window_size)
-            print("calculated...")
-            
-            # Pass first_run flag to determine_trade_signal
-            signal = determine_trade_signal(df, is_first_run=first_run)
-            print(f"Signal: {signal}")
-            
-            # Set first_run to False after first execution
-            if first_run:
-                first_run = False
-            
-            if signal == "BUY" and trade_count < trade_limit:
-                if portfolio["holdings"] < trade_limit:
-                    act.exec_trade(symbol)
-                    print(f"{symbol} bought")
-                    portfolio["symbols"].append(symbol)
-                    portfolio["holdings"] += 1
-                    trade_count += 1
-                else:
-                    print("Trade limit reached, cannot execute BUY")
-                    
-            elif signal == "SELL" and symbol in portfolio["symbols"]:
-                if portfolio["holdings"] > 0:
-                    print("Executing SELL trade")
-                    act.sell_trade(symbol)
-                    print(f"{symbol} sold")
-                    portfolio["symbols"].remove(symbol)
-                    portfolio["holdings"] -= 1
-                else:
-                    print("Portfolio empty, cannot execute SELL")
-            else:
-                print("No trade executed or trade limit reached.")
-                
-            print(f"Active Trades: {portfolio}")
-            time.sleep(20)  # Wait before the next trade
-            
+            # One batched download per cycle for the whole watchlist instead of one per symbol
+            # While the stream is up it keeps the 1m bars current (and backfills on connect); otherwise they are downloaded
+            if feed is None or not feed.connected.is_set():
+                with metrics.timer('bot_stage_seconds', stage='fetch_1m'):
+                    act.auto_get_stock(symbols)
+            with metrics.timer('bot_stage_seconds', stage=f'fetch_{interval}'):
+                frames = fetch_stock_data_many(symbols)
+            broker.update_prices(frames)
+            scheduler.succeeded()
+            print("fetched...")
         except Exception as e:
             print(f"An error occurred: {str(e)}")
-            time.sleep(20)  # Wait before retrying
+            metrics.inc('bot_errors_total', stage='fetch')
+            print(f"Retried after {scheduler.backoff()}s")  # Backs off while the errors continue
+            continue
+
+        # Apply whatever the executor finished since the last cycle before making new decisions
+        idle = executor.idle()  # checked before draining, so nothing can finish unapplied in between
+        busy = {symbol for symbol in symbols if executor.busy(symbol)}
+        for intent, result in executor.drain():
+            handle_result(intent, result, pending)
+        for symbol, order in list(pending.items()):
+            if order.status != "NEW":
+                del pending[symbol]
+                handle_result(order, order, pending)
+        if holdings_reader is not None and idle and not pending:
+            with metrics.timer('bot_stage_seconds', stage='holdings'):
+                sync_broker_holdings(holdings_reader)
+
+        for symbol in symbols:
+            try:
+                if symbol in pending:
+                    print(f"Order for {symbol} still pending")
+                    continue
+                if symbol in busy:
+                    # Its fill has not reached the portfolio yet, so the limits cannot be checked against it
+                    print(f"Order for {symbol} still executing")
+                    continue
+                # Signals, the parity check and fill prices all use the stored float64 bars
+                df = frames[symbol]
+                if df.empty:
+                    print(f"No data for {symbol}")
+                    continue
+                bar = df.index[-1]
+                last_close[symbol] = float(df["Close"].iloc[-1])
+                with metrics.timer('bot_stage_seconds', stage='indicators'):
+                    values = indicators.update_from(symbol, df)
+                if symbol not in warmed_up:
+                    with metrics.timer('bot_stage_seconds', stage='parity'):
+                        mismatches = ind.check_parity(df, window_size)
+                    if mismatches:
+                        print(f"Warning: streaming SMA for {symbol} differs from pandas on {mismatches} bars")
+                    warmed_up.add(symbol)
+
+                with metrics.timer('bot_stage_seconds', stage='signal'):
+                    signal = determine_trade_signal(df, is_first_run=portfolio.is_first_run(symbol),
+                                                    recent_sma=values["SMA"])
+                signalled = time.perf_counter()
+                print(f"{symbol} Signal: {signal}")
+                metrics.inc('bot_signals_total', signal=str(signal))
+                if signal in ("BUY", "SELL"):
+                    journal.record("signal", symbol=symbol, signal=signal, bar=bar,
+                                   sma=values["SMA"], close=last_close[symbol])
+
+                # Orders are only queued here; the executor thread talks to the broker
+                if signal == "BUY":
+                    if portfolio.can_buy(symbol):
+                        key = order_key(symbol, "BUY", bar)
+                        if executor.submit(symbol, "BUY", lot_size, key):
+                            journal.record("order", symbol=symbol, side="BUY", quantity=lot_size, key=key)
+                            metrics.observe('bot_signal_to_order_seconds', time.perf_counter() - signalled, side="BUY")
+                            print(f"Queued BUY for {symbol}")
+                    else:
+                        print(f"Trade limit reached, cannot execute BUY for {symbol}")
+
+                elif signal == "SELL" and portfolio.can_sell(symbol):
+                    key = order_key(symbol, "SELL", bar)
+                    if executor.submit(symbol, "SELL", lot_size, key):
+                        journal.record("order", symbol=symbol, side="SELL", quantity=lot_size, key=key)
+                        metrics.observe('bot_signal_to_order_seconds', time.perf_counter() - signalled, side="SELL")
+                        print(f"Queued SELL for {symbol}")
+                else:
+                    print(f"No trade executed for {symbol}.")
+
+            except Exception as e:
+                print(f"An error occurred for {symbol}: {str(e)}")
+                metrics.inc('bot_errors_total', stage='symbol')
+
+        latency = scheduler.close_to_now()
+        if latency is not None:
+            metrics.observe('bot_close_to_signal_seconds', latency)
+        if batch is not None:
+            metrics.observe('bot_tick_to_signal_seconds', time.perf_counter() - batch.received)
+        print(f"Active Trades: {portfolio}")
+        journal.maybe_snapshot(portfolio)
+        metrics.observe('bot_stage_seconds', time.perf_counter() - cycle_timer, stage='cycle')
+        metrics.maybe_export()
+        batch = wait_for_bars(closes, symbols, feed) if feed is not None and feed.connected.is_set() else None
+        if batch is None:
+            scheduler.wait(cycle_start)  # Next bar close, or the next session's first one when the market is closed
+
+    # Clock stopped: let the executor finish what is queued and apply it before returning
+    while not executor.idle():
+        time.sleep(0.01)
+    for intent, result in executor.drain():
+        handle_result(intent, result, pending)
+    executor.stop()
+    if feed is not None:
+        feed.unsubscribe(closes)
+    for symbol, order in pending.items():
+        print(f"{order.side} order for {symbol} still open at the end of the run")
+    journal.snapshot(portfolio)
+    journal.close()
+    metrics.export()
+    return portfolio
 
 # Run the bot
 if __name__ == "__main__":
-    trading_bot(symbol, window_size, trade_limit)
\ No newline at end of file
+    trading_bot(watchlist, window_size, trade_limit, broker)
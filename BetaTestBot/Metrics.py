@@ -0,0 +1,165 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+# Process-wide counters and histograms for the bot. Recording is a dict lookup, a bisect into fixed
+# buckets and a few additions under one lock, so it stays on permanently; export() writes everything
+# to a local file, either in Prometheus text format (metrics.prom, readable by node_exporter's textfile
+# collector) or as one JSON line per export (metrics.jsonl).
+
+metrics_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metrics')
+export_format = 'prom'  # or 'jsonl'
+export_every = 60  # seconds between exports from maybe_export()
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+counters = {}    # (name, labels) -> value
+histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum, count, max]
+lock = threading.Lock()
+last_export = 0.0
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with lock:
+        counters[key] = counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    key = _key(name, labels)
+    n = len(BUCKETS)
+    with lock:
+        h = histograms.get(key)
+        if h is None:
+            h = histograms[key] = [0] * (n + 1) + [0.0, 0, 0.0]
+        h[bisect.bisect_left(BUCKETS, value)] += 1
+        h[n + 1] += value
+        h[n + 2] += 1
+        if value > h[n + 3]:
+            h[n + 3] = value
+
+
+class timer:
+    # with metrics.timer('bot_stage_seconds', stage='fetch'): ...  observes the block's wall time
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def count(name, **labels):
+    # A counter's value, or how many observations a histogram has
+    key = _key(name, labels)
+    with lock:
+        if key in histograms:
+            return histograms[key][len(BUCKETS) + 2]
+        return counters.get(key, 0)
+
+
+def quantile(h, q):
+    # Estimate from bucket counts, linear within the bucket (as Prometheus' histogram_quantile does)
+    n = len(BUCKETS)
+    total = h[n + 2]
+    if total == 0:
+        return None
+    rank = q * total
+    seen = 0
+    for i, c in enumerate(h[:n + 1]):
+        if seen + c >= rank and c:
+            lower = BUCKETS[i - 1] if i > 0 else 0.0
+            upper = BUCKETS[i] if i < n else h[n + 3]
+            return min(lower + (upper - lower) * (rank - seen) / c, h[n + 3])
+        seen += c
+    return h[n + 3]
+
+
+def _labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in items) + '}'
+
+
+def prometheus_text():
+    with lock:
+        counter_items = sorted(counters.items())
+        histogram_items = sorted((k, list(v)) for k, v in histograms.items())
+    lines = []
+    typed = set()
+    for (name, labels), value in counter_items:
+        if name not in typed:
+            lines.append(f'# TYPE {name} counter')
+            typed.add(name)
+        lines.append(f'{name}{_labels(labels)} {value}')
+    n = len(BUCKETS)
+    for (name, labels), h in histogram_items:
+        if name not in typed:
+            lines.append(f'# TYPE {name} histogram')
+            typed.add(name)
+        cumulative = 0
+        for bound, c in zip(BUCKETS + ('+Inf',), h[:n + 1]):
+            cumulative += c
+            lines.append(f'{name}_bucket{_labels(labels, [("le", bound)])} {cumulative}')
+        lines.append(f'{name}_sum{_labels(labels)} {h[n + 1]}')
+        lines.append(f'{name}_count{_labels(labels)} {h[n + 2]}')
+    return '\n'.join(lines) + '\n'
+
+
+def snapshot():
+    n = len(BUCKETS)
+    with lock:
+        counter_items = sorted(counters.items())
+        histogram_items = sorted((k, list(v)) for k, v in histograms.items())
+    return {
+        'time': time.time(),
+        'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                     for (name, labels), value in counter_items],
+        'histograms': [{'name': name, 'labels': dict(labels), 'count': h[n + 2], 'sum': h[n + 1], 'max': h[n + 3],
+                        'p50': quantile(h, 0.5), 'p95': quantile(h, 0.95), 'p99': quantile(h, 0.99)}
+                       for (name, labels), h in histogram_items],
+    }
+
+
+def export(folder=None, fmt=None):
+    # Prometheus text replaces the file atomically; JSON lines appends one snapshot per call
+    global last_export
+    folder = folder or metrics_path
+    fmt = fmt or export_format
+    os.makedirs(folder, exist_ok=True)
+    if fmt == 'jsonl':
+        path = os.path.join(folder, 'metrics.jsonl')
+        with open(path, 'a') as f:
+            f.write(json.dumps(snapshot()) + '\n')
+    else:
+        path = os.path.join(folder, 'metrics.prom')
+        with open(path + '.tmp', 'w') as f:
+            f.write(prometheus_text())
+        os.replace(path + '.tmp', path)
+    last_export = time.time()
+    return path
+
+
+def maybe_export():
+    if time.time() - last_export >= export_every:
+        return export()
+    return None
+
+
+def reset():
+    with lock:
+        counters.clear()
+        histograms.clear()
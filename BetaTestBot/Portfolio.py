@@ -0,0 +1,101 @@
+import os
+import pandas as pd
+
+constituents_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'DisplayBeta', 'constituents.csv')
+
+
+def load_watchlist(count=None, symbols=None, path=constituents_path):
+    # Either an explicit list or the first `count` names of constituents.csv
+    if symbols:
+        return [s.upper() for s in symbols]
+    ticks = pd.read_csv(path)['Symbol'].str.strip().tolist()
+    return ticks[:count] if count else ticks
+
+
+class Portfolio:
+    # Per-symbol version of the old globals: trade_count counts lifetime buys and holdings the open lots,
+    # both capped by trade_limit for every symbol just like the single-symbol bot
+    def __init__(self, trade_limit, first_run=False):
+        self.trade_limit = trade_limit
+        self.first_run = first_run
+        self.trade_count = {}
+        self.holdings = {}
+        self.positions = {}  # symbol -> {'shares', 'cost', 'entry_date'} from fills, for display and export
+        self.seen = set()
+
+    def is_first_run(self, symbol):
+        # The forced initial BUY happens once per symbol
+        first = self.first_run and symbol not in self.seen
+        self.seen.add(symbol)
+        return first
+
+    def can_buy(self, symbol):
+        return (self.trade_count.get(symbol, 0) < self.trade_limit
+                and self.holdings.get(symbol, 0) < self.trade_limit)
+
+    def can_sell(self, symbol):
+        return self.holdings.get(symbol, 0) > 0
+
+    def bought(self, symbol):
+        self.holdings[symbol] = self.holdings.get(symbol, 0) + 1
+        self.trade_count[symbol] = self.trade_count.get(symbol, 0) + 1
+
+    def sold(self, symbol):
+        self.holdings[symbol] = self.holdings.get(symbol, 0) - 1
+        if self.holdings[symbol] <= 0:
+            del self.holdings[symbol]
+
+    def apply(self, event):
+        # Rebuilds state from journal events; fills change holdings, signals mark a symbol as seen
+        if event.get('kind') == 'signal':
+            self.seen.add(event['symbol'])
+        if event.get('kind') == 'reconcile':
+            self.set_position(event['symbol'], event['shares'], event['lots'], event.get('price'), event.get('date'))
+            return
+        if event.get('kind') != 'fill':
+            return
+        symbol, quantity, price = event['symbol'], event['quantity'], event.get('price')
+        position = self.positions.setdefault(symbol, {'shares': 0, 'cost': 0.0, 'entry_date': event.get('date')})
+        if event['side'] == 'BUY':
+            self.bought(symbol)
+            position['shares'] += quantity
+            position['cost'] += quantity * (price or 0.0)
+        else:
+            self.sold(symbol)
+            if position['shares']:
+                position['cost'] -= position['cost'] * min(quantity, position['shares']) / position['shares']
+            position['shares'] -= quantity
+            if position['shares'] <= 0:
+                del self.positions[symbol]
+
+    def set_position(self, symbol, shares, lots, price=None, date=None):
+        # Holdings read back from the broker override what the fills implied. Sold shares take their share
+        # of the cost with them, extra shares are costed at `price`; a symbol already held needs no first BUY
+        self.seen.add(symbol)
+        if shares <= 0:
+            self.holdings.pop(symbol, None)
+            self.positions.pop(symbol, None)
+            return
+        self.holdings[symbol] = lots
+        position = self.positions.setdefault(symbol, {'shares': 0, 'cost': 0.0, 'entry_date': date})
+        if shares < position['shares']:
+            position['cost'] *= shares / position['shares']
+        else:
+            position['cost'] += (shares - position['shares']) * (price or 0.0)
+        position['shares'] = shares
+
+    def state(self):
+        return {'trade_count': self.trade_count, 'holdings': self.holdings, 'positions': self.positions,
+                'seen': sorted(self.seen)}
+
+    def load_state(self, state):
+        self.trade_count = dict(state['trade_count'])
+        self.holdings = dict(state['holdings'])
+        self.positions = {s: dict(p) for s, p in state['positions'].items()}
+        self.seen = set(state['seen'])
+
+    def symbols(self):
+        return [s for s, lots in self.holdings.items() for _ in range(lots)]
+
+    def __repr__(self):
+        return str({"holdings": sum(self.holdings.values()), "symbols": self.symbols()})
@@ -0,0 +1,150 @@
+import argparse
+import os
+import tempfile
+import time
+import pandas as pd
+import BarStore as bars
+import Clock as clock
+import Journal
+import Metrics as metrics
+import Resample as rs
+from Broker import PaperBroker
+
+# Replays recorded bars through trading_bot. A VirtualClock stands in for the wall clock and the bar
+# store's downloader is replaced by a feed that only returns bars which have closed by virtual "now",
+# so the unmodified loop sees the session bar by bar. Each replay writes its bar store, journal and
+# metrics to its own work directory, never the live ones.
+
+data_csv = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data.csv')
+
+
+def bar_length(interval):
+    # '5m' -> 5 minutes, '1h' -> 1 hour, '1d' -> 1 day, '1wk' -> 7 days
+    units = {'m': 'min', 'h': 'h', 'd': 'D', 'wk': 'W'}
+    for suffix, unit in sorted(units.items(), key=lambda u: -len(u[0])):
+        if interval.endswith(suffix):
+            return pd.Timedelta(int(interval[:-len(suffix)]), unit=unit)
+    raise ValueError(f"Unsupported interval {interval}")
+
+
+class ReplayFeed:
+    # BarStore downloader serving {symbol: DataFrame} bars; a bar is visible once it has closed
+    def __init__(self, frames, replay_clock, interval):
+        self.frames = frames
+        self.clock = replay_clock
+        self.interval = interval
+        self.closes = {s: df.index + bar_length(interval) for s, df in frames.items()}
+        self.calls = 0
+
+    def visible(self, symbol, start):
+        df = self.frames.get(symbol)
+        if df is None or df.empty:
+            return bars.normalize(None)
+        keep = (self.closes[symbol] <= self.clock.now()) & (df.index >= pd.Timestamp(start))
+        return df[keep]
+
+    def __call__(self, symbols, start, end, interval):
+        self.calls += 1
+        if interval != self.interval:
+            # Only one bar size is recorded; other intervals (the 1m snapshot fetch) come back empty
+            return pd.DataFrame()
+        if isinstance(symbols, str):
+            return self.visible(symbols, start)
+        return pd.concat({s: self.visible(s, start) for s in symbols}, axis=1)
+
+
+def load_csv(path=data_csv, symbols=('DATA',)):
+    # The same recorded bars under every requested name, e.g. to load-test a larger watchlist
+    df = bars.normalize(pd.read_csv(path, index_col=0, parse_dates=[0]))
+    return {s: df for s in symbols}
+
+
+def load_store(symbols, interval='1d', start=None, end=None):
+    frames = {}
+    for symbol in symbols:
+        df = bars.load(symbol, interval)
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df.index <= pd.Timestamp(end)]
+        frames[symbol] = df
+    return frames
+
+
+def replay(frames, interval='5m', speed=None, cycle_seconds=None, broker=None, window_size=5, trade_limit=3,
+           workdir=None):
+    # Runs trading_bot over `frames` from the first bar's close to the last one's and returns a summary
+    import Main as main
+    workdir = workdir or tempfile.mkdtemp(prefix='replay-')
+    bars.store_path = os.path.join(workdir, 'bars')
+    Journal.journal_path = os.path.join(workdir, 'journal')
+    metrics.metrics_path = os.path.join(workdir, 'metrics')
+    metrics.reset()
+
+    length = bar_length(interval)
+    start = min(df.index[0] for df in frames.values() if not df.empty) + length
+    end = max(df.index[-1] for df in frames.values() if not df.empty) + length
+    # The market schedule wakes once per bar close by itself. A fixed cadence (cycle_seconds) polls
+    # regardless of hours, so its sleeps skip ahead to the next bar close to keep idle time free.
+    events = None
+    if cycle_seconds:
+        events = pd.DatetimeIndex(sorted(set().union(*[df.index for df in frames.values()]))) + length
+    virtual = clock.use(clock.VirtualClock(start, end, speed, events))
+    feed = ReplayFeed(frames, virtual, interval)
+    bars.downloader = feed
+    rs.sources = {}  # Only the recorded interval exists, so it is served as is rather than resampled
+    main.interval = interval
+    main.schedule = "fixed" if cycle_seconds else "market"
+    main.cycle_seconds = cycle_seconds or main.cycle_seconds
+    broker = broker or PaperBroker()
+
+    began = time.perf_counter()
+    try:
+        portfolio = main.trading_bot(list(frames), window_size, trade_limit, broker)
+    finally:
+        clock.use(clock.SystemClock())
+    wall = time.perf_counter() - began
+    span = (virtual.now() - start).total_seconds()
+    return {
+        'symbols': list(frames),
+        'bars': sum(len(df) for df in frames.values()),
+        'cycles': metrics.count('bot_stage_seconds', stage='cycle'),
+        'virtual_seconds': span,
+        'wall_seconds': wall,
+        'speedup': span / wall if wall else float('inf'),
+        'fills': len(broker.fills()),
+        'portfolio': portfolio,
+        'workdir': workdir,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded bars through the trading bot")
+    parser.add_argument('--csv', default=None, help=f"bars to replay (default {data_csv} unless --store)")
+    parser.add_argument('--store', action='store_true', help="replay the local bar store instead of a CSV")
+    parser.add_argument('--symbols', nargs='*', default=None)
+    parser.add_argument('--interval', default='5m')
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--speed', type=float, default=0, help="virtual seconds per real second, 0 = as fast as possible")
+    parser.add_argument('--cycle', type=float, default=None,
+                        help="poll every N virtual seconds instead of the market-hours schedule")
+    parser.add_argument('--window', type=int, default=5)
+    parser.add_argument('--limit', type=int, default=3)
+    parser.add_argument('--fill-on', choices=['close', 'next_open'], default='close')
+    parser.add_argument('--slippage-bps', type=float, default=0.0)
+    parser.add_argument('--workdir', default=None)
+    args = parser.parse_args()
+
+    if args.store:
+        frames = load_store(args.symbols or ['AAPL'], args.interval, args.start, args.end)
+    else:
+        frames = load_csv(args.csv or data_csv, args.symbols or ['DATA'])
+    result = replay(frames, args.interval, args.speed or None, args.cycle,
+                    PaperBroker(slippage_bps=args.slippage_bps, fill_on=args.fill_on),
+                    args.window, args.limit, args.workdir)
+    print(f"Replayed {result['bars']} bars of {', '.join(result['symbols'])} in {result['cycles']} cycles: "
+          f"{result['virtual_seconds'] / 3600:.1f}h of market time in {result['wall_seconds']:.2f}s "
+          f"({result['speedup']:.0f}x), {result['fills']} fills")
+    print(f"Final portfolio: {result['portfolio']}")
+    print(f"Bar store, journal and metrics in {result['workdir']}")
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+import BarStore as bars
+from Scheduler import OPEN, CLOSE, exchange_now, sessions
+
+# Coarser bars built locally from finer stored ones, so the 1m download auto_get_stock makes every
+# cycle feeds every timeframe: 2m-1h bars and today's daily bar come from 1m bars, weekly and monthly
+# bars from daily ones. Intraday bins start at the 9:30 open like Yahoo's, and only regular-session
+# minutes are used. Each derived timeframe is cached in the bar store and extended incrementally: only
+# source bars from the start of the last cached (possibly partial) bin onwards are re-aggregated.
+# Daily bars of finished sessions are always Yahoo's own (its close and volume are the official ones);
+# only sessions after the last downloaded day are built from 1m bars, and those are never stored.
+
+sources = {'2m': '1m', '5m': '1m', '15m': '1m', '30m': '1m', '60m': '1m', '1h': '1m', '90m': '1m',
+           '1d': '1m', '1wk': '1d', '1mo': '1d'}  # timeframes missing here are downloaded directly
+MINUTES = {'1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30, '60m': 60, '1h': 60, '90m': 90}
+
+
+def bin_starts(index, interval):
+    # Start of the `interval` bin every timestamp falls into, as datetime64[ns]
+    ts = np.asarray(index, dtype='datetime64[ns]')
+    day = ts.astype('datetime64[D]').astype('datetime64[ns]')
+    if interval in MINUTES:
+        length = np.timedelta64(MINUTES[interval], 'm').astype('timedelta64[ns]')
+        session_open = day + OPEN.to_timedelta64()
+        return session_open + (ts - session_open) // length * length
+    if interval == '1d':
+        return day
+    if interval == '1wk':
+        # Weeks start on Monday (1970-01-01 was a Thursday)
+        weekday = (day.astype('datetime64[D]').astype(np.int64) + 3) % 7
+        return day - weekday.astype('timedelta64[D]')
+    if interval == '1mo':
+        return ts.astype('datetime64[M]').astype('datetime64[ns]')
+    raise ValueError(f"Cannot resample to {interval}")
+
+
+def in_session(index):
+    time_of_day = np.asarray(index, dtype='datetime64[ns]') - np.asarray(index, dtype='datetime64[D]')
+    return (time_of_day >= OPEN.to_timedelta64()) & (time_of_day < CLOSE.to_timedelta64())
+
+
+def resample(df, interval, session_only=None):
+    # OHLCV of `df` (sorted by time) aggregated into `interval` bins: first open, highest high, lowest low,
+    # last close, summed volume. Intraday sources are limited to regular-session bars by default.
+    if session_only is None:
+        session_only = len(df) > 1 and (df.index[1] - df.index[0]) < pd.Timedelta(days=1)
+    df = df[df['Close'].notna()]
+    if session_only:
+        df = df[in_session(df.index)]
+    if df.empty:
+        return bars.normalize(None)
+    labels = bin_starts(df.index, interval)
+    first = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    last = np.r_[first[1:] - 1, len(df) - 1]
+    out = {
+        'Open': df['Open'].to_numpy(dtype=np.float64)[first],
+        'High': np.fmax.reduceat(df['High'].to_numpy(dtype=np.float64), first),
+        'Low': np.fmin.reduceat(df['Low'].to_numpy(dtype=np.float64), first),
+        'Close': df['Close'].to_numpy(dtype=np.float64)[last],
+    }
+    if 'Volume' in df.columns:
+        out['Volume'] = np.add.reduceat(np.nan_to_num(df['Volume'].to_numpy(dtype=np.float64)), first).astype(np.int64)
+    index = pd.DatetimeIndex(labels[first], name='Datetime' if interval in MINUTES else 'Date')
+    return pd.DataFrame(out, index=index)
+
+
+def extend(cached, source, interval):
+    # Bins from the last cached one on, re-aggregated; that bin may have been partial
+    if not cached.empty:
+        source = source.iloc[source.index.searchsorted(cached.index[-1]):]
+    return resample(source, interval)
+
+
+requested = {}  # symbol -> (last daily bar, date) of the last download of missing sessions
+
+
+def missing_sessions(daily, now):
+    # Sessions that finished before `now`'s date but have no daily bar yet
+    today = pd.Timestamp(now).normalize()
+    start = daily.index[-1] + pd.Timedelta(days=1)
+    return [session_open.normalize() for session_open, _ in sessions(start, max((today - start).days, 0))]
+
+
+def official_daily(symbol, now):
+    # Downloaded daily bars of finished sessions; a bar dated `now`'s day (partial, from an older version
+    # that stored derived bars) is left to the 1m bars
+    daily = bars.load(symbol, '1d')
+    return daily.iloc[:daily.index.searchsorted(pd.Timestamp(now).normalize())]
+
+
+def with_minutes(daily, minute):
+    # Daily bars followed by ones built from the 1m bars for the sessions after the last of them
+    if not daily.empty:
+        minute = minute.iloc[minute.index.searchsorted(daily.index[-1] + pd.Timedelta(days=1)):]
+    return bars.merge(daily, resample(minute, '1d')) if not minute.empty else daily
+
+
+def update(symbol, interval, base=None, now=None):
+    # Derived bars of `interval` for one symbol from what the store already holds (no download)
+    now = pd.Timestamp(now) if now is not None else exchange_now()
+    source_interval = sources[interval]
+    if base is None:
+        base = update(symbol, source_interval, now=now) if source_interval in sources and source_interval != '1m' \
+            else bars.load(symbol, source_interval)
+    if interval == '1d':
+        return with_minutes(official_daily(symbol, now), base)
+    cached = bars.load(symbol, interval)
+    fresh = extend(cached, base, interval)
+    bars.append(symbol, interval, fresh)
+    return bars.merge(cached, fresh)
+
+
+def update_many(symbols, interval='1d', fetch=None, now=None):
+    # Drop-in for BarStore.update_many: {symbol: DataFrame} of `interval` bars. Derived timeframes are
+    # built from the stored 1m bars (refresh those first, e.g. with auto_get_stock). Only what the store
+    # cannot derive is downloaded: symbols without 1m bars, and daily bars of every finished session the
+    # daily store is missing, whether or not the 1m bars cover it.
+    if interval not in sources:
+        return bars.update_many(symbols, interval, fetch=fetch, now=now)
+    now = pd.Timestamp(now) if now is not None else exchange_now()
+    minute = {s: bars.load(s, '1m') for s in symbols}
+    if interval == '1d' or sources[interval] == '1d':
+        daily = {s: official_daily(s, now) for s in symbols}
+        missing = [s for s in symbols if daily[s].empty or
+                   (missing_sessions(daily[s], now) and requested.get(s) != (daily[s].index[-1], now.date()))]
+        if missing:
+            # Up to today's midnight, so a bar of the session in progress is never stored as an official one.
+            # A session Yahoo does not have yet is asked for again the next day; until then the 1m bars stand in.
+            bars.update_many(missing, '1d', fetch=fetch, now=now.normalize())
+            for s in missing:
+                daily[s] = official_daily(s, now)
+                if not daily[s].empty:
+                    requested[s] = (daily[s].index[-1], now.date())
+        daily = {s: with_minutes(daily[s], minute[s]) for s in symbols}
+        if interval == '1d':
+            return daily
+        return {s: update(s, interval, daily[s], now) for s in symbols}
+    missing = [s for s in symbols if minute[s].empty]
+    result = bars.update_many(missing, interval, fetch=fetch, now=now) if missing else {}
+    return {s: result[s] if s in result else update(s, interval, minute[s], now) for s in symbols}
@@ -0,0 +1,158 @@
+from functools import lru_cache
+import pandas as pd
+from pandas.tseries.holiday import (AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay, USMartinLutherKingJr,
+                                    USMemorialDay, USPresidentsDay, USThanksgivingDay, nearest_workday,
+                                    sunday_to_monday)
+import Clock as clock
+import Metrics as metrics
+
+# When the bot should wake up. Scheduler knows NYSE sessions (holidays and 1pm early closes), wakes a few
+# seconds after each bar of the configured interval closes, sleeps through nights, weekends and holidays
+# until the next session's first bar, and backs off exponentially while fetches keep failing.
+# FixedCadence is the old fixed polling loop. Times are exchange wall-clock (America/New_York), naive,
+# like the bars in the bar store.
+
+TZ = 'America/New_York'
+OPEN = pd.Timedelta(hours=9, minutes=30)
+CLOSE = pd.Timedelta(hours=16)
+EARLY_CLOSE = pd.Timedelta(hours=13)
+BAR_LENGTHS = {'1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30, '60m': 60, '90m': 90, '1h': 60}
+
+
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    rules = [
+        # A Saturday New Year's Day is not observed on the Friday before
+        Holiday('New Years Day', month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday('Juneteenth', month=6, day=19, start_date='2022-06-19', observance=nearest_workday),
+        Holiday('Independence Day', month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday('Christmas', month=12, day=25, observance=nearest_workday),
+    ]
+
+
+holiday_calendar = NYSEHolidayCalendar()
+extra_holidays = set()  # one-off closures, as dates
+
+
+@lru_cache(maxsize=None)
+def _rule_holidays(year):
+    return frozenset(holiday_calendar.holidays(f'{year}-01-01', f'{year}-12-31').date)
+
+
+def holidays(year):
+    return _rule_holidays(year) | {d for d in extra_holidays if d.year == year}
+
+
+def is_session(day):
+    day = pd.Timestamp(day).normalize()
+    return day.dayofweek < 5 and day.date() not in holidays(day.year)
+
+
+def session_close(day):
+    # 1pm on July 3rd and Christmas Eve (when they fall Monday to Thursday) and the day after Thanksgiving
+    day = pd.Timestamp(day).normalize()
+    after_thanksgiving = day.month == 11 and (day - pd.Timedelta(days=1)).date() in _rule_holidays(day.year)
+    early = ((day.month, day.day) in [(7, 3), (12, 24)] and day.dayofweek < 4) or after_thanksgiving
+    return day + (EARLY_CLOSE if early else CLOSE)
+
+
+def sessions(start, days=14):
+    # (open, close) of the sessions in the `days` calendar days from `start`'s date
+    day = pd.Timestamp(start).normalize()
+    for _ in range(days):
+        if is_session(day):
+            yield day + OPEN, session_close(day)
+        day += pd.Timedelta(days=1)
+
+
+def bar_closes(session_open, session_close_time, interval):
+    # Intraday bars are aligned to the open and the last one ends at the close; longer bars close with the session
+    minutes = BAR_LENGTHS.get(interval)
+    if minutes is None:
+        return [session_close_time]
+    closes = list(pd.date_range(session_open + pd.Timedelta(minutes=minutes), session_close_time,
+                                freq=f'{minutes}min'))
+    if not closes or closes[-1] < session_close_time:
+        closes.append(session_close_time)
+    return closes
+
+
+def exchange_now():
+    now = clock.now(TZ)
+    return now.tz_localize(None) if now.tz is not None else now
+
+
+class Scheduler:
+    def __init__(self, interval='1d', settle_seconds=3, base_backoff=5, max_backoff=600):
+        self.interval = interval
+        self.settle = pd.Timedelta(seconds=settle_seconds)  # Yahoo needs a moment to publish a closed bar
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.errors = 0
+        self.bar_close = None  # close of the bar the last wake-up was for
+
+    def is_open(self, now=None):
+        now = exchange_now() if now is None else pd.Timestamp(now)
+        return is_session(now) and now.normalize() + OPEN <= now < session_close(now)
+
+    def next_wake(self, now=None):
+        # (wake-up time, bar close it is for): the first bar close that is not yet `settle` in the past
+        now = exchange_now() if now is None else pd.Timestamp(now)
+        for session_open, close in sessions(now):
+            for bar_close in bar_closes(session_open, close, self.interval):
+                if bar_close + self.settle > now:
+                    return bar_close + self.settle, bar_close
+        raise RuntimeError("No session found in the next two weeks")
+
+    def wait(self, cycle_start=None):
+        wake, self.bar_close = self.next_wake()
+        # Long sleeps go in chunks so a suspended machine or a clock change cannot overshoot by hours
+        remaining = (wake - exchange_now()).total_seconds()
+        while remaining > 0:
+            clock.sleep(min(remaining, 900))
+            remaining = (wake - exchange_now()).total_seconds()
+        metrics.inc('bot_wakeups_total', reason='bar')
+
+    def succeeded(self):
+        self.errors = 0
+
+    def backoff(self):
+        # 5s, 10s, 20s ... capped, instead of a flat retry every cycle
+        delay = min(self.base_backoff * 2 ** self.errors, self.max_backoff)
+        self.errors += 1
+        clock.sleep(delay)
+        metrics.inc('bot_wakeups_total', reason='retry')
+        return delay
+
+    def close_to_now(self):
+        # Seconds since the bar this cycle is for closed
+        if self.bar_close is None:
+            return None
+        return (exchange_now() - self.bar_close).total_seconds()
+
+
+class FixedCadence:
+    # Every `seconds` regardless of market hours, as the loop used to do
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.bar_close = None
+
+    def wait(self, cycle_start):
+        clock.sleep(max(0, self.seconds - (clock.timestamp() - cycle_start)))
+        metrics.inc('bot_wakeups_total', reason='fixed')
+
+    def succeeded(self):
+        pass
+
+    def backoff(self):
+        clock.sleep(self.seconds)
+        metrics.inc('bot_wakeups_total', reason='retry')
+        return self.seconds
+
+    def close_to_now(self):
+        return None
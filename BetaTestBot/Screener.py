@@ -0,0 +1,84 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import BarStore as bars
+from Portfolio import load_watchlist
+
+# Runs the bot's Close-vs-SMA rule over a whole universe at once: bars for every symbol are aligned into
+# one dates x symbols matrix and SMA, crossovers, momentum and ranks are computed column-wise in one go.
+# The SMA uses the same pandas rolling kernel as calculate_moving_average, so signals agree with the bot.
+
+
+def yahoo_symbol(symbol):
+    # constituents.csv uses BRK.B style tickers, Yahoo wants BRK-B
+    return symbol.strip().replace('.', '-')
+
+
+def load_closes(symbols, interval='1d', fetch=None):
+    # dates x symbols matrix of closes from the bar store (one batched download for whatever is stale)
+    frames = bars.update_many([yahoo_symbol(s) for s in symbols], interval, fetch=fetch)
+    closes = pd.DataFrame({s: frames[yahoo_symbol(s)]['Close'] for s in symbols if not frames[yahoo_symbol(s)].empty})
+    return closes.sort_index().ffill()
+
+
+def screen(closes, window_size=5, lookback=20):
+    close = closes.to_numpy(dtype=np.float64)
+    sma = closes.rolling(window=window_size).mean().to_numpy()
+    rows = np.arange(len(close))[:, None]
+
+    last_close, last_sma = close[-1], sma[-1]
+    signal = np.where(np.isnan(last_sma), 'HODL',
+                      np.where(last_close > last_sma, 'BUY', np.where(last_close < last_sma, 'SELL', 'HODL')))
+
+    # A crossover is a bar where close moved to the other side of its SMA
+    side = np.sign(close - sma)
+    crossed = (side[1:] * side[:-1] < 0)
+    last_cross = np.where(crossed, rows[1:], -1).max(axis=0)
+    bars_since = np.where(last_cross >= 0, len(close) - 1 - last_cross, -1)
+    crossover = np.where(bars_since == 0, np.where(side[-1] > 0, 'UP', 'DOWN'), '')
+
+    past = close[-1 - lookback] if len(close) > lookback else np.full(close.shape[1], np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        momentum = (last_close / past - 1) * 100
+        distance = (last_close / last_sma - 1) * 100
+
+    result = pd.DataFrame({
+        'Symbol': closes.columns,
+        'Close': last_close,
+        'SMA': last_sma,
+        'Signal': signal,
+        'Crossover': crossover,
+        'Bars Since Cross': bars_since,
+        'Momentum %': momentum,
+        'Distance %': distance,
+    })
+    result['Rank'] = result['Momentum %'].rank(ascending=False, method='min')
+    return result.sort_values('Rank').reset_index(drop=True)
+
+
+def run(count=None, symbols=None, window_size=5, lookback=20, fetch=None):
+    universe = load_watchlist(count, symbols)
+    start = time.time()
+    closes = load_closes(universe, fetch=fetch)
+    loaded = time.time()
+    result = screen(closes, window_size, lookback)
+    print(f"Loaded {closes.shape[1]} symbols x {closes.shape[0]} bars in {loaded - start:.2f}s, "
+          f"screened in {time.time() - loaded:.3f}s")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Screen the S&P 500 universe with the bot's SMA rule")
+    parser.add_argument('--count', type=int, default=None, help="first N names of constituents.csv")
+    parser.add_argument('--symbols', nargs='*', default=None)
+    parser.add_argument('--window', type=int, default=5)
+    parser.add_argument('--lookback', type=int, default=20, help="bars used for momentum")
+    parser.add_argument('--top', type=int, default=25)
+    parser.add_argument('--signal', choices=['BUY', 'SELL', 'HODL'], default=None)
+    args = parser.parse_args()
+
+    result = run(args.count, args.symbols, args.window, args.lookback)
+    if args.signal:
+        result = result[result['Signal'] == args.signal]
+    print(result.head(args.top).to_string(index=False))
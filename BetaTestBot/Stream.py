@@ -0,0 +1,450 @@
+import argparse
+import asyncio
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import json
+import threading
+import time
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+import BarStore as bars
+import Metrics as metrics
+from Resample import MINUTES
+from Scheduler import OPEN, CLOSE
+
+# Push-based market data. One websocket connection (run on its own asyncio thread) receives ticks, 1m bars
+# are built from them in memory, and whatever they produce is handed to in-process subscribers: the
+# signal loop gets each batch of closed bars the moment it closes, the quote cache gets last prices.
+# Closed bars are also written to the bar store, so Resample derives every other timeframe from them as
+# it does from downloaded 1m bars. A consumer that falls behind never slows the connection or the other
+# consumers: its buffer is bounded, conflates quotes per symbol, and drops the oldest bars (flagging it
+# lagged) rather than grow. Dropped connections are retried with exponential backoff and resume from the
+# last tick seen. `python Stream.py serve` replays recorded bars as a local stand-in feed.
+#
+# Wire format, JSON text messages. Client -> server: {"subscribe": [symbols], "since": ns}.
+# Server -> client: {"time": ns, "ticks": [[symbol, ns, price, size], ...]}; "time" alone is a heartbeat.
+# Times are int64 epoch nanoseconds of exchange wall-clock time, like the bar store's index.
+
+NS = 1_000_000_000
+DAY = 86400 * NS
+OPEN_NS = OPEN.value
+CLOSE_NS = CLOSE.value
+
+
+@dataclass
+class Quote:
+    symbol: str
+    time: int
+    price: float
+
+
+@dataclass
+class BarBatch:
+    bars: dict  # symbol -> DataFrame of the bars that closed, on the bar store's index and columns
+    time: int  # feed time at which they closed
+    received: float  # perf_counter() when the message that closed them arrived
+
+
+def bar_frame(rows, interval='1m'):
+    # rows: [start ns, open, high, low, close, volume] lists, as BarBuilder produces them
+    table = np.array(rows, dtype=np.float64).reshape(-1, 6)
+    index = pd.DatetimeIndex(np.array([r[0] for r in rows], dtype='datetime64[ns]'),
+                             name='Datetime' if interval in MINUTES else 'Date')
+    columns = dict(zip(bars.COLUMNS, table[:, 1:].T))
+    columns['Volume'] = columns['Volume'].astype(np.int64)
+    return pd.DataFrame(columns, index=index)
+
+
+class BarBuilder:
+    # Bars of an intraday interval from ticks, aligned to the 9:30 open like Resample's bins. Ticks outside
+    # the regular session are ignored. A bar closes when its symbol ticks in a later bin, or when the feed's
+    # time has passed its end (flush), so quiet symbols close too. A symbol's first bar is dropped unless
+    # its first tick came at the bar's start: joining mid-bar, the ticks before it were missed.
+    def __init__(self, interval='1m'):
+        self.interval = interval
+        self.length = MINUTES[interval] * 60 * NS
+        self.open = {}  # symbol -> [start, open, high, low, close, volume]
+        self.seen = set()
+        self.partial = set()  # symbols whose open bar is missing its first ticks
+        self.late = 0
+        self.skipped = 0
+
+    def bin_start(self, ts):
+        session_open = ts - ts % DAY + OPEN_NS
+        return session_open + (ts - session_open) // self.length * self.length
+
+    def add(self, symbol, ts, price, size=0):
+        # Returns the bar this tick closed, if any
+        if not OPEN_NS <= ts % DAY < CLOSE_NS:
+            return None
+        start = self.bin_start(ts)
+        bar = self.open.get(symbol)
+        if bar is not None and start == bar[0]:
+            bar[2] = max(bar[2], price)
+            bar[3] = min(bar[3], price)
+            bar[4] = price
+            bar[5] += size
+            return None
+        if bar is not None and start < bar[0]:
+            self.late += 1  # belongs to a bar that already closed
+            return None
+        if symbol not in self.seen:
+            self.seen.add(symbol)
+            if ts != start:
+                self.partial.add(symbol)
+        self.open[symbol] = [start, price, price, price, price, size]
+        return self._complete(symbol, bar)
+
+    def _complete(self, symbol, bar):
+        if bar is not None and symbol in self.partial:
+            self.partial.discard(symbol)
+            self.skipped += 1
+            return None
+        return bar
+
+    def flush(self, now):
+        # Closes and returns (symbol, bar) for every open bar that ended at or before `now`
+        closed = [(s, bar) for s, bar in self.open.items() if bar[0] + self.length <= now]
+        for symbol, _ in closed:
+            del self.open[symbol]
+        return [(s, bar) for s, bar in closed if self._complete(s, bar) is not None]
+
+
+class Subscription:
+    # Bounded buffer between the feed thread and one consumer. conflate=True keeps only the latest item per
+    # (kind, symbol), for consumers that only care about the current price. Otherwise, when the buffer is
+    # full, the oldest item is dropped and `lagged` set, so the consumer knows to resync (e.g. from the
+    # bar store). A callback instead runs in the feed thread for each item and must be quick.
+    def __init__(self, kinds=('bars',), maxsize=1000, conflate=False, callback=None, name='subscriber'):
+        self.kinds = set(kinds)
+        self.maxsize = maxsize
+        self.conflate = conflate
+        self.callback = callback
+        self.name = name
+        self.items = collections.OrderedDict() if conflate else collections.deque()
+        self.ready = threading.Condition()
+        self.delivered = 0
+        self.dropped = 0
+        self.lagged = False
+
+    def put(self, kind, item, symbol=None):
+        if self.callback is not None:
+            try:
+                self.callback(item)
+            except Exception as e:
+                print(f"Stream subscriber {self.name} failed: {str(e)}")
+            self.delivered += 1
+            return
+        with self.ready:
+            if self.conflate:
+                self.items.pop((kind, symbol), None)
+                self.items[(kind, symbol)] = item
+            else:
+                if len(self.items) >= self.maxsize:
+                    self.items.popleft()
+                    self.dropped += 1
+                    self.lagged = True
+                    metrics.inc('stream_dropped_total', subscriber=self.name)
+                self.items.append(item)
+            self.delivered += 1
+            self.ready.notify()
+
+    def get(self, timeout=None):
+        # Next item, or None after `timeout` seconds without one
+        with self.ready:
+            if not self.items and not self.ready.wait_for(lambda: self.items, timeout):
+                return None
+            return self.items.popitem(last=False)[1] if self.conflate else self.items.popleft()
+
+    def drain(self):
+        with self.ready:
+            items = list(self.items.values()) if self.conflate else list(self.items)
+            self.items.clear()
+            return items
+
+
+class Feed:
+    def __init__(self, url, symbols=(), interval='1m', store=True, grace=2.0, base_backoff=0.5, max_backoff=30,
+                 backfill=None):
+        self.url = url
+        self.symbols = set(symbols)
+        self.interval = interval
+        self.builder = BarBuilder(interval)
+        self.store = store  # write closed bars to the bar store
+        # Called with the watched symbols once per connection, on the store thread when the first bars close,
+        # e.g. Actions.auto_get_stock: it downloads what the stream missed (before the connection, and the
+        # partial first bar) before any streamed bar is stored behind it
+        self.backfill = backfill if store else None
+        self.backfill_due = False
+        # Store writes (a few ms per symbol) run on one thread of their own, in order, so the connection
+        # keeps reading ticks and publishing quotes while a minute's bars are being saved
+        self.writer = ThreadPoolExecutor(1, thread_name_prefix='stream-store') if store else None
+        self.grace = int(grace * NS)  # how long after a bar's end other symbols' ticks may still arrive
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.subscriptions = []
+        self.time = 0  # feed time: the latest exchange time the server reported, ns
+        self.errors = 0
+        self.connects = 0
+        self.messages = 0
+        self.connected = threading.Event()
+        self.stopped = False
+        self.loop = None
+        self.socket = None
+        self.thread = None
+        self._wake = None
+
+    def subscribe(self, kinds=('bars',), maxsize=1000, conflate=False, callback=None, name='subscriber'):
+        subscription = Subscription(kinds, maxsize, conflate, callback, name)
+        self.subscriptions = self.subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+
+    def watch(self, symbols):
+        # Adds symbols to the stream, on the open connection too
+        new = set(symbols) - self.symbols
+        if not new:
+            return
+        self.symbols |= new
+        if self.loop is not None and self.socket is not None:
+            asyncio.run_coroutine_threadsafe(self._subscribe(new), self.loop)
+
+    def _publish(self, kind, item, symbol=None):
+        for subscription in self.subscriptions:
+            if kind in subscription.kinds:
+                subscription.put(kind, item, symbol)
+
+    def handle(self, message, received=None):
+        received = time.perf_counter() if received is None else received
+        data = json.loads(message)
+        self.messages += 1
+        skipped = self.builder.skipped
+        closed, last = {}, {}
+        for symbol, ts, price, size in data.get('ticks', ()):
+            bar = self.builder.add(symbol, ts, price, size)
+            if bar is not None:
+                closed.setdefault(symbol, []).append(bar)
+            last[symbol] = (ts, price)
+            self.time = max(self.time, ts)
+        self.time = max(self.time, data.get('time', 0))
+        for symbol, (ts, price) in last.items():
+            self._publish('quotes', Quote(symbol, ts, price), symbol)
+        for symbol, bar in self.builder.flush(self.time - self.grace):
+            closed.setdefault(symbol, []).append(bar)
+        if self.backfill_due and (closed or self.builder.skipped > skipped):
+            self.backfill_due = False
+            self.writer.submit(self._backfill, sorted(self.symbols))
+        if closed:
+            batch = BarBatch({s: bar_frame(rows, self.interval) for s, rows in closed.items()}, self.time, received)
+            if self.writer is not None:
+                self.writer.submit(self._store_and_publish, batch)
+            else:
+                self._publish_bars(batch)
+
+    def _backfill(self, symbols):
+        try:
+            with metrics.timer('stream_backfill_seconds'):
+                self.backfill(symbols)
+        except Exception as e:
+            print(f"Stream backfill failed: {str(e)}")
+            metrics.inc('stream_errors_total', stage='backfill')
+
+    def _store_and_publish(self, batch):
+        # Stored before they are published, so a subscriber that reads the store sees them. Only the new
+        # bars are written, at the end of each symbol's files
+        for symbol, df in batch.bars.items():
+            try:
+                bars.append(symbol, self.interval, df)
+            except Exception as e:
+                print(f"Storing streamed {symbol} bars failed: {str(e)}")
+                metrics.inc('stream_errors_total', stage='store')
+        self._publish_bars(batch)
+
+    def _publish_bars(self, batch):
+        self._publish('bars', batch)
+        metrics.inc('stream_bars_total', sum(len(df) for df in batch.bars.values()))
+        metrics.observe('stream_tick_to_publish_seconds', time.perf_counter() - batch.received)
+
+    async def _subscribe(self, symbols):
+        await self.socket.send(json.dumps({'subscribe': sorted(symbols), 'since': self.time}))
+
+    async def run(self):
+        import websockets
+        self.loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        while not self.stopped:
+            try:
+                # The client reads one message at a time; while handle() is busy, unread messages queue up
+                # to max_queue and then TCP flow control holds the server back instead of memory growing
+                async with websockets.connect(self.url, max_queue=64) as socket:
+                    self.socket = socket
+                    await self._subscribe(self.symbols)
+                    self.connects += 1
+                    self.errors = 0
+                    self.backfill_due = self.backfill is not None
+                    self.connected.set()
+                    print(f"Streaming {len(self.symbols)} symbols from {self.url}")
+                    async for message in socket:
+                        try:
+                            self.handle(message, time.perf_counter())
+                        except (ValueError, TypeError, KeyError) as e:
+                            print(f"Skipped a malformed stream message: {str(e)}")
+                            metrics.inc('stream_errors_total', stage='message')
+            except Exception as e:
+                # Anything, not just network errors: the feed thread must never die while it is wanted
+                if not self.stopped:
+                    print(f"Stream connection failed: {type(e).__name__}: {str(e)}")
+                    metrics.inc('stream_errors_total')
+            finally:
+                self.socket = None
+                self.connected.clear()
+            if self.stopped:
+                break
+            # 0.5s, 1s, 2s ... capped; the resubscribe asks for everything after the last tick seen
+            delay = min(self.base_backoff * 2 ** self.errors, self.max_backoff)
+            self.errors += 1
+            metrics.inc('stream_reconnects_total')
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        self.thread = threading.Thread(target=asyncio.run, args=(self.run(),), name="stream-feed", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self.stopped = True
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._wake.set)
+            if self.socket is not None:
+                asyncio.run_coroutine_threadsafe(self.socket.close(), self.loop)
+        if self.thread is not None:
+            self.thread.join(timeout)
+        if self.writer is not None:
+            self.writer.shutdown(wait=True)
+
+
+_feeds = {}
+_feeds_lock = threading.Lock()
+
+
+def shared_feed(url, symbols=(), **kwargs):
+    # One connection per url for the whole process; later callers only add their symbols
+    with _feeds_lock:
+        feed = _feeds.get(url)
+        if feed is None:
+            feed = _feeds[url] = Feed(url, symbols, **kwargs).start()
+    feed.watch(symbols)
+    return feed
+
+
+def tick_table(frames, interval=None):
+    # Recorded bars as ticks, sorted by time: the open at the bar's start, the low and high (high first
+    # on a down bar) a third and two thirds in, the close a second before its end. Volume is split evenly
+    dtype = np.dtype([('ts', np.int64), ('symbol', object), ('price', np.float64), ('size', np.int64)])
+    parts = []
+    for symbol, df in frames.items():
+        df = df.dropna(subset=['Close'])
+        if df.empty:
+            continue
+        start = df.index.values.astype('datetime64[ns]').view(np.int64)
+        length = pd.Timedelta(interval).value if interval else int(np.median(np.diff(start))) if len(df) > 1 else 60 * NS
+        o, h, l, c = (df[col].to_numpy(dtype=np.float64) for col in ['Open', 'High', 'Low', 'Close'])
+        up = c >= o
+        volume = df['Volume'].fillna(0).to_numpy(dtype=np.int64) // 4 if 'Volume' in df.columns else np.zeros(len(df), np.int64)
+        for offset, price in [(0, o), (length // 3, np.where(up, l, h)), (2 * length // 3, np.where(up, h, l)),
+                              (length - NS, c)]:
+            part = np.empty(len(df), dtype)
+            part['ts'], part['symbol'], part['price'], part['size'] = start + offset, symbol, price, volume
+            parts.append(part)
+    if not parts:
+        return np.empty(0, dtype)
+    table = np.concatenate(parts)
+    return table[np.argsort(table['ts'], kind='stable')]
+
+
+async def serve(frames, host='localhost', port=8765, speed=None, batch=500):
+    # Local stand-in feed replaying `frames` ({symbol: bars}) to every client from the `since` it asks for
+    # (an empty subscribe list means every symbol). speed=k plays k x real time; None sends as fast as the
+    # client reads, in messages of about `batch` ticks that never split one timestamp. After the last tick
+    # a heartbeat past the last bar closes it.
+    import websockets
+    ticks = tick_table(frames)
+    lengths = [np.median(np.diff(df.index.values.astype('datetime64[ns]').view(np.int64)))
+               for df in frames.values() if len(df) > 1]
+    end = int(ticks['ts'][-1] + (max(lengths) if lengths else 60 * NS)) if len(ticks) else 0
+
+    async def handler(socket):
+        request = json.loads(await socket.recv())
+        wanted = set(request.get('subscribe') or frames)
+        rows = ticks[ticks['ts'] > request.get('since', 0)]
+        print(f"Client subscribed to {len(wanted)} symbols from {pd.Timestamp(request.get('since', 0))}")
+
+        async def resubscribe():
+            # Symbols the client adds later (Feed.watch) are streamed from then on
+            async for message in socket:
+                wanted.update(json.loads(message).get('subscribe', ()))
+
+        listener = asyncio.create_task(resubscribe())
+        cuts = np.flatnonzero(np.diff(rows['ts'])) + 1
+        groups = np.split(rows, cuts) if speed else np.split(rows, cuts[np.diff(np.r_[0, cuts // batch]) > 0])
+        previous = None
+        try:
+            for group in groups:
+                if not len(group):
+                    continue
+                if speed and previous is not None:
+                    await asyncio.sleep((group['ts'][0] - previous) / NS / speed)
+                previous = group['ts'][-1]
+                ticks_out = [[s, int(t), float(p), int(v)] for t, s, p, v in group.tolist() if s in wanted]
+                await socket.send(json.dumps({'time': int(previous), 'ticks': ticks_out}))
+            await socket.send(json.dumps({'time': end}))
+            await socket.wait_closed()
+        except websockets.exceptions.ConnectionClosed:
+            print(f"Client disconnected after {pd.Timestamp(int(previous or 0))}")
+        finally:
+            listener.cancel()
+
+    async with websockets.serve(handler, host, port):
+        print(f"Replaying {len(ticks)} ticks of {', '.join(frames)} on ws://{host}:{port}")
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream quotes over a websocket, or serve recorded bars as one")
+    commands = parser.add_subparsers(dest='command', required=True)
+    server = commands.add_parser('serve', help="replay recorded bars as a local websocket feed")
+    server.add_argument('--csv', default=None, help="bars to replay (default BetaTestBot/data.csv)")
+    server.add_argument('--symbols', nargs='*', default=None, help="names to serve the recorded bars under")
+    server.add_argument('--host', default='localhost')
+    server.add_argument('--port', type=int, default=8765)
+    server.add_argument('--speed', type=float, default=0, help="market seconds per real second, 0 = as fast as possible")
+    listener = commands.add_parser('listen', help="print the bars built from a feed as they close")
+    listener.add_argument('--url', default='ws://localhost:8765')
+    listener.add_argument('symbols', nargs='*')
+    listener.add_argument('--no-store', action='store_true', help="do not write the bars to the bar store")
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        from Replay import data_csv, load_csv
+        asyncio.run(serve(load_csv(args.csv or data_csv, args.symbols or ['DATA']), args.host, args.port,
+                          args.speed or None))
+    else:
+        feed = Feed(args.url, args.symbols, store=not args.no_store).start()
+        subscription = feed.subscribe(name='listen')
+        try:
+            while True:
+                batch = subscription.get(timeout=1)
+                if batch is None:
+                    continue
+                for symbol, df in batch.bars.items():
+                    for when, bar in df.iterrows():
+                        print(f"{symbol} {when} O {bar['Open']:.2f} H {bar['High']:.2f} L {bar['Low']:.2f} "
+                              f"C {bar['Close']:.2f} V {int(bar['Volume'])}")
+        except KeyboardInterrupt:
+            feed.stop()
@@ -0,0 +1,94 @@
+import json
+import os
+from PIL import Image, ImageDraw, ImageFont
+
+# Draws the portfolio-page screenshots in fixtures/holdings that test_holdings reads, with what OCR would
+# return for them: the header words of each page and where every symbol and quantity drawn sits in a
+# sheet of glyphs (holdings-ocr.json, holdings-glyphs.png), so the test's stand-in OCR can recognise
+# cells without tesseract or a font.
+# Run `python holdings_fixtures.py` to redraw them.
+
+fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+folder = os.path.join(fixtures, 'holdings')
+COLUMNS = [('Symbol', 40), ('Description', 200), ('Current Price', 520), ('Today', 760), ('QTY', 960),
+           ('Total Value', 1120)]
+ROW_HEIGHT = 70
+HOLDINGS = [('AAPL', 10, 150.0), ('MSFT', 20, 300.0), ('BRK.B', 5, 410.0), ('NVDA', 30, 120.0)]
+MORE = [('AMZN', 12, 180.0), ('META', 15, 480.0), ('TSLA', 25, 240.0), ('JPM', 35, 190.0), ('XOM', 50, 110.0),
+        ('KO', 60, 62.0), ('PEP', 8, 170.0), ('WMT', 9, 165.0)]
+
+
+def font(size=28):
+    return ImageFont.load_default(size=size)
+
+
+def render(rows, tick=0.0, scroll=0, footer=True, size=(1400, 1000)):
+    image = Image.new('L', size, 245)
+    draw = ImageDraw.Draw(image)
+    draw.text((40, 20 + scroll), "ACCOUNT VALUE $101,837.35", fill=20, font=font())
+    top = 120 + scroll
+    words = []
+    for name, x in COLUMNS:
+        for word in name.split():
+            box = draw.textbbox((x, top), word, font=font())
+            draw.text((x, top), word, fill=60, font=font())
+            words.append([word, box[0], box[1], box[2] - box[0], box[3] - box[1]])
+            x = box[2] + int(draw.textlength(' ', font=font()))
+    draw.line((20, top + 45, 1380, top + 45), fill=150, width=2)
+    for i, (symbol, shares, price) in enumerate(rows):
+        y = top + 70 + i * ROW_HEIGHT
+        draw.text((40, y), symbol, fill=10, font=font())
+        draw.text((40, y + 30), "Inc.", fill=120, font=font(16))
+        draw.text((200, y), symbol.title() + " Corp", fill=10, font=font())
+        draw.text((520, y), f"${price + tick:.2f}", fill=10, font=font())
+        draw.text((760, y), f"+{tick:.2f}", fill=10, font=font())
+        draw.text((960, y), str(shares), fill=10, font=font())
+        draw.text((1120, y), f"${shares * (price + tick):,.2f}", fill=10, font=font())
+        draw.line((20, y + ROW_HEIGHT - 12, 1380, y + ROW_HEIGHT - 12), fill=200, width=1)
+    if footer:
+        draw.text((40, size[1] - 50), "Prices delayed 15 minutes", fill=90, font=font())
+    return image, words
+
+
+def glyph_sheet(texts):
+    # Each text drawn on its own line; returns the sheet and {text: [left, top, right, bottom]} of its ink
+    image = Image.new('L', (400, 50 * len(texts)), 245)
+    draw = ImageDraw.Draw(image)
+    boxes = {}
+    for i, text in enumerate(texts):
+        draw.text((10, 10 + 50 * i), text, fill=10, font=font())
+        boxes[text] = list(draw.textbbox((10, 10 + 50 * i), text, font=font()))
+    return image, boxes
+
+
+def screens():
+    misread = [('AAPI', 10, 150.0)] + HOLDINGS[1:]  # the page caught mid-render, or a tile OCR got wrong
+    bought = [('AAPL', 40, 150.0)] + HOLDINGS[1:]
+    added = [('GOOGL', 7, 170.0)] + bought
+    return {
+        '00-start.png': render(HOLDINGS),
+        '01-prices.png': render(HOLDINGS, tick=1.25),
+        '02-misread.png': render(misread, tick=0.5),
+        '03-bought.png': render(bought, tick=0.7),
+        '04-bought.png': render(bought, tick=0.9),
+        '05-added.png': render(added, tick=0.9),
+        '06-scrolled.png': render(added, tick=0.9, scroll=30),
+        '07-cut-off.png': render(added + MORE, tick=1.0, footer=False),
+        '08-cut-off.png': render(added + MORE, tick=1.1, footer=False),
+    }
+
+
+if __name__ == "__main__":
+    os.makedirs(folder, exist_ok=True)
+    words = {}
+    texts = set()
+    for name, (image, header) in screens().items():
+        image.save(os.path.join(folder, name))
+        words[name] = header
+    for symbol, shares, _ in HOLDINGS + MORE + [('AAPI', 10, 0), ('AAPL', 40, 0), ('GOOGL', 7, 0)]:
+        texts.update([symbol, str(shares)])
+    sheet, boxes = glyph_sheet(sorted(texts))
+    sheet.save(os.path.join(fixtures, 'holdings-glyphs.png'))
+    with open(os.path.join(fixtures, 'holdings-ocr.json'), 'w') as f:
+        json.dump({'words': words, 'glyphs': boxes}, f, indent=1)
+    print(f"{len(words)} screenshots and {len(boxes)} glyphs written to {folder}")
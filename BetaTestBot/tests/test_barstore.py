@@ -0,0 +1,81 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import BarStore as bars
+import Clock as clock
+
+data_csv = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data.csv')
+
+
+def assert_same_bars(got, expected):
+    # The store keeps nanosecond timestamps; a csv or merged frame may carry another unit
+    got, expected = got.copy(), expected.copy()
+    got.index, expected.index = got.index.as_unit('ns'), expected.index.as_unit('ns')
+    pd.testing.assert_frame_equal(got, expected, check_names=False, check_freq=False)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(bars, 'store_path', str(tmp_path))
+    return bars.CsvDownloader(data_csv)
+
+
+def test_update_downloads_and_writes_only_the_tail(store, monkeypatch):
+    days = pd.date_range('2024-01-02 16:00', '2024-01-12 16:00', freq='B')
+    bars.update('DATA', '5m', fetch=store, now=days[0])
+    # From now on the files must only grow at the end; a full rewrite goes through save()
+    saves = []
+    monkeypatch.setattr(bars, 'save', lambda *args: saves.append(args))
+    for now in days[1:]:
+        last = bars.load('DATA', '5m').index[-1]
+        stored = bars.update('DATA', '5m', fetch=store, now=now)
+        assert store.calls[-1][1] == last
+    assert saves == []
+    expected = store.df[store.df.index < days[-1]]
+    assert_same_bars(bars.load('DATA', '5m'), expected)
+    assert_same_bars(stored, expected)
+
+
+def test_revised_last_bar_is_overwritten_in_place(store):
+    bars.update('DATA', '5m', fetch=store, now='2024-01-03 10:02')
+    partial = bars.load('DATA', '5m').iloc[-1]
+    bars.update('DATA', '5m', fetch=store, now='2024-01-03 11:00')
+    stored = bars.load('DATA', '5m')
+    assert not stored.index.duplicated().any()
+    assert stored.loc[partial.name, 'Close'] == store.df.loc[partial.name, 'Close']
+    with open(os.path.join(bars._dir('DATA', '5m'), 'Close.npy'), 'rb') as f:
+        assert np.lib.format.read_magic(f) == (1, 0)
+        assert np.lib.format.read_array_header_1_0(f)[0] == (len(stored),)
+
+
+def test_update_many_appends_and_warns_about_gaps(store, capsys):
+    bars.update_many(['AAA', 'BBB'], '1m', fetch=store, now='2024-01-02 16:00')
+    capsys.readouterr()
+    # Two weeks later the 1m bars in between can no longer be downloaded
+    result = bars.update_many(['AAA', 'BBB'], '1m', fetch=store, now='2024-01-16 16:00')
+    assert 'can no longer be downloaded' in capsys.readouterr().out
+    assert store.calls[-1][1] == pd.Timestamp('2024-01-09 16:00')
+    for symbol in ('AAA', 'BBB'):
+        assert_same_bars(bars.load(symbol, '1m'), result[symbol])
+        assert result[symbol].index.is_monotonic_increasing
+
+    bars.update_many(['AAA', 'BBB'], '1m', fetch=store, now='2024-01-17 16:00')
+    assert 'can no longer be downloaded' not in capsys.readouterr().out
+
+
+class LosAngelesClock(clock.SystemClock):
+    # A host three hours behind New York: naive local time lags the exchange's wall clock
+    def __init__(self, exchange_time):
+        self.current = pd.Timestamp(exchange_time, tz='America/New_York')
+
+    def now(self, tz=None):
+        return self.current.tz_convert(tz) if tz else self.current.tz_convert('America/Los_Angeles').tz_localize(None)
+
+
+def test_default_end_is_exchange_time_on_any_host(store, monkeypatch):
+    bars.update('DATA', '5m', fetch=store, now='2024-01-03 10:00')
+    monkeypatch.setattr(clock, 'clock', LosAngelesClock('2024-01-03 11:00'))
+    stored = bars.update('DATA', '5m', fetch=store)
+    assert store.calls[-1][2] == pd.Timestamp('2024-01-03 11:00')
+    assert stored.index[-1] == pd.Timestamp('2024-01-03 10:55')
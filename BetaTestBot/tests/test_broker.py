@@ -0,0 +1,23 @@
+from Broker import GuiBroker
+
+
+class StubActions:
+    def __init__(self):
+        self.calls = []
+
+    def exec_trade(self, ticker, quantity=10):
+        self.calls.append(('BUY', ticker, quantity))
+
+    def sell_trade(self, ticker, quantity=None):
+        self.calls.append(('SELL', ticker, quantity))
+
+
+def test_gui_orders_click_their_quantity():
+    actions = StubActions()
+    broker = GuiBroker(actions)
+    broker.submit('AAPL', 'BUY', 10)
+    broker.submit('AAPL', 'BUY', 10)
+    sold = broker.submit('AAPL', 'SELL', 10)
+    # The sell closes one lot, as recorded, rather than the whole position
+    assert actions.calls == [('BUY', 'AAPL', 10), ('BUY', 'AAPL', 10), ('SELL', 'AAPL', 10)]
+    assert sold.fill.quantity == 10 and broker.positions() == {'AAPL': 10}
@@ -0,0 +1,15 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'DisplayBeta'))
+import Downsample
+
+
+def test_tz_aware_dates_downsample_like_naive_ones():
+    dates = pd.date_range('2024-01-02 09:30', periods=2000, freq='min', tz='America/New_York')
+    df = pd.DataFrame({'date': dates, 'price': np.sin(np.arange(2000) / 50.0)})
+    aware = Downsample.downsample(df, 200)
+    naive = Downsample.downsample(df.assign(date=dates.tz_convert(None)), 200)
+    assert len(aware) == 200 and list(aware.index) == list(naive.index)
@@ -0,0 +1,153 @@
+import json
+import os
+import cv2
+import numpy as np
+from PIL import Image
+import Holdings
+from Journal import Journal
+from Portfolio import Portfolio
+
+# Reads the screenshots in fixtures/holdings (drawn by holdings_fixtures.py) with a stand-in for tesseract:
+# header words come from holdings-ocr.json and a cell reads as the longest glyph found in its pixels
+
+fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+folder = os.path.join(fixtures, 'holdings')
+PRICES = {'AAPL': 150.0, 'MSFT': 300.0, 'BRK.B': 410.0, 'NVDA': 120.0, 'GOOGL': 170.0}
+
+
+class StubOCR:
+    def __init__(self):
+        with open(os.path.join(fixtures, 'holdings-ocr.json')) as f:
+            ocr = json.load(f)
+        self.header = ocr['words']
+        sheet = np.asarray(Image.open(os.path.join(fixtures, 'holdings-glyphs.png')))
+        self.glyphs = {}
+        for text, (left, top, right, bottom) in ocr['glyphs'].items():
+            glyph = sheet[top:bottom, left:right]
+            rows, cols = np.nonzero(glyph != 245)
+            self.glyphs[text] = glyph[rows.min():rows.max() + 1, cols.min():cols.max() + 1]
+        self.page = None
+        self.word_calls = 0
+        self.text_calls = 0
+
+    def words(self, gray):
+        self.word_calls += 1
+        return [tuple(word) for word in self.header[self.page]]
+
+    def text(self, cell):
+        # Longest glyph that matches (up to a little anti-aliasing), the closest one among equally long
+        self.text_calls += 1
+        found = []
+        for text, glyph in self.glyphs.items():
+            if glyph.shape[0] > cell.shape[0] or glyph.shape[1] > cell.shape[1]:
+                continue
+            error = cv2.matchTemplate(cell, glyph, cv2.TM_SQDIFF).min() / glyph.size
+            if error < 1:
+                found.append((-len(text), error, text))
+        return min(found)[2] if found else ''
+
+
+def screen(name):
+    return np.asarray(Image.open(os.path.join(folder, name)))
+
+
+def held_portfolio():
+    portfolio = Portfolio(trade_limit=10)
+    for symbol in ('AAPL', 'TSLA'):
+        portfolio.apply({'kind': 'fill', 'symbol': symbol, 'side': 'BUY', 'quantity': 10, 'price': 100.0,
+                         'date': '2024-01-02'})
+    return portfolio
+
+
+def read(reader, ocr, name):
+    ocr.page = name
+    return reader.read_screen(screen(name))
+
+
+def test_reads_only_changed_rows_and_reconciles_confirmed_readings(tmp_path):
+    ocr = StubOCR()
+    reader = Holdings.HoldingsReader(words=ocr.words, text=ocr.text)
+    portfolio = held_portfolio()
+    journal = Journal(str(tmp_path))
+
+    first = read(reader, ocr, '00-start.png')
+    assert first.held == {'AAPL': 10, 'MSFT': 20, 'BRK.B': 5, 'NVDA': 30}
+    assert first.complete and not first.confirmed and first.recognised == 4
+    assert Holdings.reconcile(portfolio, first, journal, 10, PRICES) == []
+
+    # Only prices moved: nothing is OCR'd again, and the second reading confirms the first
+    second = read(reader, ocr, '01-prices.png')
+    assert second.recognised == 0 and second.confirmed
+    events = Holdings.reconcile(portfolio, second, journal, 10, PRICES)
+    assert {e['symbol']: e['shares'] for e in events} == {'BRK.B': 5, 'MSFT': 20, 'NVDA': 30, 'TSLA': 0}
+    assert 'TSLA' not in portfolio.positions and portfolio.holdings['MSFT'] == 2
+
+    # A misread AAPL is not confirmed by the next (correct) reading, so neither zeroes a position
+    misread = read(reader, ocr, '02-misread.png')
+    assert 'AAPI' in misread.held and not misread.confirmed
+    assert Holdings.reconcile(portfolio, misread, journal, 10, PRICES) == []
+    bought = read(reader, ocr, '03-bought.png')
+    assert bought.held['AAPL'] == 40 and not bought.confirmed
+    assert Holdings.reconcile(portfolio, bought, journal, 10, PRICES) == []
+    assert portfolio.positions['AAPL']['shares'] == 10 and 'AAPI' not in portfolio.positions
+    events = Holdings.reconcile(portfolio, read(reader, ocr, '04-bought.png'), journal, 10, PRICES)
+    assert [(e['symbol'], e['previous'], e['shares']) for e in events] == [('AAPL', 10, 40)]
+
+    # A new row on top shifts the others, which are recognised by their pixels, not their position
+    added = read(reader, ocr, '05-added.png')
+    assert added.held['GOOGL'] == 7 and added.recognised == 1 and ocr.word_calls == 1
+    # Scrolling moves the header: one more full-page scan, and still no row OCR'd again
+    scrolled = read(reader, ocr, '06-scrolled.png')
+    assert scrolled.confirmed and scrolled.recognised == 0 and ocr.word_calls == 2
+    Holdings.reconcile(portfolio, scrolled, journal, 10, PRICES)
+    assert portfolio.holdings == {'AAPL': 4, 'MSFT': 2, 'BRK.B': 1, 'NVDA': 3, 'GOOGL': 1}
+    journal.close()
+
+    # The reconciled positions come back from the journal
+    restored = held_portfolio()
+    Journal(str(tmp_path)).restore(restored)
+    assert restored.positions == portfolio.positions and restored.holdings == portfolio.holdings
+
+
+def test_table_running_off_the_screen_closes_nothing_out():
+    ocr = StubOCR()
+    reader = Holdings.HoldingsReader(words=ocr.words, text=ocr.text)
+    portfolio = held_portfolio()
+    portfolio.apply({'kind': 'fill', 'symbol': 'WMT', 'side': 'BUY', 'quantity': 9, 'price': 165.0,
+                     'date': '2024-01-02'})
+    read(reader, ocr, '07-cut-off.png')
+    reading = read(reader, ocr, '08-cut-off.png')
+    assert reading.cut_off and not reading.complete and reading.confirmed
+    assert 'WMT' not in reading.held and reading.held['TSLA'] == 25
+    events = Holdings.reconcile(portfolio, reading, None, 10, PRICES)
+    assert 'WMT' not in {e['symbol'] for e in events}
+    assert portfolio.positions['WMT']['shares'] == 9 and portfolio.positions['TSLA']['shares'] == 25
+
+
+def test_reads_saved_screenshots():
+    ocr = StubOCR()
+    ocr.page = '00-start.png'
+    reader = Holdings.HoldingsReader(Holdings.saved_screens(folder), words=ocr.words, text=ocr.text)
+    assert reader.read().held == reader.read().held == {'AAPL': 10, 'MSFT': 20, 'BRK.B': 5, 'NVDA': 30}
+    assert reader.recognised == 4 and reader.layout_scans == 1
+
+
+def test_blank_and_loading_screens_close_nothing_out():
+    ocr = StubOCR()
+    reader = Holdings.HoldingsReader(words=ocr.words, text=ocr.text)
+    ocr.header['blank.png'] = []
+    ocr.page = 'blank.png'
+    assert reader.read_screen(np.full((1000, 1400), 245, dtype=np.uint8)) is None
+
+    # The header is drawn but the rows are still grey placeholder bars
+    loading = screen('00-start.png').copy()
+    loading[155:] = 245
+    for top in range(185, 400, 70):
+        loading[top:top + 25, :1080] = 180
+    ocr.page = '00-start.png'
+    for _ in range(2):
+        reading = reader.read_screen(loading)
+    assert reading.held == {} and not reading.complete and reading.confirmed
+    portfolio = held_portfolio()
+    assert Holdings.reconcile(portfolio, reading, None, 10, PRICES) == []
+    assert set(portfolio.positions) == {'AAPL', 'TSLA'}
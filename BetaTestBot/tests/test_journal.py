@@ -0,0 +1,72 @@
+from Journal import Journal, read_positions
+from Portfolio import Portfolio
+
+
+def fill(journal, side='BUY'):
+    return journal.record('fill', sync=True, symbol='AAPL', side=side, quantity=10, price=100.0, date='2024-01-02')
+
+
+def test_torn_tail_then_record_then_restore(tmp_path):
+    journal = Journal(str(tmp_path))
+    fill(journal)
+    journal.close()
+    # A crash in the middle of the second write
+    with open(journal.events_file, 'ab') as f:
+        f.write(b'{"seq": 2, "time": 1.0, "kind": "fi')
+
+    journal = Journal(str(tmp_path))
+    portfolio = Portfolio(trade_limit=3)
+    assert journal.restore(portfolio) == 1
+    fill(journal)
+    journal.close()
+
+    journal = Journal(str(tmp_path))
+    portfolio = Portfolio(trade_limit=3)
+    assert journal.restore(portfolio) == 2
+    assert portfolio.holdings == {'AAPL': 2}
+    assert portfolio.positions['AAPL']['shares'] == 20
+    assert journal.seq == 2
+
+
+def test_tail_skips_unparseable_lines(tmp_path):
+    journal = Journal(str(tmp_path))
+    fill(journal)
+    journal.close()
+    with open(journal.events_file, 'ab') as f:
+        f.write(b'{"seq": 2, "kind": "fi{"seq": 2, "kind": "signal"}\n')
+    journal = Journal(str(tmp_path))
+    fill(journal, 'SELL')
+    journal.close()
+
+    portfolio = Portfolio(trade_limit=3)
+    assert Journal(str(tmp_path)).restore(portfolio) == 2
+    assert portfolio.holdings == {}
+
+
+def test_restore_from_snapshot_replays_only_the_tail(tmp_path):
+    journal = Journal(str(tmp_path))
+    portfolio = Portfolio(trade_limit=3)
+    portfolio.apply(fill(journal))
+    journal.snapshot(portfolio)
+    fill(journal)
+    journal.close()
+
+    portfolio = Portfolio(trade_limit=3)
+    assert Journal(str(tmp_path)).restore(portfolio) == 1
+    assert portfolio.holdings == {'AAPL': 2}
+
+
+def test_read_positions_leaves_the_journal_alone(tmp_path):
+    journal = Journal(str(tmp_path))
+    fill(journal)
+    # The bot is in the middle of writing its next event
+    journal.file.write('{"seq": 2, "time": 1.0, "kind": "fi')
+    journal.file.flush()
+    with open(journal.events_file, 'rb') as f:
+        before = f.read()
+
+    assert read_positions(str(tmp_path))['AAPL']['shares'] == 10
+    with open(journal.events_file, 'rb') as f:
+        assert f.read() == before
+    assert read_positions(str(tmp_path / 'missing')) == {} and not (tmp_path / 'missing').exists()
+    journal.close()
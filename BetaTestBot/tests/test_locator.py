@@ -0,0 +1,16 @@
+import numpy as np
+from PIL import Image
+from Locator import Locator
+
+
+def test_lookup_timings_stay_constant_size(tmp_path):
+    rng = np.random.default_rng(0)
+    screen = rng.integers(0, 255, (200, 300), dtype=np.uint8)
+    Image.fromarray(screen[50:80, 100:140]).save(tmp_path / 'button.png')
+    locator = Locator(str(tmp_path), screenshot=lambda: screen)
+    for _ in range(50):
+        assert locator.find('button.png') == (120, 65)
+    report = locator.report()['button.png']
+    assert report['lookups'] == 50 and report['region_hits'] == 49
+    assert report['max_ms'] >= report['mean_ms'] > 0
+    assert len(locator.timings['button.png']) == 3
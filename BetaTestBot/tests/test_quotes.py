@@ -0,0 +1,47 @@
+import os
+import sys
+import threading
+import time
+import pytest
+
+pytest.importorskip('streamlit')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'DisplayBeta'))
+from Quotes import QuoteService
+
+
+class SlowDownload:
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def __call__(self, symbols):
+        self.calls.append(sorted(symbols))
+        self.release.wait(5)
+        return {s: 100.0 for s in symbols}
+
+
+def test_concurrent_requests_share_one_download():
+    fetch = SlowDownload()
+    quotes = QuoteService(ttl=60, fetch=fetch, background=False)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(quotes.get_prices(['AAA', 'BBB'])))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    fetch.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert fetch.calls == [['AAA', 'BBB']] and quotes.requests == 1
+    assert results == [{'AAA': 100.0, 'BBB': 100.0}] * 3
+
+
+def test_symbols_nobody_asks_for_drop_out_of_the_refresh():
+    fetch = SlowDownload()
+    fetch.release.set()
+    quotes = QuoteService(ttl=0, fetch=fetch, background=False, idle=60)
+    quotes.get_prices(['OLD'])
+    quotes.watched['OLD'] -= 120  # last asked for two minutes ago
+    quotes.get_prices(['NEW'])
+    quotes.refresh()
+    assert fetch.calls[-1] == ['NEW'] and list(quotes.watched) == ['NEW']
@@ -0,0 +1,86 @@
+import os
+import pandas as pd
+import pytest
+import BarStore as bars
+import Clock as clock
+import Resample as rs
+import Screener
+
+data_csv = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data.csv')
+
+
+class DailyDownloader:
+    # Yahoo's daily bars: the sessions of data.csv, with a close and volume of their own (the official
+    # close is the closing auction's, and the volume counts trades outside the session)
+    def __init__(self, minute, until):
+        daily = rs.resample(minute, '1d')
+        self.df = daily.assign(Close=daily['Close'] + 0.5, Volume=daily['Volume'] * 2)
+        self.df = self.df[self.df.index < pd.Timestamp(until)]
+        self.calls = []
+
+    def __call__(self, symbols, start, end, interval):
+        self.calls.append((start, end))
+        df = self.df[(self.df.index >= pd.Timestamp(start)) & (self.df.index < pd.Timestamp(end))]
+        return pd.concat({s: df for s in symbols}, axis=1)
+
+
+@pytest.fixture
+def minute(tmp_path, monkeypatch):
+    monkeypatch.setattr(bars, 'store_path', str(tmp_path))
+    monkeypatch.setattr(rs, 'requested', {})
+    df = bars.normalize(pd.read_csv(data_csv, index_col=0, parse_dates=[0]))
+    df.index = df.index.as_unit('ns')
+    return df[df.index < pd.Timestamp('2024-01-12 11:00')]
+
+
+def test_finished_sessions_come_from_the_daily_download(minute):
+    official = DailyDownloader(minute, '2024-01-12')
+    bars.save('DATA', '1d', official.df[official.df.index < pd.Timestamp('2024-01-06')])
+    # The 1m bars have a hole (a day the 1m download could no longer reach) that the daily bars must not
+    bars.save('DATA', '1m', minute[minute.index.normalize() != pd.Timestamp('2024-01-10')])
+
+    daily = rs.update_many(['DATA'], '1d', fetch=official, now='2024-01-12 11:00')['DATA']
+    assert official.calls == [(pd.Timestamp('2024-01-05'), pd.Timestamp('2024-01-12'))]
+    pd.testing.assert_frame_equal(daily.iloc[:-1], official.df, check_names=False, check_freq=False)
+    # Only the session in progress is built from the 1m bars, and it is not stored
+    assert daily.index[-1] == pd.Timestamp('2024-01-12')
+    assert daily['Close'].iloc[-1] == minute['Close'].iloc[-1]
+    assert bars.load('DATA', '1d').index[-1] == pd.Timestamp('2024-01-11')
+
+    # Nothing is missing any more, so the next cycle downloads nothing
+    rs.update_many(['DATA'], '1d', fetch=official, now='2024-01-12 11:05')
+    assert len(official.calls) == 1
+
+
+def test_session_yahoo_lacks_is_built_from_1m_and_asked_for_once_a_day(minute):
+    official = DailyDownloader(minute, '2024-01-11')
+    bars.save('DATA', '1d', official.df[official.df.index < pd.Timestamp('2024-01-09')])
+    bars.save('DATA', '1m', minute)
+
+    for now in ('2024-01-12 10:00', '2024-01-12 11:00'):
+        daily = rs.update_many(['DATA'], '1d', fetch=official, now=now)['DATA']
+    assert len(official.calls) == 1
+    assert list(daily.index[-2:]) == [pd.Timestamp('2024-01-11'), pd.Timestamp('2024-01-12')]
+    assert daily.loc['2024-01-10', 'Close'] == official.df.loc['2024-01-10', 'Close']
+    assert daily.loc['2024-01-11', 'Close'] == minute.loc[:'2024-01-11 16:00', 'Close'].iloc[-1]
+
+    # Weekly bars are built on the same daily bars
+    weekly = rs.update_many(['DATA'], '1wk', fetch=official, now='2024-01-12 11:00')['DATA']
+    assert weekly.index[-1] == pd.Timestamp('2024-01-08') and weekly['Close'].iloc[-1] == daily['Close'].iloc[-1]
+    assert len(official.calls) == 1
+
+
+def test_partial_daily_bar_from_the_screener_is_replaced_next_day(minute, monkeypatch):
+    official = DailyDownloader(minute, '2024-01-12')
+    bars.save('DATA', '1d', official.df[official.df.index < pd.Timestamp('2024-01-10')])
+    bars.save('DATA', '1m', minute)
+    # The screener downloads daily bars itself, mid-session on the 11th, and sees that day's partial bar
+    midday = DailyDownloader(minute, '2024-01-12')
+    midday.df.loc['2024-01-11', 'Close'] = 55.0
+    monkeypatch.setattr(clock, 'clock', clock.VirtualClock('2024-01-11 11:00'))
+    assert Screener.load_closes(['DATA'], fetch=midday)['DATA'].iloc[-1] == 55.0
+    assert bars.load('DATA', '1d').index[-1] == pd.Timestamp('2024-01-10')
+
+    daily = rs.update_many(['DATA'], '1d', fetch=official, now='2024-01-12 12:00')['DATA']
+    assert len(official.calls) == 1
+    assert daily.loc['2024-01-11', 'Close'] == official.df.loc['2024-01-11', 'Close']
@@ -0,0 +1,78 @@
+import json
+import time
+import pandas as pd
+import pytest
+import BarStore as bars
+import Stream
+
+NS = Stream.NS
+OPEN = pd.Timestamp('2024-01-02 09:30').value
+
+
+def tick(symbol, seconds, price, size=100):
+    return [symbol, OPEN + seconds * NS, price, size]
+
+
+def message(ticks, seconds=None):
+    now = max(t[1] for t in ticks) if seconds is None else OPEN + seconds * NS
+    return json.dumps({'time': now, 'ticks': ticks})
+
+
+def test_first_bar_after_joining_mid_bar_is_dropped():
+    builder = Stream.BarBuilder('1m')
+    assert builder.add('AAA', OPEN + 20 * NS, 10.0) is None  # joined 20s into the bar
+    assert builder.add('BBB', OPEN, 20.0) is None  # joined on the bar's start
+    assert builder.add('AAA', OPEN + 60 * NS, 11.0) is None  # closes the partial bar, which is dropped
+    assert builder.add('BBB', OPEN + 61 * NS, 21.0)[:2] == [OPEN, 20.0]
+    assert builder.skipped == 1
+    # From then on quiet symbols close through flush and their next bar counts, wherever its first tick is
+    assert [s for s, _ in builder.flush(OPEN + 120 * NS)] == ['AAA', 'BBB']
+    builder.add('AAA', OPEN + 200 * NS, 12.0)
+    assert builder.add('AAA', OPEN + 240 * NS, 12.5)[:2] == [OPEN + 180 * NS, 12.0]
+
+
+def test_feed_backfills_once_before_appending_streamed_bars(tmp_path, monkeypatch):
+    monkeypatch.setattr(bars, 'store_path', str(tmp_path))
+    history = pd.DataFrame({'Open': [9.0, 9.5], 'High': [9.0, 9.5], 'Low': [9.0, 9.5], 'Close': [9.0, 9.5],
+                            'Volume': [1, 1]},
+                           index=pd.DatetimeIndex([OPEN - 120 * NS, OPEN - 60 * NS]).as_unit('ns'))
+    bars.save('AAA', '1m', history)
+    calls = []
+
+    def backfill(symbols):
+        # What the download finds: the bar before the connection and the partial first one, complete
+        calls.append(list(bars.load('AAA', '1m').index))
+        bars.update('AAA', '1m', fetch=lambda *args: pd.DataFrame(
+            {'Open': [9.8, 10.0], 'High': [9.8, 10.5], 'Low': [9.8, 9.9], 'Close': [9.8, 10.2], 'Volume': [5, 7]},
+            index=pd.DatetimeIndex([OPEN - 60 * NS, OPEN])), now=pd.Timestamp(OPEN + 70 * NS))
+
+    feed = Stream.Feed('ws://unused', ['AAA'], backfill=backfill)
+    feed.backfill_due = True  # as after a connect
+    feed.handle(message([tick('AAA', 20, 10.0)]))
+    feed.handle(message([tick('AAA', 60, 11.0), tick('AAA', 90, 11.5)]))
+    feed.handle(message([tick('AAA', 120, 12.0)]))
+    feed.handle(message([tick('AAA', 180, 12.5)]))
+    feed.writer.shutdown(wait=True)
+
+    assert len(calls) == 1 and calls[0][-1] == pd.Timestamp(OPEN - 60 * NS)
+    stored = bars.load('AAA', '1m')
+    assert list(stored.index) == [pd.Timestamp(OPEN + i * 60 * NS) for i in range(-2, 3)]
+    assert list(stored['Close']) == [9.0, 9.8, 10.2, 11.5, 12.0]  # the partial first bar came from the download
+
+
+def test_feed_reconnects_after_any_error(monkeypatch):
+    websockets = pytest.importorskip('websockets')
+    attempts = []
+
+    def connect(*args, **kwargs):
+        attempts.append(time.perf_counter())
+        raise RuntimeError('unexpected')
+
+    monkeypatch.setattr(websockets, 'connect', connect)
+    feed = Stream.Feed('ws://unused', ['AAA'], store=False, base_backoff=0.01, max_backoff=0.02).start()
+    deadline = time.time() + 5
+    while len(attempts) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    assert feed.thread.is_alive()
+    feed.stop()
+    assert len(attempts) >= 3 and not feed.thread.is_alive()
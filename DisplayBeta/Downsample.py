@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+# Reduce a price series to about as many points as the chart has pixels before it goes to Plotly.
+# Both methods return row positions, so every column of the frame can be sliced the same way.
+
+
+def _as_float(values):
+    if isinstance(getattr(values, 'dtype', None), pd.DatetimeTZDtype):
+        # tz-aware timestamps come out of np.asarray as objects; compare them as UTC instead
+        values = pd.DatetimeIndex(values).tz_convert(None)
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return values.astype(np.float64)
+
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: keeps the point of each bucket that forms the largest triangle
+    # with the previously kept point and the mean of the next bucket, which preserves peaks and troughs
+    x, y = _as_float(x), _as_float(y)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    every = (n - 2) / (n_out - 2)
+    bounds = (np.arange(n_out - 1) * every).astype(np.int64) + 1
+    bounds[-1] = n - 1
+    # Mean of every bucket up front; the last bucket's "next bucket" is the final point
+    sums_x = np.add.reduceat(x[:n - 1], bounds[:-1])
+    sums_y = np.add.reduceat(y[:n - 1], bounds[:-1])
+    sizes = np.diff(bounds)
+    avg_x = np.append(sums_x[1:] / sizes[1:], x[-1])
+    avg_y = np.append(sums_y[1:] / sizes[1:], y[-1])
+
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        area = np.abs((x[a] - avg_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(y, n_out):
+    # Min and max of each of n_out/2 equal buckets (plus both end points), fully vectorized
+    y = _as_float(y)
+    n = len(y)
+    buckets = max(n_out // 2, 1)
+    if n_out >= n:
+        return np.arange(n)
+    size = int(np.ceil(n / buckets))
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    valid = ~np.all(np.isnan(padded), axis=1)
+    offsets = np.arange(buckets)[valid] * size
+    lows = offsets + np.nanargmin(padded[valid], axis=1)
+    highs = offsets + np.nanargmax(padded[valid], axis=1)
+    return np.unique(np.concatenate([[0, n - 1], lows, highs]))
+
+
+def downsample(df, n_points, x='date', y='price', method='lttb', x_range=None):
+    # Rows of df inside x_range (the zoom window), reduced to about n_points
+    if x_range is not None:
+        df = df[(df[x] >= pd.Timestamp(x_range[0])) & (df[x] <= pd.Timestamp(x_range[1]))]
+    if len(df) <= n_points:
+        return df
+    values = df[y].ffill().bfill()
+    if method == 'minmax':
+        rows = minmax(values, n_points)
+    else:
+        rows = lttb(df[x], values, n_points)
+    return df.iloc[rows]
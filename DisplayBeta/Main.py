@@ -1,16 +1,14 @@
-import yfinance as yf
-import plotly.graph_objects as go
-import pandas as pd
 import streamlit as st
-import warnings
-import time
 
+# Only the navigation is built here; each page imports what it needs (yfinance, plotly, the bot's
+# modules) the first time it runs, and shared data (symbols, prices, metrics) is loaded once per process
 pages = {
     "Your account": [
-        st.Page("stockcompare.py", title="Compare Stocks"),
+        st.Page("StockCompare.py", title="Compare Stocks"),
         st.Page("Test.py", title="Manage your account"),
     ],
     "Resources": [
+        st.Page("SignalScreener.py", title="Signal Screener"),
     ],
 }
 
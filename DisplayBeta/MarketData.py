@@ -0,0 +1,177 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'BetaTestBot'))
+import BarStore as bars
+import Bars
+import Resample
+
+# Price history and ticker metrics for the dashboard pages, cached per symbol/interval/period with a TTL
+# and shared by all sessions. Symbols missing from the cache are downloaded together: prices in one
+# batched yf.download, metrics (the slow ticker.info endpoint) concurrently on a thread pool. Weekly and
+# monthly bars are resampled from the cached daily ones instead of being downloaded again. The cache holds
+# compact bars (float32 prices, 28 bytes a bar); the chart DataFrame is rebuilt from them on each call.
+# yfinance is only imported once something actually has to be downloaded.
+
+PRICE_TTL = 300
+DERIVED = {'1wk': '1d', '1mo': '1d'}  # interval -> the cached interval it is resampled from
+NO_BARS = np.empty(0, Bars.DTYPE)
+METRICS_TTL = 3600
+EMPTY_METRICS = {'pe_ratio': 0, 'dividend_yield': 0, 'eps': 0, 'beta': 0}
+
+
+class TTLCache:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.items = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+        if item is None or time.time() - item[0] > self.ttl:
+            return None
+        return item[1]
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = (time.time(), value)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+@st.cache_resource
+def _caches():
+    return {'prices': TTLCache(PRICE_TTL), 'metrics': TTLCache(METRICS_TTL)}
+
+
+def check_interval(interval, period):
+    # Intraday intervals are only available for short periods
+    if interval in ['1m', '2m', '5m', '15m', '30m'] and period not in ['1d', '5d', '7d']:
+        st.warning(f"Interval {interval} only available for periods up to 7 days. Switching to daily interval.")
+        return '1d'
+    return interval
+
+
+def compact(df):
+    # Downloaded OHLCV (exchange wall-clock times) as compact bars
+    return Bars.from_frame(bars.normalize(df.dropna(how='all')))
+
+
+def expand(arr, interval):
+    # The frame the charts use: a Date/Datetime column, OHLCV, and 'price' and 'date' columns
+    if not len(arr):
+        return pd.DataFrame()
+    dates = pd.DatetimeIndex(Bars.timestamps(arr).copy())
+    columns = {'Datetime' if interval in bars.INTRADAY else 'Date': dates}
+    columns.update({c: arr[c].astype(np.float64) for c in Bars.PRICES})
+    columns['Volume'] = arr['Volume'].astype(np.int64)
+    columns['price'] = columns['Close']
+    columns['date'] = dates
+    return pd.DataFrame(columns)
+
+
+def _download(symbols, interval, period):
+    import yfinance as yf
+    df = yf.download(list(symbols), interval=interval, period=period, progress=False, group_by='ticker',
+                     threads=True)
+    found = {}
+    for symbol in symbols:
+        if isinstance(df.columns, pd.MultiIndex) and symbol in df.columns.get_level_values(0):
+            found[symbol] = compact(df[symbol])
+        else:
+            found[symbol] = NO_BARS
+    return found
+
+
+def _resample(arr, interval):
+    if not len(arr):
+        return arr
+    return Bars.from_frame(Resample.resample(Bars.to_frame(arr), interval))
+
+
+def fetch_bars(symbols, interval='1d', period='1y'):
+    # {symbol: compact bars}; only symbols not cached for this interval/period are downloaded, in one request
+    cache = _caches()['prices']
+    found = {s: cache.get((s, interval, period)) for s in symbols}
+    missing = [s for s, arr in found.items() if arr is None]
+    if missing and interval in DERIVED:
+        for symbol, arr in fetch_bars(missing, DERIVED[interval], period).items():
+            found[symbol] = _resample(arr, interval)
+            if len(found[symbol]):
+                cache.put((symbol, interval, period), found[symbol])
+    elif missing:
+        try:
+            for symbol, arr in _download(missing, interval, period).items():
+                if len(arr):
+                    cache.put((symbol, interval, period), arr)
+                found[symbol] = arr
+        except Exception as e:
+            st.error(f"Error fetching data for {', '.join(missing)}: {str(e)}")
+            for symbol in missing:
+                found[symbol] = NO_BARS
+    return found
+
+
+def fetch_many(symbols, interval='1d', period='1y'):
+    # {symbol: DataFrame} for the charts, built from the cached compact bars
+    interval = check_interval(interval, period)
+    frames = {s: expand(arr, interval) for s, arr in fetch_bars(symbols, interval, period).items()}
+    for symbol, df in frames.items():
+        if df.empty:
+            st.error(f"Error fetching data for {symbol}: No data found for {symbol}")
+    return frames
+
+
+def fetch_closes(symbols, period='1y'):
+    # date x symbol matrix of daily closes, from the same cached bars fetch_many charts
+    symbols = list(dict.fromkeys(symbols))
+    closes = {s: pd.Series(arr['Close'].astype(np.float64), index=Bars.timestamps(arr).copy())
+              for s, arr in fetch_bars(symbols, '1d', period).items() if len(arr)}
+    return pd.DataFrame(closes, columns=symbols).sort_index()
+
+
+def fetch_data(symbol, interval='1d', period='1y'):
+    return fetch_many([symbol], interval, period)[symbol]
+
+
+def _download_metrics(symbol):
+    import yfinance as yf
+    info = yf.Ticker(symbol).info
+    metrics = {
+        'pe_ratio': info.get('trailingPE', None),
+        'dividend_yield': info.get('dividendYield', None),
+        'eps': info.get('trailingEps', None),
+        'beta': info.get('beta', None)
+    }
+    # Convert None to 0 for numerical comparisons
+    return {k: 0 if v is None else v for k, v in metrics.items()}
+
+
+def fetch_metrics_many(symbols, workers=8):
+    cache = _caches()['metrics']
+    metrics = {s: cache.get(s) for s in symbols}
+    missing = [s for s, m in metrics.items() if m is None]
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(workers, len(missing))) as pool:
+            futures = {s: pool.submit(_download_metrics, s) for s in missing}
+        for symbol, future in futures.items():
+            try:
+                metrics[symbol] = future.result()
+                cache.put(symbol, metrics[symbol])
+            except Exception as e:
+                st.warning(f"Could not fetch metrics for {symbol}: {str(e)}")
+                metrics[symbol] = dict(EMPTY_METRICS)
+    return metrics
+
+
+def fetch_additional_metrics(symbol):
+    return fetch_metrics_many([symbol])[symbol]
@@ -0,0 +1,111 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Portfolio history from one aligned date x symbol matrix of daily closes. The matrix is kept between
+# reruns: adding a position only downloads that symbol's column, and position values, equity,
+# returns and drawdowns are computed with array operations over the whole matrix at once.
+
+
+def download_closes(symbols, start, end=None):
+    import yfinance as yf
+    df = yf.download(list(symbols), start=start, end=end, interval='1d', group_by='ticker', progress=False,
+                     threads=True)
+    closes = {}
+    for symbol in symbols:
+        if isinstance(df.columns, pd.MultiIndex) and symbol in df.columns.get_level_values(0):
+            closes[symbol] = df[symbol]['Close']
+    closes = pd.DataFrame(closes, columns=list(symbols))
+    closes.index = pd.to_datetime(closes.index).tz_localize(None).normalize()
+    return closes
+
+
+class PriceMatrix:
+    def __init__(self, fetch=download_closes, ttl=3600):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.prices = pd.DataFrame()
+        self.start = None  # earliest date requested so far; the first row can be later (weekends, holidays)
+        self.refreshed = 0
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def _download(self, symbols, start, end=None):
+        self.requests += 1
+        return self.fetch(symbols, start, end)
+
+    def get(self, symbols, start):
+        # Closes for `symbols` from `start`, downloading only what the matrix does not hold yet
+        symbols = list(dict.fromkeys(symbols))
+        start = pd.Timestamp(start).normalize()
+        with self.lock:
+            prices = self.prices
+            if prices.empty:
+                prices = self._download(symbols, start)
+                self.start = start
+                self.refreshed = time.time()
+            else:
+                if start < self.start:
+                    # Earlier history for every column, in one request
+                    earlier = self._download(list(prices.columns), start, self.start)
+                    prices = pd.concat([earlier, prices])
+                    self.start = start
+                missing = [s for s in symbols if s not in prices.columns]
+                if missing:
+                    prices = prices.join(self._download(missing, self.start), how='outer')
+                if time.time() - self.refreshed > self.ttl:
+                    # Re-fetch the latest bar onwards to pick up new closes
+                    tail = self._download(list(prices.columns), prices.index[-1])
+                    prices = tail.combine_first(prices)
+                    self.refreshed = time.time()
+            prices = prices[~prices.index.duplicated(keep='last')].sort_index()
+            self.prices = prices
+        return prices.loc[prices.index >= start, symbols]
+
+
+@st.cache_resource
+def get_price_matrix():
+    return PriceMatrix()
+
+
+def compute_history(positions, prices):
+    # positions: rows with Symbol, Shares, Entry Price, Entry Date; prices: date x symbol closes.
+    # Returns a frame of daily Equity, Cost Basis, Gain/Loss, Return %, Daily Return %, Drawdown % and one
+    # column per symbol. Daily returns exclude the jump in equity on the day a position is added.
+    dates = prices.index.values
+    closes = prices.ffill().to_numpy(dtype=np.float64)
+    col = prices.columns.get_indexer(positions['Symbol'])
+    entry = pd.to_datetime(positions['Entry Date']).values.astype('datetime64[ns]')
+    shares = positions['Shares'].to_numpy(dtype=np.float64)
+    cost = shares * positions['Entry Price'].to_numpy(dtype=np.float64)
+
+    held = dates[:, None] >= entry[None, :]                      # dates x positions
+    values = np.where(held, np.nan_to_num(closes[:, col]) * shares, 0.0)
+    invested = np.where(held, cost, 0.0).sum(axis=1)
+    equity = values.sum(axis=1)
+    opened = held & ~np.vstack([np.zeros((1, held.shape[1]), dtype=bool), held[:-1]])
+    flows = np.where(opened, values, 0.0).sum(axis=1)
+    previous = np.concatenate([[0.0], equity[:-1]])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.where(invested > 0, (equity - invested) / invested, 0.0) * 100
+        daily = np.where(previous > 0, (equity - flows - previous) / previous, 0.0)
+    # Drawdown of the growth index, so money added later does not hide earlier losses
+    growth = np.cumprod(1 + daily)
+    drawdown = (growth / np.maximum.accumulate(growth) - 1) * 100
+    daily = daily * 100
+
+    by_symbol = pd.DataFrame(values, index=prices.index).T.groupby(positions['Symbol'].to_numpy()).sum().T
+    history = pd.DataFrame({'Equity': equity, 'Cost Basis': invested, 'Gain/Loss': equity - invested,
+                            'Return %': returns, 'Daily Return %': daily, 'Drawdown %': drawdown}, index=prices.index)
+    history = history.join(by_symbol)
+    return history[invested > 0]
+
+
+def portfolio_history(positions):
+    if positions.empty:
+        return pd.DataFrame()
+    start = pd.to_datetime(positions['Entry Date']).min()
+    prices = get_price_matrix().get(positions['Symbol'].unique(), start)
+    return compute_history(positions, prices)
@@ -0,0 +1,16 @@
+# Position math for the Portfolio Analyzer, kept out of the page so it can be reused and benchmarked
+
+
+def recompute(df, current_prices):
+    # df: one row per position with Symbol, Shares and Entry Price; current_prices: {symbol: last price}
+    updated_df = df.copy()
+    updated_df['Current Price'] = updated_df['Symbol'].map(current_prices)
+    updated_df['Position Value'] = updated_df['Shares'] * updated_df['Current Price']
+    updated_df['Cost Basis'] = updated_df['Shares'] * updated_df['Entry Price']
+    updated_df['Gain/Loss'] = updated_df['Position Value'] - updated_df['Cost Basis']
+    updated_df['Return %'] = (updated_df['Gain/Loss'] / updated_df['Cost Basis']) * 100
+
+    # Calculate portfolio weights
+    total_value = updated_df['Position Value'].sum()
+    updated_df['Weight %'] = (updated_df['Position Value'] / total_value) * 100
+    return updated_df
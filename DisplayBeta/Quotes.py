@@ -0,0 +1,125 @@
+import os
+import sys
+import threading
+import time
+import pandas as pd
+import streamlit as st
+
+# Streaming feed client lives in BetaTestBot
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'BetaTestBot'))
+
+# Last prices shared by every session and rerun of the app. Stale or missing symbols are fetched in one
+# batched download, and a background thread refreshes the symbols pages have asked for before their
+# TTL runs out, so a rerun with a fresh cache makes no network calls at all. Symbols no page has asked
+# for in `idle` seconds drop out of the refresh, and a symbol already being downloaded for one session
+# is waited for by the others rather than downloaded again. With STREAM_URL set (a
+# Stream.py feed, e.g. ws://localhost:8765) prices are pushed into the cache as they trade instead.
+
+
+def download_last_prices(symbols):
+    import yfinance as yf
+    df = yf.download(list(symbols), period='5d', interval='1d', group_by='ticker', progress=False, threads=True)
+    prices = {}
+    for symbol in symbols:
+        try:
+            close = df[symbol]['Close'] if isinstance(df.columns, pd.MultiIndex) else df['Close']
+            close = close.dropna()
+            if not close.empty:
+                prices[symbol] = float(close.iloc[-1])
+        except KeyError:
+            pass
+    return prices
+
+
+class QuoteService:
+    def __init__(self, ttl=60, fetch=download_last_prices, background=True, feed=None, idle=600):
+        self.ttl = ttl
+        self.idle = idle
+        self.feed = feed
+        self.fetch = fetch
+        self.prices = {}
+        self.fetched_at = {}
+        self.watched = {}  # symbol -> when a page last asked for it
+        self.in_flight = {}  # symbol -> Event set when its download finishes
+        self.lock = threading.Lock()
+        self.requests = 0
+        if feed is not None:
+            feed.subscribe(kinds=('quotes',), callback=lambda quote: self.push({quote.symbol: quote.price}),
+                           name='quote-cache')
+        if background:
+            threading.Thread(target=self._refresh_loop, name="quote-refresh", daemon=True).start()
+
+    def _update(self, symbols, max_age):
+        # Downloads the symbols older than max_age that no other caller is downloading, then waits for
+        # the ones that are
+        now = time.time()
+        with self.lock:
+            stale = [s for s in symbols if now - self.fetched_at.get(s, 0) > max_age]
+            waiting = {self.in_flight[s] for s in stale if s in self.in_flight}
+            own = [s for s in stale if s not in self.in_flight]
+            done = threading.Event()
+            for symbol in own:
+                self.in_flight[symbol] = done
+        try:
+            if own:
+                prices = self.fetch(own)
+                now = time.time()
+                with self.lock:
+                    self.requests += 1
+                    self.prices.update(prices)
+                    for symbol in own:
+                        self.fetched_at[symbol] = now
+        finally:
+            with self.lock:
+                for symbol in own:
+                    del self.in_flight[symbol]
+            done.set()
+        for event in waiting:
+            # A hung download only holds the others up for one TTL; they show the cached price meanwhile
+            event.wait(self.ttl)
+
+    def push(self, prices):
+        # Prices from the stream count as just fetched, so they are not downloaded again within the TTL
+        now = time.time()
+        with self.lock:
+            self.prices.update(prices)
+            for symbol in prices:
+                self.fetched_at[symbol] = now
+
+    def get_prices(self, symbols):
+        symbols = list(dict.fromkeys(symbols))
+        now = time.time()
+        with self.lock:
+            self.watched.update(dict.fromkeys(symbols, now))
+        if self.feed is not None:
+            self.feed.watch(symbols)
+        self._update(symbols, self.ttl)
+        with self.lock:
+            return {s: self.prices.get(s) for s in symbols}
+
+    def refresh(self):
+        # Refresh anything past half its TTL so foreground reads keep hitting the cache
+        cutoff = time.time() - self.idle
+        with self.lock:
+            self.watched = {s: at for s, at in self.watched.items() if at >= cutoff}
+            watched = list(self.watched)
+        self._update(watched, self.ttl / 2)
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(max(self.ttl / 2, 1))
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Quote refresh failed: {str(e)}")
+
+
+@st.cache_resource
+def get_quote_service(ttl=60):
+    # One service per server process, shared across sessions and reruns
+    feed = None
+    if os.environ.get('STREAM_URL'):
+        import Stream
+        # The bot owns the bar store, so the dashboards only take prices from the feed
+        feed = Stream.shared_feed(os.environ['STREAM_URL'], store=False)
+    return QuoteService(ttl=ttl, feed=feed)
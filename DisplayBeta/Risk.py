@@ -0,0 +1,140 @@
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+import streamlit as st
+from MarketData import fetch_closes
+from Symbols import symbol_master
+
+# Risk of the current holdings from one aligned date x symbol matrix of daily returns: covariance and
+# correlation, volatility, beta to the benchmark (the first row of constituents.csv), historical and
+# parametric VaR/CVaR, and a Monte Carlo of correlated returns over a horizon. Every step is a matrix
+# operation; the simulation draws its paths in batches, never one path at a time.
+# Results are cached per portfolio composition, so reruns with the same holdings reuse them.
+
+TRADING_DAYS = 252
+CONFIDENCE = 0.95
+PATHS = 100_000
+HORIZON = 21  # trading days simulated, about a month
+LOOKBACK = '1y'
+BATCH_DRAWS = 4_000_000  # random numbers per simulation batch (32 MB), whatever the number of symbols
+
+
+def returns_matrix(prices):
+    # Daily simple returns on the dates every column has a close
+    return prices.ffill().pct_change(fill_method=None).iloc[1:].dropna()
+
+
+def covariance(returns):
+    centered = returns - returns.mean(axis=0)
+    cov = centered.T @ centered / max(len(returns) - 1, 1)
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov / np.outer(std, std)
+    return cov, corr
+
+
+def historical_var(returns, confidence=CONFIDENCE):
+    # (VaR, CVaR) as positive losses: the loss quantile and the mean loss beyond it
+    cutoff = np.quantile(returns, 1 - confidence)
+    return -cutoff, -returns[returns <= cutoff].mean()
+
+
+def parametric_var(mean, sigma, confidence=CONFIDENCE):
+    normal = NormalDist()
+    z = normal.inv_cdf(confidence)
+    return -(mean - z * sigma), -(mean - sigma * normal.pdf(z) / (1 - confidence))
+
+
+def _factor(cov):
+    # A with A @ A.T == cov; a singular covariance (fewer days than symbols, duplicates) has no Cholesky factor
+    try:
+        return np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        values, vectors = np.linalg.eigh(cov)
+        return vectors * np.sqrt(np.clip(values, 0, None))
+
+
+def monte_carlo(log_mean, log_cov, weights, horizon=HORIZON, paths=PATHS, seed=0):
+    # Portfolio returns over `horizon` days for `paths` scenarios. Daily log returns are multivariate normal
+    # (geometric Brownian motion fitted to history), so each symbol's horizon log return is exactly normal
+    # with horizon x the daily mean and covariance: one correlated draw per symbol and path, no daily steps
+    rng = np.random.default_rng(seed)
+    factor = _factor(log_cov * horizon)
+    batch = max(1, BATCH_DRAWS // len(weights))
+    result = np.empty(paths)
+    for start in range(0, paths, batch):
+        size = min(batch, paths - start)
+        growth = np.exp(log_mean * horizon + rng.standard_normal((size, len(weights))) @ factor.T)
+        result[start:start + size] = growth @ weights - 1
+    return result
+
+
+def analyze(prices, shares, benchmark=None, confidence=CONFIDENCE, paths=PATHS, horizon=HORIZON, seed=0):
+    # prices: date x symbol closes including the benchmark's; shares: {symbol: shares held}
+    symbols = [s for s in shares if s in prices.columns and prices[s].notna().any()]
+    if not symbols:
+        return None
+    columns = symbols + ([benchmark] if benchmark in prices.columns and benchmark not in symbols else [])
+    returns = returns_matrix(prices[columns])
+    if len(returns) < 2:
+        return None
+    matrix = returns[symbols].to_numpy(dtype=np.float64)
+    values = prices[symbols].ffill().iloc[-1].to_numpy(dtype=np.float64) * np.array([shares[s] for s in symbols])
+    value = values.sum()
+    weights = values / value
+
+    cov, corr = covariance(matrix)
+    portfolio = matrix @ weights
+    mean, sigma = portfolio.mean(), np.sqrt(weights @ cov @ weights)
+
+    betas = np.full(len(symbols), np.nan)
+    if benchmark in returns.columns:
+        bench = returns[benchmark].to_numpy(dtype=np.float64)
+        centered = bench - bench.mean()
+        betas = (matrix - matrix.mean(axis=0)).T @ centered / (centered @ centered)
+
+    log_returns = np.log1p(matrix)
+    simulated = monte_carlo(log_returns.mean(axis=0), covariance(log_returns)[0], weights, horizon, paths, seed)
+    rows = {
+        '1-day historical': historical_var(portfolio, confidence),
+        '1-day parametric': parametric_var(mean, sigma, confidence),
+        f'{horizon}-day Monte Carlo': historical_var(simulated, confidence),
+    }
+    var = pd.DataFrame(rows, index=['VaR %', 'CVaR %']).T * 100
+    var['VaR $'] = var['VaR %'] / 100 * value
+    var['CVaR $'] = var['CVaR %'] / 100 * value
+
+    outcomes = np.percentile(simulated, [5, 25, 50, 75, 95])
+    return {
+        'benchmark': benchmark,
+        'value': value,
+        'observations': len(returns),
+        'start': returns.index[0],
+        'end': returns.index[-1],
+        'volatility': sigma * np.sqrt(TRADING_DAYS) * 100,
+        'beta': float(weights @ betas),
+        'positions': pd.DataFrame({'Weight %': weights * 100, 'Beta': betas,
+                                   'Volatility %': np.sqrt(np.diag(cov) * TRADING_DAYS) * 100}, index=symbols),
+        'covariance': pd.DataFrame(cov * TRADING_DAYS, index=symbols, columns=symbols),
+        'correlation': pd.DataFrame(corr, index=symbols, columns=symbols),
+        'var': var,
+        'simulation': pd.DataFrame({'Return %': outcomes * 100, 'Value $': value * (1 + outcomes)},
+                                   index=['5th', '25th', 'Median', '75th', '95th']),
+        'loss_probability': float((simulated < 0).mean() * 100),
+    }
+
+
+def composition(positions):
+    # Hashable (symbol, shares) pairs, the cache key of portfolio_risk
+    held = positions.groupby('Symbol')['Shares'].sum()
+    return tuple((symbol, float(count)) for symbol, count in held.items() if count)
+
+
+@st.cache_data(ttl=3600, show_spinner="Computing portfolio risk...")
+def portfolio_risk(holdings, confidence=CONFIDENCE, paths=PATHS, horizon=HORIZON):
+    # holdings: composition(positions). The last year of daily closes comes from the shared price cache,
+    # the same bars the Compare Stocks page charts
+    shares = dict(holdings)
+    benchmark = symbol_master().benchmark
+    prices = fetch_closes(list(shares) + [benchmark], period=LOOKBACK)
+    return analyze(prices, shares, benchmark, confidence, paths, horizon)
@@ -0,0 +1,79 @@
+import os
+import sys
+import pandas as pd
+import streamlit as st
+import plotly.graph_objects as go
+import plotly.io as pio
+
+# The screener and bar store live in BetaTestBot
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'BetaTestBot'))
+import Screener
+from Symbols import symbol_master
+
+st.set_page_config(page_title="Signal Screener", layout="wide")
+st.title("Signal Screener")
+if pio.templates.default != "plotly_dark":  # the setter re-validates the template (~50ms)
+    pio.templates.default = "plotly_dark"
+
+
+# Closes for the whole universe are loaded once per TTL; changing the screen settings only recomputes.
+# Both caches are keyed by the universe size, not the list of 500 symbols, which costs ~10ms to hash.
+@st.cache_data(ttl=600, show_spinner="Loading bars for the universe...")
+def load_closes(count):
+    return Screener.load_closes(symbol_master().symbols[:count or None])
+
+
+# Widgets that only change the display (signals shown, the inspected symbol) reuse the last screen
+@st.cache_data(ttl=600, show_spinner=False)
+def screen(count, window_size, lookback):
+    result = Screener.screen(load_closes(count), window_size, lookback)
+    result.insert(1, 'Sector', result['Symbol'].map(symbol_master().sector))
+    return result
+
+
+with st.sidebar:
+    st.header("Settings")
+    count = st.number_input('Universe size (0 = all constituents)', min_value=0, max_value=600, value=0, step=50)
+    window_size = st.number_input('SMA window', min_value=2, max_value=200, value=5)
+    lookback = st.number_input('Momentum lookback (bars)', min_value=1, max_value=252, value=20)
+    signals = st.multiselect('Signals', ['BUY', 'SELL', 'HODL'], default=['BUY', 'SELL'])
+    sectors = st.multiselect('Sectors (none = all)', symbol_master().sector_list())
+    crossed_only = st.checkbox('Only symbols that crossed their SMA on the last bar', value=False)
+    top = st.number_input('Rows to show', min_value=10, max_value=600, value=50, step=10)
+
+try:
+    closes = load_closes(int(count))
+    result = screen(int(count), int(window_size), int(lookback))
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Symbols", f"{len(result)}")
+    col2.metric("BUY", f"{(result['Signal'] == 'BUY').sum()}")
+    col3.metric("SELL", f"{(result['Signal'] == 'SELL').sum()}")
+    col4.metric("Crossed today", f"{(result['Crossover'] != '').sum()}")
+    st.caption(f"Last bar: {closes.index[-1]:%Y-%m-%d}")
+
+    shown = result[result['Signal'].isin(signals)]
+    if sectors:
+        shown = shown[shown['Sector'].isin(sectors)]
+    if crossed_only:
+        shown = shown[shown['Crossover'] != '']
+    # Column formats are applied by the browser; a pandas Styler formats every cell in Python on each rerun
+    number = st.column_config.NumberColumn
+    st.dataframe(shown.head(int(top)), use_container_width=True, hide_index=True, column_config={
+        'Close': number(format='$%.2f'), 'SMA': number(format='$%.2f'), 'Momentum %': number(format='%.2f%%'),
+        'Distance %': number(format='%.2f%%'), 'Rank': number(format='%d'),
+    })
+
+    # Price and SMA of one screened symbol
+    if not shown.empty:
+        symbol = st.selectbox('Inspect', shown['Symbol'].head(int(top)))
+        close = closes[symbol].dropna()
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=close.index, y=close, mode='lines', name='Close'))
+        fig.add_trace(go.Scatter(x=close.index, y=close.rolling(window=int(window_size)).mean(), mode='lines',
+                                 name=f'SMA {int(window_size)}'))
+        fig.update_layout(title=f"{symbol} Close vs SMA", height=500)
+        st.plotly_chart(fig, use_container_width=True)
+
+except Exception as e:
+    st.error(f"An error occurred: {str(e)}")
@@ -1,9 +1,12 @@
-import yfinance as yf
 import plotly.graph_objects as go
+import plotly.io as pio
 import pandas as pd
 import streamlit as st
 import warnings
-from datetime import datetime
+# Price history and metrics come from MarketData, cached per symbol/interval/period across reruns
+from MarketData import fetch_many, fetch_metrics_many
+from Downsample import downsample
+from Symbols import symbol_master
 
 # Suppress the FutureWarnings
 warnings.simplefilter(action='ignore', category=FutureWarning)
@@ -12,73 +15,13 @@ warnings.simplefilter(action='ignore', category=FutureWarning)
 st.set_page_config(page_title="Stock Comparison Dashboard", layout="wide")
 st.title("Stock Comparison Dashboard")
 
-# Load tickers from CSV file
-@st.cache_data  # Cache the data loading
-def load_tickers():
-    try:
-        ticks = pd.read_csv('constituents.csv')
-        return ticks['Symbol'].tolist()
-    except FileNotFoundError:
-        return ['AAPL', 'GOOGL', 'MSFT', 'AMZN', 'META']  # Fallback list
-
-symbols = load_tickers()
-
-# Function to fetch data from Yahoo Finance using yfinance
-def fetch_data(symbol, interval='1d', period='1y'):
-    valid_intervals = ['1m', '2m', '5m', '15m', '30m', '1h', '1d', '5d', '1wk', '1mo', '3mo']
-    valid_periods = ['1d', '5d', '1mo', '3mo', '6mo', '1y', '2y', '5y', '10y', 'ytd', 'max']
-    
-    # Validate interval and period combinations
-    if interval in ['1m', '2m', '5m', '15m', '30m'] and period not in ['1d', '5d', '7d']:
-        st.warning(f"Interval {interval} only available for periods up to 7 days. Switching to daily interval.")
-        interval = '1d'
-    
-    try:
-        df = yf.download(symbol, interval=interval, period=period, progress=False)
-        if df.empty:
-            raise ValueError(f"No data found for {symbol}")
-        
-        # Reset index and handle date column
-        df = df.reset_index()
-        
-        # Keep original column names
-        if 'Adj Close' in df.columns:
-            df['price'] = df['Adj Close']  # Create a new column for price data
-        elif 'Close' in df.columns:
-            df['price'] = df['Close']
-        
-        # Ensure date is datetime
-        date_col = 'Date' if 'Date' in df.columns else 'Datetime'
-        df['date'] = pd.to_datetime(df[date_col])
-        
-        return df
-    except Exception as e:
-        st.error(f"Error fetching data for {symbol}: {str(e)}")
-        return pd.DataFrame()
-
-# Function to fetch additional metrics
-def fetch_additional_metrics(symbol):
-    try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-        
-        metrics = {
-            'pe_ratio': info.get('trailingPE', None),
-            'dividend_yield': info.get('dividendYield', None),
-            'eps': info.get('trailingEps', None),
-            'beta': info.get('beta', None)
-        }
-        
-        # Convert None to 0 for numerical comparisons
-        return {k: 0 if v is None else v for k, v in metrics.items()}
-    except Exception as e:
-        st.warning(f"Could not fetch metrics for {symbol}: {str(e)}")
-        return {
-            'pe_ratio': 0,
-            'dividend_yield': 0,
-            'eps': 0,
-            'beta': 0
-        }
+# Dark theme as the default template: passing template="plotly_dark" per figure re-validates it (~25ms a chart)
+if pio.templates.default != "plotly_dark":  # the setter re-validates the template (~50ms)
+    pio.templates.default = "plotly_dark"
+
+symbols = symbol_master().symbols
+
+COLORS = ['#00ff00', '#0000ff', '#ff0000', '#ffa500', '#ff00ff', '#00ffff', '#ffff00', '#ffffff']
 
 # Sidebar controls
 with st.sidebar:
@@ -95,36 +38,32 @@ with st.sidebar:
         index=3
     )
 
-# Initialize metrics dictionaries
-metrics1 = None
-metrics2 = None
+    # Price Trend traces are reduced to about one point per pixel of chart width before plotting
+    chart_width = st.number_input('Chart width (px)', min_value=200, max_value=4000, value=1200, step=100)
+    downsample_method = st.selectbox('Downsampling', ['lttb', 'minmax'], index=0)
 
 # Main content
 try:
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        symbol1 = st.selectbox('Select First Stock Symbol', symbols, key='symbol1')
-        df1 = fetch_data(symbol1, interval=interval, period=period)
-        if not df1.empty:
-            metrics1 = fetch_additional_metrics(symbol1)
-            st.write("### First Stock Metrics")
-            metrics_df1 = pd.DataFrame([metrics1]).T
-            metrics_df1.columns = ['Value']
-            st.dataframe(metrics_df1)
-    
-    with col2:
-        symbol2 = st.selectbox('Select Second Stock Symbol', symbols, key='symbol2')
-        df2 = fetch_data(symbol2, interval=interval, period=period)
-        if not df2.empty:
-            metrics2 = fetch_additional_metrics(symbol2)
-            st.write("### Second Stock Metrics")
-            metrics_df2 = pd.DataFrame([metrics2]).T
-            metrics_df2.columns = ['Value']
-            st.dataframe(metrics_df2)
-
-    # Only proceed with charts if we have both metrics
-    if metrics1 and metrics2 and not df1.empty and not df2.empty:
+    default = [s for s in ['AAPL', 'MSFT'] if s in symbols] or symbols[:2]
+    selected = st.multiselect('Select Stock Symbols to Compare', symbols, default=default, key='symbols')
+
+    # One batched price download and concurrent metrics lookups for whatever is not cached yet
+    frames = fetch_many(selected, interval=interval, period=period)
+    selected = [s for s in selected if not frames[s].empty]
+    metrics = fetch_metrics_many(selected)
+    colors = {s: COLORS[i % len(COLORS)] for i, s in enumerate(selected)}
+
+    if selected:
+        cols = st.columns(len(selected))
+        for col, symbol in zip(cols, selected):
+            with col:
+                st.write(f"### {symbol} Metrics")
+                metrics_df = pd.DataFrame([metrics[symbol]]).T
+                metrics_df.columns = ['Value']
+                st.dataframe(metrics_df)
+
+    # Only proceed with charts if we have at least one symbol with data
+    if selected:
         # Charts section
         st.write("## Charts")
         charts_to_show = st.multiselect(
@@ -134,45 +73,46 @@ try:
         )
 
         if "Price Trend" in charts_to_show:
+            # Zooming re-samples from the full data inside the chosen range
+            first = min(frames[s]['date'].iloc[0] for s in selected).to_pydatetime()
+            last = max(frames[s]['date'].iloc[-1] for s in selected).to_pydatetime()
+            x_range = st.slider("Zoom", min_value=first, max_value=last, value=(first, last)) if first < last else None
             fig = go.Figure()
-            fig.add_trace(go.Scatter(
-                x=df1['date'],
-                y=df1['price'],
-                mode='lines',
-                name=symbol1,
-                line=dict(color='#00ff00')
-            ))
-            fig.add_trace(go.Scatter(
-                x=df2['date'],
-                y=df2['price'],
-                mode='lines',
-                name=symbol2,
-                line=dict(color='#0000ff')
-            ))
+            shown = total = 0
+            for symbol in selected:
+                df = downsample(frames[symbol], chart_width, method=downsample_method, x_range=x_range)
+                shown += len(df)
+                total += len(frames[symbol])
+                fig.add_trace(go.Scatter(
+                    x=df['date'],
+                    y=df['price'],
+                    mode='lines',
+                    name=symbol,
+                    line=dict(color=colors[symbol])
+                ))
             fig.update_layout(
-                title=f"Price Trend Comparison: {symbol1} vs {symbol2}",
+                title=f"Price Trend Comparison: {' vs '.join(selected)}",
                 xaxis_title="Date",
                 yaxis_title="Price",
-                template="plotly_dark",
                 height=600
             )
             st.plotly_chart(fig, use_container_width=True)
+            st.caption(f"Plotted {shown:,} of {total:,} points")
 
         if "Total Return" in charts_to_show:
-            total_return1 = ((df1['price'].iloc[-1] - df1['price'].iloc[0]) / df1['price'].iloc[0] * 100)
-            total_return2 = ((df2['price'].iloc[-1] - df2['price'].iloc[0]) / df2['price'].iloc[0] * 100)
+            total_returns = [(frames[s]['price'].iloc[-1] - frames[s]['price'].iloc[0]) / frames[s]['price'].iloc[0] * 100
+                             for s in selected]
 
             fig = go.Figure(data=[
                 go.Bar(
-                    x=[symbol1, symbol2],
-                    y=[total_return1, total_return2],
-                    marker_color=['#00ff00', '#0000ff']
+                    x=selected,
+                    y=total_returns,
+                    marker_color=[colors[s] for s in selected]
                 )
             ])
             fig.update_layout(
                 title="Total Return Comparison",
                 yaxis_title="Total Return (%)",
-                template="plotly_dark",
                 height=400
             )
             st.plotly_chart(fig, use_container_width=True)
@@ -186,25 +126,22 @@ try:
 
         for chart_name, (metric_key, ylabel) in metrics_charts.items():
             if chart_name in charts_to_show:
-                val1 = metrics1[metric_key]
-                val2 = metrics2[metric_key]
+                values = [metrics[s][metric_key] for s in selected]
                 
                 # Convert dividend yield to percentage
                 if metric_key == 'dividend_yield':
-                    val1 = val1 * 100 if val1 else 0
-                    val2 = val2 * 100 if val2 else 0
+                    values = [v * 100 if v else 0 for v in values]
                 
                 fig = go.Figure(data=[
                     go.Bar(
-                        x=[symbol1, symbol2],
-                        y=[val1, val2],
-                        marker_color=['#00ff00', '#0000ff']
+                        x=selected,
+                        y=values,
+                        marker_color=[colors[s] for s in selected]
                     )
                 ])
                 fig.update_layout(
                     title=f"{chart_name} Comparison",
                     yaxis_title=ylabel,
-                    template="plotly_dark",
                     height=400
                 )
                 st.plotly_chart(fig, use_container_width=True)
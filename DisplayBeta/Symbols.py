@@ -0,0 +1,45 @@
+import os
+import pandas as pd
+import streamlit as st
+
+# Symbol master shared by every page and session: constituents.csv is read once per server process
+# (not on every rerun, and independent of the directory the app was started from) and indexed for
+# name and sector lookups. The first row is the benchmark (SPY).
+
+constituents_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'constituents.csv')
+FALLBACK = ['AAPL', 'GOOGL', 'MSFT', 'AMZN', 'META']
+
+
+class SymbolMaster:
+    def __init__(self, table):
+        # table: constituents.csv rows with Symbol, Security and GICS Sector columns
+        self.symbols = table['Symbol'].tolist()
+        self.names = dict(zip(table['Symbol'], table['Security']))
+        self.sectors = dict(zip(table['Symbol'], table['GICS Sector'].fillna('N/A')))
+        self.by_sector = {}
+        for symbol, sector in self.sectors.items():
+            self.by_sector.setdefault(sector, []).append(symbol)
+        self.benchmark = self.symbols[0] if self.symbols else 'SPY'
+
+    def name(self, symbol):
+        return self.names.get(symbol, symbol)
+
+    def sector(self, symbol):
+        return self.sectors.get(symbol, 'Unknown')
+
+    def sector_list(self):
+        return sorted(s for s in self.by_sector if s != 'N/A')
+
+
+def load(path=constituents_path):
+    try:
+        table = pd.read_csv(path, skipinitialspace=True, dtype=str)
+    except FileNotFoundError:
+        table = pd.DataFrame({'Symbol': FALLBACK, 'Security': FALLBACK, 'GICS Sector': None})
+    table['Symbol'] = table['Symbol'].str.strip()
+    return SymbolMaster(table.drop_duplicates('Symbol'))
+
+
+@st.cache_resource
+def symbol_master():
+    return load()
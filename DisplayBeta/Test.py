@@ -1,8 +1,17 @@
-import yfinance as yf
 import pandas as pd
 import streamlit as st
 import numpy as np
-from datetime import datetime, timedelta
+import os
+import sys
+
+# The bot's journal module lives in BetaTestBot
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'BetaTestBot'))
+import Journal
+from Quotes import get_quote_service
+from PortfolioHistory import portfolio_history
+from Positions import recompute
+from Risk import composition, portfolio_risk
+from Symbols import symbol_master
 
 # Page config
 st.set_page_config(page_title="Portfolio Analyzer", layout="wide")
@@ -20,43 +29,18 @@ def update_stock_data(df):
     if df.empty:
         return df
     
-    updated_df = df.copy()
-    
     try:
-        # Fetch current prices for all symbols at once
-        symbols = updated_df['Symbol'].unique()
-        current_prices = {}
-        
-        for symbol in symbols:
-            ticker = yf.Ticker(symbol)
-            current_prices[symbol] = ticker.history(period='1d')['Close'].iloc[-1]
-        
-        # Update DataFrame with new calculations
-        updated_df['Current Price'] = updated_df['Symbol'].map(current_prices)
-        updated_df['Position Value'] = updated_df['Shares'] * updated_df['Current Price']
-        updated_df['Cost Basis'] = updated_df['Shares'] * updated_df['Entry Price']
-        updated_df['Gain/Loss'] = updated_df['Position Value'] - updated_df['Cost Basis']
-        updated_df['Return %'] = (updated_df['Gain/Loss'] / updated_df['Cost Basis']) * 100
-        
-        # Calculate portfolio weights
-        total_value = updated_df['Position Value'].sum()
-        updated_df['Weight %'] = (updated_df['Position Value'] / total_value) * 100
-        
-        return updated_df
+        # Fetch current prices for all symbols at once; served from the shared cache while it is fresh
+        symbols = df['Symbol'].unique()
+        current_prices = get_quote_service().get_prices(symbols)
+        return recompute(df, current_prices)
     
     except Exception as e:
         st.error(f"Error updating stock data: {str(e)}")
         return df
     
-def load_tickers():
-    try:
-        ticks = pd.read_csv('constituents.csv')
-        return ticks['Symbol'].tolist()
-    except FileNotFoundError:
-        return ['AAPL', 'GOOGL', 'MSFT', 'AMZN', 'META']  # Fallback list
     
-    
-symbols=load_tickers()
+symbols = symbol_master().symbols
 
 
 # Sidebar for adding new positions
@@ -81,8 +65,25 @@ with st.sidebar.form("add_position"):
             'Return %': [0],
             'Weight %': [0]
         })
+        # Prices are filled in by the update below, once per rerun
         st.session_state.portfolio_df = pd.concat([st.session_state.portfolio_df, new_position], ignore_index=True)
-        st.session_state.portfolio_df = update_stock_data(st.session_state.portfolio_df)
+
+# Import the positions the trading bot holds, as recorded in its journal
+st.sidebar.header("Bot Holdings")
+if st.sidebar.button("Import from bot journal"):
+    positions = Journal.read_positions()
+    if positions:
+        imported = pd.DataFrame({
+            'Symbol': list(positions),
+            'Shares': [p['shares'] for p in positions.values()],
+            'Entry Price': [p['cost'] / p['shares'] if p['shares'] else 0 for p in positions.values()],
+            'Entry Date': [pd.to_datetime(p['entry_date']).date() if p['entry_date'] else None for p in positions.values()],
+        })
+        # Replace any rows for the same symbols instead of double counting them
+        kept = st.session_state.portfolio_df[~st.session_state.portfolio_df['Symbol'].isin(imported['Symbol'])]
+        st.session_state.portfolio_df = pd.concat([kept, imported], ignore_index=True)
+    else:
+        st.sidebar.info("The bot journal has no open positions.")
 
 # Update portfolio data
 if not st.session_state.portfolio_df.empty:
@@ -167,6 +168,51 @@ if not st.session_state.portfolio_df.empty:
             ]
         })
         st.dataframe(diversification)
+
+        st.write("Sector Exposure")
+        sectors = sorted_df.groupby(sorted_df['Symbol'].map(symbol_master().sector))['Weight %'].sum()
+        st.dataframe(sectors.sort_values(ascending=False).rename_axis('Sector').to_frame().style.format('{:.2f}%'))
+
+    # Risk over the last year of daily returns, computed once per set of holdings
+    risk = portfolio_risk(composition(st.session_state.portfolio_df))
+    if risk is not None:
+        st.write(f"Risk ({risk['observations']} daily returns, {risk['start']:%Y-%m-%d} to {risk['end']:%Y-%m-%d})")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Annualized Volatility", f"{risk['volatility']:.2f}%")
+        with col2:
+            st.metric(f"Beta to {risk['benchmark']}", f"{risk['beta']:.2f}")
+        with col3:
+            st.metric("1-day VaR (95%)", f"${risk['var']['VaR $'].iloc[0]:,.2f}")
+        with col4:
+            st.metric("Chance of a loss (Monte Carlo)", f"{risk['loss_probability']:.1f}%")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("Value at Risk (95%)")
+            st.dataframe(risk['var'].style.format({'VaR %': '{:.2f}%', 'CVaR %': '{:.2f}%',
+                                                   'VaR $': '${:,.2f}', 'CVaR $': '${:,.2f}'}))
+            st.write("Monte Carlo Outcomes")
+            st.dataframe(risk['simulation'].style.format({'Return %': '{:.2f}%', 'Value $': '${:,.2f}'}))
+        with col2:
+            st.write("Position Risk")
+            st.dataframe(risk['positions'].style.format({'Weight %': '{:.2f}%', 'Beta': '{:.2f}',
+                                                         'Volatility %': '{:.2f}%'}))
+            st.write("Correlation Matrix")
+            st.dataframe(risk['correlation'].style.format('{:.2f}'))
+
+    # Portfolio history since the first entry date, from one cached price matrix
+    st.subheader("Portfolio History")
+    history = portfolio_history(st.session_state.portfolio_df)
+    if not history.empty:
+        st.line_chart(history[['Equity', 'Cost Basis']])
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("Drawdown %")
+            st.area_chart(history['Drawdown %'])
+        with col2:
+            st.write("Position Values")
+            st.area_chart(history[st.session_state.portfolio_df['Symbol'].unique()])
+        st.metric("Max Drawdown", f"{history['Drawdown %'].min():.2f}%")
     
     # Add delete functionality
     st.subheader("Edit Portfolio")